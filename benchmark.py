@@ -0,0 +1,383 @@
+"""
+benchmark.py
+
+Benchmarks for the hot paths of cjr_tracker.py.
+
+A synthetic archive is generated in the same formats as the tracker's data
+files, and the tracker is timed loading, saving, listing, and checking it, with
+a stub in place of Reddit. The results are written as JSON, so that they can be
+compared between versions of the tracker.
+
+	python benchmark.py --posts 1000 100000 --output bench.json
+
+Constants:
+FILLER: Words used to pad out the synthetic titles. (list of str)
+SOURCES: Domains for the synthetic posts to link to. (list of str)
+
+Classes:
+StubReddit: A stand in for a Reddit instance. (object)
+StubSubmission: A stand in for a Reddit submission. (object)
+StubSubreddit: A stand in for a subreddit. (object)
+
+Functions:
+generate_archive: Write a synthetic archive of data files. (None)
+main: Run the benchmarks and write the results. (None)
+reddit_id: Make a Reddit style id from a number. (str)
+reset_posts: Clear the class level data of the Post class. (None)
+run_benchmarks: Run the benchmarks on an archive of a given size. (dict)
+time_it: Time a function. (dict)
+"""
+
+import argparse
+import contextlib
+import datetime as dt
+import io
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+import cjr_tracker
+
+FILLER = ['the', 'a', 'of', 'in', 'for', 'new', 'state', 'county', 'report', 'says', 'after', 'court', 'judge',
+	'law', 'officers', 'program', 'years', 'study', 'finds', 'could', 'federal', 'city', 'people', 'over']
+
+SOURCES = ['www.nytimes.com', 'www.themarshallproject.org', 'theappeal.org', 'www.prisonpolicy.org',
+	'www.reddit.com', 'www.washingtonpost.com', 'apnews.com', 'www.npr.org', 'theintercept.com',
+	'www.nola.com', 'www.chicagoreporter.com', 'www.vox.com', 'www.latimes.com', 'www.cnn.com']
+
+class StubSubmission(object):
+	"""
+	A stand in for a Reddit submission. (object)
+
+	Attributes:
+	author: The Redditor who made the submission. (str)
+	created_utc: When the submission was made, in epoch seconds. (float)
+	id: The Reddit id of the submission. (str)
+	num_comments: The number of comments on the submission. (int)
+	permalink: The path of the submission on Reddit. (str)
+	score: The Reddit score of the submission. (int)
+	title: The title of the submission. (str)
+	upvote_ratio: The percentage of upvotes for the submission. (float)
+	url: The URL the submission links to. (str)
+
+	Overridden Methods:
+	__init__
+	"""
+
+	def __init__(self, number, title, rng):
+		"""
+		Set up the submission's data. (None)
+
+		Parameters:
+		number: A number to make the Reddit id from. (int)
+		title: The title of the submission. (str)
+		rng: The random number generator to use. (random.Random)
+		"""
+		self.id = reddit_id(number)
+		self.author = f'user{rng.randrange(500)}'
+		self.created_utc = time.time() - number * 60
+		self.title = title
+		self.url = f'https://{rng.choice(SOURCES)}/article/{number}'
+		self.permalink = f'/r/stub/comments/{self.id}/stub/'
+		self.score = rng.randrange(100)
+		self.upvote_ratio = round(rng.uniform(0.5, 1.0), 2)
+		self.num_comments = rng.randrange(40)
+
+class StubSubreddit(object):
+	"""
+	A stand in for a subreddit. (object)
+
+	Attributes:
+	submissions: The submissions in the subreddit, newest first. (list of StubSubmission)
+
+	Methods:
+	new: Get the newest submissions. (list of StubSubmission)
+
+	Overridden Methods:
+	__init__
+	"""
+
+	def __init__(self, submissions):
+		"""
+		Set up the subreddit's submissions. (None)
+
+		Parameters:
+		submissions: The submissions, newest first. (list of StubSubmission)
+		"""
+		self.submissions = submissions
+
+	def new(self, limit = 100, params = None):
+		"""
+		Get the newest submissions. (list of StubSubmission)
+
+		Parameters:
+		limit: The number of submissions to get, or None for all of them. (int)
+		params: Extra listing parameters, which are ignored. (dict)
+		"""
+		return self.submissions[:limit]
+
+class StubReddit(object):
+	"""
+	A stand in for a Reddit instance. (object)
+
+	Every subreddit has the same submissions, generated once with titles mixing
+	the scan keywords and filler words.
+
+	Attributes:
+	submissions: The submissions in every subreddit. (list of StubSubmission)
+
+	Methods:
+	subreddit: Get a subreddit. (StubSubreddit)
+
+	Overridden Methods:
+	__init__
+	"""
+
+	def __init__(self, keywords, count = 1000, seed = 801):
+		"""
+		Generate the submissions. (None)
+
+		Parameters:
+		keywords: The scan keywords to use in titles. (list of str)
+		count: The number of submissions to generate. (int)
+		seed: The seed for the random number generator. (int)
+		"""
+		rng = random.Random(seed)
+		words = list(keywords) + FILLER * 4
+		self.submissions = []
+		for number in range(count):
+			title = ' '.join(rng.choice(words) for word in range(rng.randrange(6, 14))).capitalize()
+			self.submissions.append(StubSubmission(number, title, rng))
+
+	def subreddit(self, name):
+		"""
+		Get a subreddit. (StubSubreddit)
+
+		Parameters:
+		name: The name of the subreddit. (str)
+		"""
+		return StubSubreddit(self.submissions)
+
+def generate_archive(folder, num_posts, valid_path = 'valid_tags.txt', keywords_path = 'keywords.txt',
+	seed = 801):
+	"""
+	Write a synthetic archive of data files. (None)
+
+	The post, tag, and name data use the same layout as the tracker's files. The
+	valid tags and the scan keywords are copied from the real files, and each
+	post gets a tag from each of the required categories and a few more.
+
+	Parameters:
+	folder: The folder to write the files in. (str)
+	num_posts: The number of posts to generate. (int)
+	valid_path: The valid tags file to copy. (str)
+	keywords_path: The keywords file to copy. (str)
+	seed: The seed for the random number generator. (int)
+	"""
+	rng = random.Random(seed)
+	shutil.copy(valid_path, os.path.join(folder, 'valid_tags.txt'))
+	shutil.copy(keywords_path, os.path.join(folder, 'keywords.txt'))
+	categories = {}
+	with open(valid_path) as valid_file:
+		for line in valid_file:
+			if not line.startswith('tag_id'):
+				tag_id, category, parent, tag = line.strip().split(',')
+				categories.setdefault(category, []).append(tag)
+	all_tags = [tag for tags in categories.values() for tag in tags]
+	with open(keywords_path) as word_file:
+		words = [line.strip() for line in word_file if line.strip()] + FILLER * 4
+	first = ['John', 'Maria', 'James', 'Ana', 'Robert', 'Linda', 'Kevin', 'Tamika', 'Walter', 'Rosa']
+	last = ['Smith', 'Garcia', 'Johnson', 'Lee', 'Barton', 'Stitt', 'Brown', 'Nguyen', 'Davis', 'Walker']
+	names = [f'{rng.choice(first)} {rng.choice(last)}{number}' for number in range(max(num_posts // 20, 10))]
+	start = dt.datetime(2020, 5, 9)
+	post_lines = ['post_id\tred_id\tdate\tsource\tposter\ttitle\tscore\tper\tcom\tnotes\turl\tpermalink\n']
+	tag_lines, name_lines = ['post_id\ttag\n'], ['post_id\tname\n']
+	for post_id in range(1, num_posts + 1):
+		date = start + dt.timedelta(minutes = post_id * 5)
+		title = ' '.join(rng.choice(words) for word in range(rng.randrange(6, 14))).capitalize()
+		notes = 'check source' if rng.random() < 0.02 else ''
+		source = rng.choice(SOURCES)
+		url = f'https://{source}/news/{post_id}'
+		permalink = f'/r/EndMassIncarceration/comments/{reddit_id(post_id)}/{title.split()[0].lower()}/'
+		post_lines.append('\t'.join([str(post_id), reddit_id(post_id), f'{date:%m/%d/%Y}', source,
+			f'user{rng.randrange(500)}', title, str(rng.randrange(100)), str(round(rng.uniform(0.5, 1.0), 2)),
+			str(rng.randrange(40)), notes, url, permalink]) + '\n')
+		tags = [rng.choice(categories[category]) for category in ('theme', 'location', 'article-types')
+			if category in categories]
+		tags.extend(rng.sample(all_tags, rng.randrange(3)))
+		tag_lines.extend(f'{post_id}\t{tag}\n' for tag in dict.fromkeys(tags))
+		name_lines.extend(f'{post_id}\t{name}\n' for name in set(rng.sample(names, rng.randrange(3))))
+	for file_name, lines in (('post_data.txt', post_lines), ('tag_data.txt', tag_lines),
+		('name_data.txt', name_lines)):
+		with open(os.path.join(folder, file_name), 'w') as data_file:
+			data_file.writelines(lines)
+
+def main():
+	"""Run the benchmarks and write the results. (None)"""
+	parser = argparse.ArgumentParser(description = 'Benchmark the hot paths of cjr_tracker.py.')
+	parser.add_argument('--posts', type = int, nargs = '+', default = [1000, 100000],
+		help = 'the archive sizes to benchmark, in posts')
+	parser.add_argument('--repeat', type = int, default = 5, help = 'the number of times to time each benchmark')
+	parser.add_argument('--output', help = 'the file to write the JSON results to (default stdout)')
+	args = parser.parse_args()
+	here = os.path.dirname(os.path.abspath(__file__))
+	results = {'version': cjr_tracker.__version__, 'python': platform.python_version(),
+		'platform': platform.platform(), 'date': f'{dt.datetime.now():%Y-%m-%d %H:%M:%S}', 'sizes': {}}
+	for num_posts in args.posts:
+		print(f'Benchmarking {num_posts} posts ...', file = sys.stderr)
+		with tempfile.TemporaryDirectory() as folder:
+			generate_archive(folder, num_posts, os.path.join(here, 'valid_tags.txt'),
+				os.path.join(here, 'keywords.txt'))
+			results['sizes'][str(num_posts)] = run_benchmarks(folder, args.repeat)
+	text = json.dumps(results, indent = 1)
+	if args.output:
+		with open(args.output, 'w') as output_file:
+			output_file.write(text)
+	else:
+		print(text)
+
+def reddit_id(number):
+	"""
+	Make a Reddit style id from a number. (str)
+
+	Parameters:
+	number: The number to make the id from. (int)
+	"""
+	digits = '0123456789abcdefghijklmnopqrstuvwxyz'
+	text = ''
+	number += 36 ** 5
+	while number:
+		number, digit = divmod(number, 36)
+		text = digits[digit] + text
+	return text
+
+def reset_posts():
+	"""Clear the class level data of the Post class. (None)"""
+	Post = cjr_tracker.Post
+	Post.num_posts = 0
+	Post.all_tags = {}
+	Post.dates = {}
+	Post.all_names = set()
+	Post.dirty = set()
+	Post.duplicates = cjr_tracker.DuplicateIndex()
+	Post.history = cjr_tracker.History()
+	Post.index = cjr_tracker.PostIndex()
+	Post.rollups = cjr_tracker.Rollups()
+	Post.search = cjr_tracker.SearchIndex()
+	Post.tagger = cjr_tracker.TagClassifier()
+	Post.tag_index = cjr_tracker.SuggestionIndex()
+	Post.tag_tree = cjr_tracker.TagTree()
+	Post.name_index = cjr_tracker.SuggestionIndex()
+
+def run_benchmarks(folder, repeat = 5):
+	"""
+	Run the benchmarks on an archive of a given size. (dict)
+
+	Parameters:
+	folder: The folder with the archive. (str)
+	repeat: The number of times to time each benchmark. (int)
+	"""
+	rng = random.Random(801)
+	results = {}
+	base_folder = os.getcwd()
+	os.chdir(folder)
+	try:
+		# Time loading, both parsing the files and from the snapshot.
+		def load_cold():
+			if os.path.exists(cjr_tracker.CACHE_PATH):
+				os.remove(cjr_tracker.CACHE_PATH)
+			reset_posts()
+			return cjr_tracker.load_local()
+		def load_warm():
+			reset_posts()
+			return cjr_tracker.load_local()
+		results['load_local_parse'] = time_it(load_cold, repeat)
+		results['load_local_snapshot'] = time_it(load_warm, repeat)
+		posts, valid_tags = load_warm()
+		cjr_tracker.Post.all_tags = valid_tags
+		cjr_tracker.Post.tag_tree = cjr_tracker.TagTree(valid_tags)
+		tracker = cjr_tracker.Tracker()
+		tracker.local_posts, tracker.store = posts, cjr_tracker.Journal()
+		tracker.current_list, tracker.current_index, tracker.page_size = [], 0, 15
+		# Time saving the data files.
+		results['save_posts'] = time_it(tracker.save_posts, repeat)
+		results['save_tags'] = time_it(tracker.save_tags, repeat)
+		results['save_names'] = time_it(tracker.save_names, repeat)
+		# Time the string matching.
+		names = sorted(cjr_tracker.Post.all_names)
+		tags = sorted(valid_tags)
+		pairs = [(rng.choice(names), rng.choice(names)) for pair in range(1000)]
+		results['levenshtein_1000'] = time_it(lambda: [cjr_tracker.levenshtein(a, b) for a, b in pairs], repeat)
+		results['suggestion_index_build'] = time_it(lambda: (cjr_tracker.SuggestionIndex(valid_tags),
+			cjr_tracker.SuggestionIndex(cjr_tracker.Post.all_names)), repeat)
+		cjr_tracker.Post.tag_index = cjr_tracker.SuggestionIndex(valid_tags)
+		cjr_tracker.Post.name_index = cjr_tracker.SuggestionIndex(cjr_tracker.Post.all_names)
+		post = posts[1]
+		typos = [tag[:-1] + 'x' for tag in rng.sample(tags, min(len(tags), 20))]
+		results['suggest_tags_20'] = time_it(lambda: [post.suggest_tags(tag) for tag in typos], repeat)
+		typos = [name[1:] for name in rng.sample(names, min(len(names), 20))]
+		results['suggest_names_20'] = time_it(lambda: [post.suggest_names(name) for name in typos], repeat)
+		# Time listing and paging through the local posts.
+		def page_through():
+			with contextlib.redirect_stdout(io.StringIO()):
+				tracker.do_list('local')
+				for page in range(100):
+					tracker.do_forward('')
+				tracker.do_end('')
+				tracker.do_list('local source=www.nytimes.com score>50')
+		results['list_pages_100'] = time_it(page_through, repeat)
+		sample = [posts[post_id] for post_id in rng.sample(range(1, cjr_tracker.Post.num_posts + 1),
+			min(cjr_tracker.Post.num_posts, 1000))]
+		def check_tags():
+			with contextlib.redirect_stdout(io.StringIO()):
+				for post in sample:
+					tracker.tag_check(post)
+		results['tag_check_1000'] = time_it(check_tags, repeat)
+		results['excel_round_trip_10000'] = time_it(
+			lambda: [cjr_tracker.from_excel(cjr_tracker.excel_col(number)) for number in range(1, 10001)], repeat)
+		# Time scanning subreddits, with a stub for Reddit. The duplicate index is built first, so only
+		# the checks of the listed matches are timed.
+		cjr_tracker.Post.duplicates.build(posts)
+		tracker.keywords = cjr_tracker.load_keywords()
+		stub = StubReddit(sorted(tracker.keywords))
+		load_reddit = cjr_tracker.load_reddit
+		cjr_tracker.load_reddit = lambda *args, **kwargs: stub
+		def scan():
+			tracker.submission_cache = cjr_tracker.SubmissionCache('stub_cache.bin')
+			tracker.scan_local = cjr_tracker.threading.local()
+			with contextlib.redirect_stdout(io.StringIO()):
+				tracker.do_scan('news politics law 1000')
+		try:
+			results['scan_3x1000'] = time_it(scan, repeat)
+		finally:
+			cjr_tracker.load_reddit = load_reddit
+	finally:
+		os.chdir(base_folder)
+		reset_posts()
+	return results
+
+def time_it(function, repeat = 5):
+	"""
+	Time a function. (dict)
+
+	The return value has the best, median, and worst times in seconds.
+
+	Parameters:
+	function: The function to time, which takes no arguments. (callable)
+	repeat: The number of times to time the function. (int)
+	"""
+	times = []
+	for run in range(repeat):
+		start = time.perf_counter()
+		function()
+		times.append(time.perf_counter() - start)
+	return {'best': min(times), 'median': statistics.median(times), 'worst': max(times), 'repeat': repeat}
+
+if __name__ == '__main__':
+	main()
@@ -3,6 +3,9 @@ cjr_tracker.py
 
 A Python script for tracking r/EndMassIncarceration posts.
 
+Run with --batch to load and tag new posts from the rules in tag_rules.txt
+without any prompts, as from cron. A JSON summary is printed when done.
+
 To Do:
 improved tagging
 	command for adding tags to valid tag list
@@ -10,332 +13,3645 @@ status command
 
 Constants:
 ACCESS_KWARGS: The standard access credentials. (dict of str: str)
+CACHE_PATH: The snapshot of the parsed data files. (str)
+CACHE_VERSION: The version of the snapshot format. (int)
+DATA_FILES: The flat data files the snapshot is made from. (tuple of str)
 DATA_START: The date that data collection started. (datetime.datetime)
+DUPLICATES_PATH: The saved index for finding duplicate posts. (str)
+EXPORT_CHUNK_SIZE: The number of posts exported at a time. (int)
+EXPORT_COLUMNS: The fields of each exported post. (tuple of str)
+EXPORT_FORMATS: The export format for each file extension. (dict of str: str)
+EXPORT_MAGIC: The start of a file in the compact binary export format. (bytes)
+HISTORY_PATH: The history of post statistics. (str)
+RULES_PATH: The rules for tagging posts in batch mode. (str)
+SCAN_PATH: The subreddits scanned by scan saved. (str)
+SCAN_WORKERS: The most subreddits to scan at the same time. (int)
+SEARCH_PATH: The saved full-text index of the posts. (str)
+SHARDS_PATH: The subreddits tracked, with where their data is kept. (str)
+STATE_PATH: The polling state saved between sessions. (str)
+SUBMISSION_CACHE_PATH: The cache of Reddit submissions. (str)
+SQLITE_PATH: The database used for SQLite storage, if it exists. (str)
+TRACKING_PARAMETERS: URL parameters that do not change the page linked to. (set of str)
 
 Classes:
+AsyncReddit: Reddit access on a background event loop. (object)
+CachedSubmission: The data the tracker uses from a Reddit submission. (object)
+DuplicateIndex: An index for finding posts that are likely the same story. (object)
+History: A time series of post statistics. (object)
+Journal: An append-only log of changes to the local data. (object)
+Perf: Opt-in timing of commands, Reddit requests, and loading and saving. (object)
 Post: A post on r/EndMassIncarceration. (object)
+PostIndex: Inverted indexes of local posts. (object)
+PostRange: A lazily loaded sequence of local posts. (object)
+PostStore: The local posts, stored once and looked up by id. (object)
+RequestScheduler: Pacing of Reddit requests from every thread, by priority. (object)
+Rollups: Engagement totals for groups of local posts. (object)
+SQLitePosts: Posts loaded from an SQLite database as needed. (object)
+SearchIndex: A ranked full-text index of post titles and notes. (object)
+Shard: The local data for one tracked subreddit. (object)
+SQLiteStore: Storage of the local data in an SQLite database. (object)
+SubmissionCache: A persistent cache of Reddit submissions. (object)
+SuggestionIndex: An index of strings for suggesting close matches. (object)
+TagClassifier: A naive Bayes model for suggesting tags from a post's title and source. (object)
+TagRules: Rules for tagging new posts without prompting. (object)
+TagTree: The hierarchy of valid tags. (object)
+TimedRequestor: A requestor that paces Reddit requests, and times them if asked. (prawcore.Requestor)
 Tracker: An interface for tracking r/EndMassIncarceration. (cmdr.Cmdr)
 
 Functions:
-check_cjr: Check for new posts in r/EndMassIncarceration. (list of Submission)
+backfill_links: Fill in the link URLs and permalinks of posts without them. (int)
+canonical_url: Reduce a URL to a canonical form for finding duplicate links. (str)
+check_cjr: Check for new posts in a tracked subreddit. (list of Submission)
 excel_col: Return the excel column id for a given integer. (str)
+export_chunks: Group post rows into chunks of columns. (generator of dict)
+export_posts: Stream the local posts to a file for analysis. (int)
+fetch_cjr: Fetch the listing of new posts in a tracked subreddit. (list)
 from_excel: Return an integer from a given excel column. (str)
 levenshtein: Determine the Levenshtein distance between two strings. (int)
+load_cache: Load the snapshot of the data files, if it is current. (tuple)
 load_keywords: Load the key words for subreddit scanning. (set of str)
 load_local: Load the local data. (dict)
 load_reddit: Open a line into Reddit. (praw.Reddit)
+load_scan_list: Load the subreddits saved for scanning. (list of str)
+load_shards: Load the subreddits to track, and where their data is kept. (list of Shard)
+load_snapshot: Load the data files, or the cached snapshot of them. (tuple)
+load_state: Load the polling state saved from the last session. (dict)
+load_submissions: Load submissions by Reddit id, from the cache if possible. (list)
+poll_new: Get the submissions newer than the newest one seen. (list of Submission)
+read_export: Read back a file written in the compact binary export format. (generator of dict)
+refresh_posts: Update posts with current Reddit statistics. (int)
+save_cache: Save a snapshot of the data files. (None)
+save_state: Save the polling state for the next session. (None)
+write_arrow: Write chunks of posts as an Arrow stream or a Parquet file. (int)
+write_atomic: Write a data file without risking a partially written file. (None)
+write_binary: Write chunks of posts in a compact binary format. (int)
+write_ndjson: Write chunks of posts as newline-delimited JSON. (int)
 """
 
+import argparse
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+import array
+import asyncio
+import bisect
+import collections
+import contextlib
+import cProfile
 import datetime as dt
+import gc
+import heapq
+import itertools
+import json
+import marshal
 import math
+import operator
+import os
 import praw
+import prawcore
+import pstats
+import queue
+import random
 import re
+import shlex
+import sqlite3
+import struct
+import sys
+import threading
+import time
 from urllib.parse import urlparse
 import webbrowser
+import zlib
 
 import cmdr
 
+try:
+	import numpy as np
+except ImportError:
+	np = None
+
+try:
+	import pyarrow as pa
+	import pyarrow.parquet as pq
+except ImportError:
+	pa = pq = None
+
 __author__ = 'Craig "Ichabod" O\'Brien'
 
-__version__ = 'v1.6.7a1'
+__version__ = 'v1.6.7a1'
+
+ACCESS_KWARGS = {'client_id': 'jy2JWMnhs2ZrSA', 'client_secret': 'LsnszIp9j_vVl9cvPDbEPemdyCg',
+	'user_agent': f'windows:cjr_tracker:{__version__} (by u/ichabod801)'}
+
+DATA_START = dt.datetime(2020, 4, 1)
+
+SQLITE_PATH = 'cjr_data.db'
+
+CACHE_PATH = 'local_cache.bin'
+
+CACHE_VERSION = 2
+
+DATA_FILES = ('post_data.txt', 'tag_data.txt', 'name_data.txt', 'valid_tags.txt')
+
+DUPLICATES_PATH = 'duplicates.bin'
+
+EXPORT_CHUNK_SIZE = 10000
+
+EXPORT_COLUMNS = ('post_id', 'reddit_id', 'date', 'source', 'poster', 'title', 'score', 'per_up', 'comments', 'notes',
+	'url', 'permalink', 'tags', 'names')
+
+EXPORT_FORMATS = {'.arrow': 'arrow', '.cjrx': 'binary', '.jsonl': 'ndjson', '.ndjson': 'ndjson', '.parquet': 'parquet'}
+
+EXPORT_MAGIC = b'CJRX\x02'
+
+HISTORY_PATH = 'history.bin'
+
+RULES_PATH = 'tag_rules.txt'
+
+SCAN_PATH = 'scan_list.txt'
+
+SCAN_WORKERS = 4
+
+SEARCH_PATH = 'search_index.bin'
+
+SHARDS_PATH = 'shards.txt'
+
+STATE_PATH = 'tracker_state.json'
+
+SUBMISSION_CACHE_PATH = 'submission_cache.bin'
+
+TRACKING_PARAMETERS = {'_ga', 'amp', 'cmpid', 'dclid', 'fbclid', 'gclid', 'igshid', 'mc_cid', 'mc_eid', 'ocid',
+	'outputtype', 'ref', 'ref_src', 'smid', 'smtyp', 'share', 'src', 'taid', 'cid'}
+
+LETTERS = 'ABCDEFGHIJKLMNOPQRSTUVWXYZ'
+
+class SubmissionCache(object):
+	"""
+	A persistent cache of Reddit submissions. (object)
+
+	The cache keeps the data the tracker uses from each submission it has seen,
+	keyed by Reddit id, and the ids in recently fetched listings. Different data
+	goes stale at different rates: the date, author, title, and links never
+	change, the score, upvote ratio, and comment count are good for stats_ttl
+	seconds, and listings are good for listing_ttl seconds.
+
+	Attributes:
+	changed: A flag for the cache having unsaved changes. (bool)
+	listings: When each listing was fetched, and its ids. (dict of str: tuple)
+	lock: A lock for using the cache from several threads. (threading.Lock)
+	path: The file the cache is stored in. (str)
+	submissions: The cached submission data. (dict of str: tuple)
+
+	Class Attributes:
+	listing_ttl: How many seconds a listing is good for. (int)
+	stats_ttl: How many seconds submission statistics are good for. (int)
+	version: The version of the cache file format. (int)
+
+	Methods:
+	add: Add a submission to the cache. (CachedSubmission)
+	add_listing: Add a fetched listing to the cache. (list of CachedSubmission)
+	get: Get a submission from the cache. (CachedSubmission or None)
+	get_listing: Get a listing from the cache. (list of CachedSubmission or None)
+	save: Save the cache to disk. (None)
+
+	Overridden Methods:
+	__init__
+	"""
+
+	listing_ttl = 300
+	stats_ttl = 600
+	version = 1
+
+	def __init__(self, path = SUBMISSION_CACHE_PATH):
+		"""
+		Load the cache from disk. (None)
+
+		Parameters:
+		path: The file the cache is stored in. (str)
+		"""
+		self.path = path
+		self.lock = threading.Lock()
+		self.submissions, self.listings = {}, {}
+		self.changed = False
+		try:
+			with open(path, 'rb') as cache_file:
+				version, self.submissions, self.listings = marshal.loads(cache_file.read())
+		except (OSError, EOFError, ValueError, TypeError):
+			pass
+		else:
+			if version != self.version:
+				self.submissions, self.listings = {}, {}
+
+	def add(self, submission):
+		"""
+		Add a submission to the cache. (CachedSubmission)
+
+		Parameters:
+		submission: A submission from Reddit. (praw.Submission)
+		"""
+		row = (submission.created_utc, str(submission.author), submission.title, submission.url,
+			submission.permalink, submission.score, submission.upvote_ratio, submission.num_comments,
+			time.time())
+		with self.lock:
+			self.submissions[submission.id] = row
+			self.changed = True
+		return CachedSubmission(submission.id, row)
+
+	def add_listing(self, key, submissions):
+		"""
+		Add a fetched listing to the cache. (list of CachedSubmission)
+
+		Parameters:
+		key: The name of the listing. (str)
+		submissions: The submissions in the listing. (iterable of praw.Submission)
+		"""
+		cached = [self.add(submission) for submission in submissions]
+		with self.lock:
+			self.listings[key] = (time.time(), [submission.id for submission in cached])
+		return cached
+
+	def get(self, reddit_id, stats = False):
+		"""
+		Get a submission from the cache. (CachedSubmission or None)
+
+		Parameters:
+		reddit_id: The Reddit id of the submission. (str)
+		stats: A flag for requiring current statistics. (bool)
+		"""
+		row = self.submissions.get(reddit_id)
+		if row is None or (stats and time.time() - row[-1] > self.stats_ttl):
+			return None
+		return CachedSubmission(reddit_id, row)
+
+	def get_listing(self, key):
+		"""
+		Get a listing from the cache, if it is current. (list of CachedSubmission or None)
+
+		Parameters:
+		key: The name of the listing. (str)
+		"""
+		fetched, reddit_ids = self.listings.get(key, (0, []))
+		if time.time() - fetched > self.listing_ttl:
+			return None
+		return [self.get(reddit_id) for reddit_id in reddit_ids if reddit_id in self.submissions]
+
+	def save(self):
+		"""Save the cache to disk. (None)"""
+		with self.lock:
+			if not self.changed:
+				return
+			data = marshal.dumps((self.version, self.submissions, self.listings))
+			self.changed = False
+		temp_path = f'{self.path}.tmp'
+		try:
+			with open(temp_path, 'wb') as cache_file:
+				cache_file.write(data)
+			os.replace(temp_path, self.path)
+		except OSError:
+			pass
+
+class SuggestionIndex(object):
+	"""
+	An index of strings for suggesting close matches. (object)
+
+	The index maps bigrams of the padded strings to the strings containing them.
+	Every edit changes at most two bigrams, so the number of bigrams two strings
+	share gives a lower bound on their Levenshtein distance. Candidates are
+	checked in order of that bound (tightened by comparing letter counts), and
+	the search stops once no unchecked string can beat the current suggestions.
+
+	Attributes:
+	ids: The ids of the indexed strings. (dict of str: int)
+	lengths: The ids of the indexed strings by string length. (dict of int: list)
+	postings: Counts of each bigram in the indexed strings. (dict of str: dict)
+	words: The indexed strings, indexed by id. (list of str)
+
+	Methods:
+	add: Add a string to the index. (bool)
+	bigrams: Count the bigrams in a string. (dict of str: int)
+	letters: Count the letters in a string. (dict of str: int)
+	suggest: Find the closest matches to a string. (list of str)
+
+	Overridden Methods:
+	__init__
+	__contains__
+	__len__
+	"""
+
+	def __init__(self, words = ()):
+		"""
+		Build the index from some strings. (None)
+
+		Parameters:
+		words: The strings to index. (iterable of str)
+		"""
+		self.words = []
+		self.ids = {}
+		self.postings = {}
+		self.lengths = {}
+		for word in words:
+			self.add(word)
+
+	def __contains__(self, word):
+		"""Check for a string in the index. (bool)"""
+		return word in self.ids
+
+	def __len__(self):
+		"""The number of strings in the index. (int)"""
+		return len(self.words)
+
+	def add(self, word):
+		"""
+		Add a string to the index. (bool)
+
+		The return value is a flag indicating that the string was not already in
+		the index.
+
+		Parameters:
+		word: The string to add. (str)
+		"""
+		if word in self.ids:
+			return False
+		word_id = len(self.words)
+		self.words.append(word)
+		self.ids[word] = word_id
+		for gram, count in self.bigrams(word).items():
+			self.postings.setdefault(gram, {})[word_id] = count
+		self.lengths.setdefault(len(word), []).append(word_id)
+		return True
+
+	@staticmethod
+	def bigrams(word):
+		"""
+		Count the bigrams in a string, padded at each end. (dict of str: int)
+
+		Parameters:
+		word: The string to count bigrams in. (str)
+		"""
+		padded = f'\0{word}\0'
+		counts = {}
+		for index in range(len(padded) - 1):
+			gram = padded[index:index + 2]
+			counts[gram] = counts.get(gram, 0) + 1
+		return counts
+
+	@staticmethod
+	def letters(word):
+		"""
+		Count the letters in a string. (dict of str: int)
+
+		Parameters:
+		word: The string to count letters in. (str)
+		"""
+		counts = {}
+		for letter in word:
+			counts[letter] = counts.get(letter, 0) + 1
+		return counts
+
+	def suggest(self, text, n = 5):
+		"""
+		Find the closest matches to a string. (list of str)
+
+		The matches are the same as sorting all of the indexed strings by distance
+		and then alphabetically, and taking the first n.
+
+		Parameters:
+		text: The string to find matches for. (str)
+		n: How many matches to return. (int)
+		"""
+		# Count the bigrams shared with each string that shares any.
+		shared = {}
+		for gram, count in self.bigrams(text).items():
+			for word_id, word_count in self.postings.get(gram, {}).items():
+				shared[word_id] = shared.get(word_id, 0) + min(count, word_count)
+		# Queue those strings and the lengths of the others by lower bound.
+		size = len(text)
+		queue = []
+		for word_id, common in shared.items():
+			length = len(self.words[word_id])
+			bound = max(abs(size - length), (max(size, length) + 2 - common) // 2)
+			queue.append((bound, False, word_id))
+		for length in self.lengths:
+			bound = max(abs(size - length), (max(size, length) + 2) // 2)
+			queue.append((bound, False, -length - 1))
+		heapq.heapify(queue)
+		# Check the candidates until none of them can beat the current matches.
+		letters = self.letters(text)
+		found, worst = [], []
+		while queue:
+			bound, refined, key = heapq.heappop(queue)
+			if len(worst) == n and bound > -worst[0]:
+				break
+			if key < 0:
+				# Queue the strings of a given length that share no bigrams.
+				for word_id in self.lengths[-key - 1]:
+					if word_id not in shared:
+						heapq.heappush(queue, (bound, False, word_id))
+				continue
+			word = self.words[key]
+			if not refined:
+				# Each edit changes the count of at most one letter in each string.
+				extra_word = 0
+				for letter, count in self.letters(word).items():
+					extra_word += max(count - letters.get(letter, 0), 0)
+				extra_text = size - len(word) + extra_word
+				letter_bound = max(extra_text, extra_word)
+				if letter_bound > bound:
+					heapq.heappush(queue, (letter_bound, True, key))
+					continue
+			limit = -worst[0] if len(worst) == n else None
+			distance = levenshtein(text, word, limit)
+			if limit is not None and distance > limit:
+				continue
+			found.append((distance, word))
+			if len(worst) < n:
+				heapq.heappush(worst, -distance)
+			else:
+				heapq.heappushpop(worst, -distance)
+		return [word for distance, word in heapq.nsmallest(n, found)]
+
+class AsyncReddit(object):
+	"""
+	Reddit access on a background event loop. (object)
+
+	Jobs are coroutines on an asyncio event loop running in a daemon thread. Each
+	job runs a function that takes a Reddit instance in a pool of worker threads
+	(each with its own Reddit instance, since PRAW is synchronous), so several
+	jobs can wait on the network at once while the command loop stays responsive.
+	When a job finishes, its kind, arguments, result, and any error are put in a
+	thread-safe queue for the tracker to pick up. The requests of each job are
+	made in the scheduler lane for its kind.
+
+	Attributes:
+	executor: The worker threads that make the requests. (ThreadPoolExecutor)
+	jobs: The jobs that have not finished. (set of concurrent.futures.Future)
+	local: Per thread Reddit connections. (threading.local)
+	loop: The background event loop. (asyncio.AbstractEventLoop)
+	results: The results of finished jobs. (queue.Queue)
+	thread: The thread running the event loop. (threading.Thread)
+
+	Class Attributes:
+	lanes: The scheduler lane for each kind of job, if not background. (dict of str: str)
+
+	Methods:
+	call: Call a function with this thread's Reddit instance. (object)
+	close: Stop the event loop and the worker threads. (None)
+	finished: Get the results of the jobs finished so far. (generator)
+	run: Run a job and queue its result. (coroutine)
+	submit: Start a job in the background. (concurrent.futures.Future)
+
+	Overridden Methods:
+	__init__
+	__len__
+	"""
+
+	lanes = {'open': 'interactive', 'prefetch': 'prefetch'}
+
+	def __init__(self, workers = SCAN_WORKERS):
+		"""
+		Start the event loop and the worker threads. (None)
+
+		Parameters:
+		workers: The most jobs to run at the same time. (int)
+		"""
+		self.executor = ThreadPoolExecutor(max_workers = workers)
+		self.jobs = set()
+		self.local = threading.local()
+		self.results = queue.Queue()
+		self.loop = asyncio.new_event_loop()
+		self.thread = threading.Thread(target = self.loop.run_forever, daemon = True)
+		self.thread.start()
+
+	def __len__(self):
+		"""The number of jobs that have not finished. (int)"""
+		return len(self.jobs)
+
+	def call(self, kind, function, *args):
+		"""
+		Call a function with this thread's Reddit instance. (object)
+
+		Parameters:
+		kind: The kind of job, which sets the scheduler lane. (str)
+		function: The function to call, with Reddit as the first argument. (callable)
+		args: The rest of the arguments to the function. (tuple)
+		"""
+		if not hasattr(self.local, 'reddit'):
+			self.local.reddit = load_reddit()
+		with Tracker.scheduler.lane(self.lanes.get(kind, 'background')):
+			return function(self.local.reddit, *args)
+
+	def close(self):
+		"""Stop the event loop and the worker threads. (None)"""
+		self.loop.call_soon_threadsafe(self.loop.stop)
+		self.executor.shutdown(wait = False, cancel_futures = True)
+
+	def finished(self):
+		"""Get the results of the jobs finished so far. (generator of tuple)"""
+		while True:
+			try:
+				yield self.results.get_nowait()
+			except queue.Empty:
+				break
+
+	async def run(self, kind, function, args):
+		"""
+		Run a job and queue its result. (coroutine)
+
+		Parameters:
+		kind: The kind of job. (str)
+		function: The function to call, with Reddit as the first argument. (callable)
+		args: The rest of the arguments to the function. (tuple)
+		"""
+		try:
+			result = await self.loop.run_in_executor(self.executor, self.call, kind, function, *args)
+		except Exception as err:
+			# Any failure is passed on, so deliver can report it instead of the job vanishing.
+			self.results.put((kind, args, None, err))
+		else:
+			self.results.put((kind, args, result, None))
+
+	def submit(self, kind, function, *args):
+		"""
+		Start a job in the background. (concurrent.futures.Future)
+
+		Parameters:
+		kind: The kind of job, used to handle its result. (str)
+		function: The function to call, with Reddit as the first argument. (callable)
+		args: The rest of the arguments to the function. (tuple)
+		"""
+		future = asyncio.run_coroutine_threadsafe(self.run(kind, function, args), self.loop)
+		self.jobs.add(future)
+		future.add_done_callback(self.jobs.discard)
+		return future
+
+class CachedSubmission(object):
+	"""
+	The data the tracker uses from a Reddit submission. (object)
+
+	This has the same attributes as a praw Submission for the data it holds, so it
+	can be used in place of one.
+
+	Attributes:
+	author: The name of the Redditor who made the submission. (str)
+	created_utc: When the submission was made. (float)
+	id: The Reddit id of the submission. (str)
+	num_comments: The number of comments on the submission. (int)
+	permalink: The path of the submission on Reddit. (str)
+	score: The Reddit score of the submission. (int)
+	stats_time: When the score, upvote ratio, and comments were fetched. (float)
+	title: The title of the submission. (str)
+	upvote_ratio: The percentage of upvotes for the submission. (float)
+	url: The URL the submission links to. (str)
+
+	Methods:
+	row: The submission's data, for storing in the cache. (tuple)
+
+	Overridden Methods:
+	__init__
+	"""
+
+	__slots__ = ('author', 'created_utc', 'id', 'num_comments', 'permalink', 'score', 'stats_time', 'title',
+		'upvote_ratio', 'url')
+
+	def __init__(self, reddit_id, row):
+		"""
+		Set up the submission's data. (None)
+
+		Parameters:
+		reddit_id: The Reddit id of the submission. (str)
+		row: The submission's data, as returned by the row method. (tuple)
+		"""
+		self.id = reddit_id
+		(self.created_utc, self.author, self.title, self.url, self.permalink, self.score, self.upvote_ratio,
+			self.num_comments, self.stats_time) = row
+
+	def row(self):
+		"""The submission's data, for storing in the cache. (tuple)"""
+		return (self.created_utc, self.author, self.title, self.url, self.permalink, self.score,
+			self.upvote_ratio, self.num_comments, self.stats_time)
+
+class DuplicateIndex(object):
+	"""
+	An index for finding posts that are likely the same story. (object)
+
+	There are two parts. The first maps the canonical URL of each post's link
+	(see canonical_url) to the post. The second is locality sensitive hashing of
+	the titles: each title is broken into overlapping shingles of characters,
+	and a MinHash signature of the shingles is split into bands. Each band is
+	hashed into a bucket, and posts sharing any bucket are candidates, which are
+	checked by the actual overlap of their shingles. So a submission is checked
+	against the whole archive with a fixed number of lookups.
+
+	The index is built from all of the posts the first time it is needed, and
+	saved in DUPLICATES_PATH along with a fingerprint of the posts. After that it
+	is loaded from there if the fingerprint still matches, and new posts are
+	added to it as they are made.
+
+	Attributes:
+	buckets: The ids of the posts in each band bucket. (dict of int: list of int)
+	changed: A flag for the index having unsaved changes. (bool)
+	loaded: A flag for the index having been built or loaded. (bool)
+	path: The file the index is saved in. (str)
+	urls: The id of the post linking to each canonical URL. (dict of str: int)
+
+	salts: The multipliers and offsets of the MinHash hash functions. (list of tuple)
+
+	Class Attributes:
+	bands: The number of bands each signature is split into. (int)
+	prime: The modulus of the MinHash hash functions. (int)
+	rows: The number of signature values in each band. (int)
+	shingle_size: The number of characters in a title shingle. (int)
+	threshold: The least shingle overlap for titles to be duplicates. (float)
+	version: The version of the index file format. (int)
+
+	Methods:
+	add: Add a post to the index. (None)
+	band_keys: Get the bucket keys for a title. (list of int)
+	build: Build the index from all of the local posts. (None)
+	load: Load or build the index, if it is not loaded. (None)
+	match: Find the posts that are likely the same story. (list of int)
+	save: Save the index, if it has changed. (None)
+	shingles: Break a title into overlapping shingles. (set of str)
+	signature: Get the MinHash signature of a set of shingles. (list of int)
+
+	Overridden Methods:
+	__init__
+	"""
+
+	bands = 6
+	prime = (1 << 31) - 1
+	rows = 3
+	shingle_size = 5
+	threshold = 0.5
+	version = 2
+
+	def __init__(self, path = DUPLICATES_PATH):
+		"""
+		Set up an empty index. (None)
+
+		Parameters:
+		path: The file the index is saved in. (str)
+		"""
+		self.path = path
+		# The hash functions must be the same every time, to match the saved index.
+		generator = random.Random(801)
+		self.salts = [(generator.randrange(1, self.prime), generator.randrange(self.prime))
+			for salt in range(self.bands * self.rows)]
+		self.buckets = {}
+		self.urls = {}
+		self.changed = False
+		self.loaded = False
+
+	def add(self, post_id, title, url = None):
+		"""
+		Add a post to the index. (None)
+
+		Parameters:
+		post_id: The local id of the post. (int)
+		title: The title of the post. (str)
+		url: The URL the post links to, if known. (str or None)
+		"""
+		if url:
+			self.urls.setdefault(canonical_url(url), post_id)
+		for key in self.band_keys(title):
+			bucket = self.buckets.setdefault(key, [])
+			if post_id not in bucket:
+				bucket.append(post_id)
+		self.changed = True
+
+	def band_keys(self, title):
+		"""
+		Get the bucket keys for a title. (list of int)
+
+		Parameters:
+		title: The title to get the keys for. (str)
+		"""
+		shingles = self.shingles(title)
+		if not shingles:
+			return []
+		signature = self.signature(shingles)
+		return [hash((band,) + tuple(signature[(band * self.rows):((band + 1) * self.rows)]))
+			for band in range(self.bands)]
+
+	def build(self, posts, urls = None):
+		"""
+		Build the index from all of the local posts. (None)
+
+		Parameters:
+		posts: The local posts. (iterable of Post)
+		urls: A function giving the URL of a Reddit id, or None if unknown, for
+			posts without their links. (callable)
+		"""
+		self.buckets = {}
+		self.urls = {}
+		for post in posts:
+			url = post.url or (urls(post.reddit_id) if urls else None)
+			self.add(post.post_id, post.title, url)
+		self.loaded = True
+
+	def load(self, posts, urls = None):
+		"""
+		Load or build the index, if it is not loaded. (None)
+
+		Parameters:
+		posts: The local posts. (PostStore or SQLitePosts)
+		urls: A function giving the URL of a Reddit id, or None if unknown. (callable)
+		"""
+		if self.loaded:
+			return
+		count = Post.num_posts
+		fingerprint = (count, posts.reddit_id(count) if count else '')
+		try:
+			with open(self.path, 'rb') as index_file:
+				version, saved_print, buckets, saved_urls = marshal.loads(index_file.read())
+		except (OSError, EOFError, ValueError, TypeError):
+			version = None
+		if version == self.version and tuple(saved_print) == fingerprint:
+			self.buckets, self.urls = buckets, saved_urls
+			self.changed = False
+			self.loaded = True
+		else:
+			self.build(posts.select(), urls)
+
+	def match(self, title, url = None, posts = None, exclude = None):
+		"""
+		Find the posts that are likely the same story. (list of int)
+
+		Posts linking to the same canonical URL come first. Posts sharing a bucket
+		with the title are then included if the overlap of their shingles is at
+		least the threshold, best first. Without the posts to check the titles
+		against, every post sharing a bucket is included.
+
+		Parameters:
+		title: The title of the submission to check. (str)
+		url: The URL the submission links to, if known. (str or None)
+		posts: The local posts, for checking the titles of candidates. (PostStore or SQLitePosts)
+		exclude: The local id of the post being checked, if it is indexed. (int)
+		"""
+		matches = []
+		if url:
+			post_id = self.urls.get(canonical_url(url))
+			if post_id is not None and post_id != exclude:
+				matches.append(post_id)
+		candidates = set()
+		for key in self.band_keys(title):
+			candidates.update(self.buckets.get(key, ()))
+		candidates.discard(exclude)
+		candidates.difference_update(matches)
+		if posts is None:
+			return matches + sorted(candidates)
+		shingles = self.shingles(title)
+		scored = []
+		for post_id in candidates:
+			other = self.shingles(posts[post_id].title)
+			overlap = len(shingles & other) / len(shingles | other)
+			if overlap >= self.threshold:
+				scored.append((-overlap, post_id))
+		return matches + [post_id for overlap, post_id in sorted(scored)]
+
+	def save(self, posts):
+		"""
+		Save the index, if it has changed. (None)
+
+		Parameters:
+		posts: The local posts, as saved. (PostStore or SQLitePosts)
+		"""
+		if not (self.loaded and self.changed):
+			return
+		count = Post.num_posts
+		fingerprint = (count, posts.reddit_id(count) if count else '')
+		temp_path = f'{self.path}.tmp'
+		try:
+			with open(temp_path, 'wb') as index_file:
+				index_file.write(marshal.dumps((self.version, fingerprint, self.buckets, self.urls)))
+			os.replace(temp_path, self.path)
+		except OSError:
+			pass
+		self.changed = False
+
+	def shingles(self, title):
+		"""
+		Break a title into overlapping shingles of characters. (set of str)
+
+		The title is reduced to its lower case words, so punctuation and spacing
+		do not matter.
+
+		Parameters:
+		title: The title to break up. (str)
+		"""
+		text = ' '.join(SearchIndex.token_re.findall(title.lower()))
+		if len(text) <= self.shingle_size:
+			return {text} if text else set()
+		return {text[start:(start + self.shingle_size)] for start in range(len(text) - self.shingle_size + 1)}
+
+	def signature(self, shingles):
+		"""
+		Get the MinHash signature of a set of shingles. (list of int)
+
+		Parameters:
+		shingles: The shingles to get the signature of. (set of str)
+		"""
+		hashes = [zlib.crc32(shingle.encode('utf-8')) for shingle in shingles]
+		if np is not None:
+			values = np.array(hashes, dtype = np.uint64)
+			multipliers = np.array([salt[0] for salt in self.salts], dtype = np.uint64)
+			offsets = np.array([salt[1] for salt in self.salts], dtype = np.uint64)
+			minimums = ((np.outer(multipliers, values) + offsets[:, None]) % self.prime).min(axis = 1)
+			return minimums.tolist()
+		return [min((multiplier * value + offset) % self.prime for value in hashes)
+			for multiplier, offset in self.salts]
+
+class History(object):
+	"""
+	A time series of post statistics. (object)
+
+	A snapshot of a post's score, upvote ratio, and comment count is appended to
+	the history file whenever refreshing the post changes them. Each snapshot is
+	a fixed width binary record, and in memory each post's snapshots are kept in
+	typed arrays, one per statistic. The history is only read from disk when it
+	is first queried. Downsampling thins out old snapshots, keeping the last one
+	in each interval of each tier.
+
+	The upvote ratio is stored in hundredths of a percent.
+
+	Attributes:
+	buffer: Snapshots that have not been written yet. (bytearray)
+	path: The path to the history file. (str)
+	series: The arrays of snapshots for each post, or None if not read yet. (dict of int: tuple)
+
+	Class Attributes:
+	record_format: The layout of a snapshot in the history file. (struct.Struct)
+	tiers: The age and interval in seconds for each downsampling tier. (tuple of tuple)
+
+	Methods:
+	add: Add a snapshot to the arrays in memory. (None)
+	bucket: Get the downsampling interval a snapshot falls in. (tuple or None)
+	downsample: Thin out old snapshots and rewrite the history file. (int)
+	flush: Write any buffered snapshots to the history file. (None)
+	gainers: Find the posts that gained points recently. (list of tuple)
+	load: Read the history file, if it has not been read yet. (None)
+	record: Record a snapshot of a post's statistics. (None)
+	trajectory: Get the snapshots for a post. (list of tuple)
+
+	Overridden Methods:
+	__init__
+	__len__
+	"""
+
+	record_format = struct.Struct('<IIiHI')
+	tiers = ((2 * 86400, 3600), (30 * 86400, 86400))
+
+	def __init__(self, path = HISTORY_PATH):
+		"""
+		Set up the history's attributes. (None)
+
+		Parameters:
+		path: The path to the history file. (str)
+		"""
+		self.path = path
+		self.buffer = bytearray()
+		self.series = None
+
+	def __len__(self):
+		"""The number of snapshots in the history. (int)"""
+		self.load()
+		return sum(len(series[0]) for series in self.series.values())
+
+	def add(self, post_id, when, score, per_up, comments):
+		"""
+		Add a snapshot to the arrays in memory. (None)
+
+		Parameters:
+		post_id: The local id of the post. (int)
+		when: The time of the snapshot, in epoch seconds. (int)
+		score: The Reddit score of the post. (int)
+		per_up: The upvote ratio, in hundredths of a percent. (int)
+		comments: The number of comments on the post. (int)
+		"""
+		if post_id not in self.series:
+			self.series[post_id] = (array.array('I'), array.array('i'), array.array('H'), array.array('I'))
+		for column, value in zip(self.series[post_id], (when, score, per_up, comments)):
+			column.append(value)
+
+	def downsample(self, now = None):
+		"""
+		Thin out old snapshots and rewrite the history file. (int)
+
+		Snapshots older than a tier's age are kept only if they are the last one in
+		their interval of that tier. The latest snapshot of each post is always
+		kept. The return value is the number of snapshots removed.
+
+		Parameters:
+		now: The time to measure ages from, in epoch seconds. (float)
+		"""
+		self.load()
+		now = time.time() if now is None else now
+		removed = 0
+		records = []
+		for post_id, series in self.series.items():
+			times = series[0]
+			keep = []
+			for index, when in enumerate(times):
+				if index + 1 < len(times):
+					bucket = self.bucket(when, now)
+					if bucket is not None and bucket == self.bucket(times[index + 1], now):
+						continue
+				keep.append(index)
+			removed += len(times) - len(keep)
+			if len(keep) < len(times):
+				self.series[post_id] = tuple(array.array(column.typecode, [column[index] for index in keep])
+					for column in series)
+			records.extend(self.record_format.pack(post_id, *snapshot) for snapshot in zip(*self.series[post_id]))
+		if removed:
+			temp_path = f'{self.path}.tmp'
+			with open(temp_path, 'wb') as history_file:
+				history_file.write(b''.join(records))
+				history_file.flush()
+				os.fsync(history_file.fileno())
+			os.replace(temp_path, self.path)
+			self.buffer = bytearray()
+		return removed
+
+	def bucket(self, when, now):
+		"""
+		Get the downsampling interval a snapshot falls in. (tuple or None)
+
+		Parameters:
+		when: The time of the snapshot, in epoch seconds. (int)
+		now: The time to measure ages from, in epoch seconds. (float)
+		"""
+		bucket = None
+		for tier, (age, interval) in enumerate(self.tiers):
+			if now - when > age:
+				bucket = (tier, when // interval)
+		return bucket
+
+	def flush(self):
+		"""Write any buffered snapshots to the history file. (None)"""
+		if self.buffer:
+			with open(self.path, 'ab') as history_file:
+				history_file.write(self.buffer)
+				history_file.flush()
+				os.fsync(history_file.fileno())
+			self.buffer = bytearray()
+
+	def gainers(self, points, hours = 24, now = None):
+		"""
+		Find the posts that gained points recently. (list of tuple)
+
+		The gain is measured from the last snapshot before the period, or the first
+		one in it if the post has no earlier snapshots. The return value is a list
+		of (gain, post_id) tuples, largest gain first.
+
+		Parameters:
+		points: The gain in score to beat. (int)
+		hours: The length of the period, in hours. (float)
+		now: The end of the period, in epoch seconds. (float)
+		"""
+		self.load()
+		start = (time.time() if now is None else now) - hours * 3600
+		gains = []
+		for post_id, (times, scores, per_ups, comments) in self.series.items():
+			if times[-1] < start:
+				continue
+			base = max(bisect.bisect_right(times, start) - 1, 0)
+			gain = scores[-1] - scores[base]
+			if gain > points:
+				gains.append((gain, post_id))
+		gains.sort(key = lambda gain: (-gain[0], gain[1]))
+		return gains
+
+	def load(self):
+		"""Read the history file, if it has not been read yet. (None)"""
+		if self.series is not None:
+			return
+		self.series = {}
+		try:
+			with open(self.path, 'rb') as history_file:
+				data = history_file.read()
+		except OSError:
+			data = b''
+		# Drop any partial record left by an interrupted write.
+		data = data[:(len(data) - len(data) % self.record_format.size)] + self.buffer
+		for post_id, *snapshot in self.record_format.iter_unpack(data):
+			self.add(post_id, *snapshot)
+
+	def record(self, post_id, score, per_up, comments, when = None):
+		"""
+		Record a snapshot of a post's statistics. (None)
+
+		Parameters:
+		post_id: The local id of the post. (int)
+		score: The Reddit score of the post. (int)
+		per_up: The upvote ratio of the post. (float)
+		comments: The number of comments on the post. (int)
+		when: The time of the snapshot, in epoch seconds. (float)
+		"""
+		snapshot = (int(time.time() if when is None else when), score, round(per_up * 10000), comments)
+		self.buffer += self.record_format.pack(post_id, *snapshot)
+		if self.series is not None:
+			self.add(post_id, *snapshot)
+
+	def trajectory(self, post_id):
+		"""
+		Get the snapshots for a post. (list of tuple)
+
+		The return value is a list of (datetime, score, upvote ratio, comments)
+		tuples, oldest first.
+
+		Parameters:
+		post_id: The local id of the post. (int)
+		"""
+		self.load()
+		times, scores, per_ups, comments = self.series.get(post_id, ((), (), (), ()))
+		return [(dt.datetime.fromtimestamp(when), score, per_up / 10000, count)
+			for when, score, per_up, count in zip(times, scores, per_ups, comments)]
+
+class Journal(object):
+	"""
+	An append-only log of changes to the local data. (object)
+
+	The journal records changes since the data files were last written, so that
+	saving only costs as much as the changes made. Entries are buffered and
+	written (and synced to disk) in batches. Loading replays the journal over the
+	data files, and compacting the data rewrites the files and clears the journal.
+
+	Entries are tab delimited, starting with the kind of entry. Post entries are
+	followed by the post's data line. Tag and name entries (+tag, -tag, +name,
+	-name) are followed by the local post id and the tag or name.
+
+	Attributes:
+	batch_size: How many entries to buffer before writing them. (int)
+	buffer: Entries that have not been written yet. (list of str)
+	path: The path to the journal file. (str)
+	saved: The size of the journal file as of the last save. (int)
+	saved_size: The number of entries in the journal file as of the last save. (int)
+	size: The number of entries in the journal file. (int)
+
+	Methods:
+	clear: Clear the journal after the data files are rewritten. (None)
+	discard: Discard any changes since the last save. (None)
+	flush: Write any buffered entries to the journal file. (None)
+	mark: Note the current end of the journal as saved. (None)
+	record: Record a change to a post. (None)
+	replay: Apply the journal to loaded posts. (int)
+
+	Overridden Methods:
+	__init__
+	"""
+
+	def __init__(self, path = 'journal.txt', batch_size = 25):
+		"""
+		Set up the journal's attributes. (None)
+
+		Parameters:
+		path: The path to the journal file. (str)
+		batch_size: How many entries to buffer before writing them. (int)
+		"""
+		self.path = path
+		self.batch_size = batch_size
+		self.buffer = []
+		self.size = 0
+		self.saved = 0
+		self.saved_size = 0
+
+	def clear(self):
+		"""Clear the journal after the data files are rewritten. (None)"""
+		self.buffer = []
+		if os.path.exists(self.path):
+			os.remove(self.path)
+		self.size = 0
+		self.saved = 0
+		self.saved_size = 0
+
+	def discard(self):
+		"""Discard any changes since the last save. (None)"""
+		self.buffer = []
+		if os.path.exists(self.path):
+			with open(self.path, 'r+') as journal_file:
+				journal_file.truncate(self.saved)
+		self.size = self.saved_size
+
+	def flush(self):
+		"""Write any buffered entries to the journal file. (None)"""
+		if self.buffer:
+			with open(self.path, 'a') as journal_file:
+				journal_file.write(''.join(self.buffer))
+				journal_file.flush()
+				os.fsync(journal_file.fileno())
+			self.size += len(self.buffer)
+			self.buffer = []
+
+	def mark(self):
+		"""Note the current end of the journal as saved. (None)"""
+		self.flush()
+		self.saved = os.path.getsize(self.path) if os.path.exists(self.path) else 0
+		self.saved_size = self.size
+
+	def record(self, kind, post, value = ''):
+		"""
+		Record a change to a post. (None)
+
+		Parameters:
+		kind: The kind of change: post, +tag, -tag, +name, or -name. (str)
+		post: The post that was changed. (Post)
+		value: The tag or name added or removed. (str)
+		"""
+		if kind == 'post':
+			self.buffer.append(f'post\t{post.data_line()}')
+		else:
+			self.buffer.append(f'{kind}\t{post.post_id}\t{value}\n')
+		if len(self.buffer) >= self.batch_size:
+			self.flush()
+
+	def replay(self, posts):
+		"""
+		Apply the journal to loaded posts. (int)
+
+		Replaying is idempotent, so it is safe if the data files were rewritten but
+		the journal was not cleared. The return value is the number of entries.
+
+		Parameters:
+		posts: The posts loaded from the data files. (PostStore)
+		"""
+		self.size = 0
+		if os.path.exists(self.path):
+			with open(self.path) as journal_file:
+				for line in journal_file:
+					kind, tab, data = line.partition('\t')
+					if not data.endswith('\n'):
+						# Ignore a partial entry from a crash while writing.
+						break
+					self.size += 1
+					if kind == 'post':
+						new_post = Post(data)
+						if new_post.post_id in posts:
+							old_post = posts[new_post.post_id]
+							new_post.tags, new_post.names = old_post.tags, old_post.names
+						posts.add(new_post)
+						continue
+					post_id, value = data.rstrip('\n').split('\t')
+					post = posts[int(post_id)]
+					if kind == '+tag' and value not in post.tags:
+						post.add_tag(value, force = True)
+					elif kind == '-tag' and value in post.tags:
+						post.remove_tag(value)
+					elif kind == '+name' and value not in post.names:
+						post.add_name(value)
+						Post.all_names.add(value)
+					elif kind == '-name' and value in post.names:
+						post.remove_name(value)
+		self.mark()
+		return self.size
+
+class Perf(object):
+	"""
+	Opt-in timing of commands, Reddit requests, and loading and saving. (object)
+
+	Timings are kept for three kinds of things: commands, Reddit requests (by
+	method and path, with ids replaced), and phases of loading and saving. The
+	most recent sample_size timings of each are kept for percentiles, and the
+	Reddit requests are also counted in latency buckets. When the instrumentation
+	is off, the only cost is checking the enabled flag.
+
+	Attributes:
+	counts: The number of times each thing has been timed. (dict of tuple: int)
+	enabled: A flag for timing being on. (bool)
+	histograms: Reddit request counts by latency bucket. (dict of str: list of int)
+	last_profile: The profile of the last command, if profiling. (cProfile.Profile or None)
+	lock: A lock for timing requests from several threads. (threading.Lock)
+	profiling: A flag for profiling each command. (bool)
+	samples: The recent timings of each thing. (dict of tuple: collections.deque)
+
+	Class Attributes:
+	buckets: The upper bounds of the latency buckets, in seconds. (tuple of float)
+	path_re: A regular expression matching ids in request paths. (regex)
+	sample_size: How many recent timings of each thing to keep. (int)
+
+	Methods:
+	percentiles: Get percentiles of the recent timings of something. (tuple)
+	record: Record a timing. (None)
+	report: Generate a text report of the timings. (str)
+	request_name: Get the name of a kind of Reddit request. (str)
+	reset: Clear all of the timings. (None)
+	timed: Time a block of code. (context manager)
+	timer: Time a block of code, if timing is on. (context manager)
+
+	Overridden Methods:
+	__init__
+	"""
+
+	buckets = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+	path_re = re.compile(r'/(comments|r|u|user)/[^/]+')
+	sample_size = 1000
+
+	def __init__(self):
+		"""Set up the empty timings. (None)"""
+		self.enabled = False
+		self.profiling = False
+		self.last_profile = None
+		self.lock = threading.Lock()
+		self.reset()
+
+	def percentiles(self, key, points = (50, 95, 99)):
+		"""
+		Get percentiles of the recent timings of something. (tuple of float)
+
+		Parameters:
+		key: The kind and name of the thing timed. (tuple of str)
+		points: The percentiles to get. (tuple of int)
+		"""
+		samples = sorted(self.samples[key])
+		return tuple(samples[min(len(samples) - 1, len(samples) * point // 100)] for point in points)
+
+	def record(self, kind, name, seconds):
+		"""
+		Record a timing. (None)
+
+		Parameters:
+		kind: The kind of thing timed: command, reddit, or phase. (str)
+		name: The name of the thing timed. (str)
+		seconds: How long it took. (float)
+		"""
+		key = (kind, name)
+		with self.lock:
+			if key not in self.samples:
+				self.samples[key] = collections.deque(maxlen = self.sample_size)
+				self.counts[key] = 0
+			self.samples[key].append(seconds)
+			self.counts[key] += 1
+			if kind == 'reddit':
+				histogram = self.histograms.setdefault(name, [0] * (len(self.buckets) + 1))
+				histogram[bisect.bisect_left(self.buckets, seconds)] += 1
+
+	def report(self):
+		"""Generate a text report of the timings. (str)"""
+		lines = []
+		titles = {'command': 'Commands', 'reddit': 'Reddit requests', 'phase': 'Loading and saving'}
+		text = '   {:<40}  {:>6}  {:>9}  {:>9}  {:>9}'
+		for kind, title in titles.items():
+			keys = sorted(key for key in self.samples if key[0] == kind)
+			if not keys:
+				continue
+			lines.append(f'{title} (milliseconds):')
+			lines.append(text.format('', 'Count', 'p50', 'p95', 'p99'))
+			for key in keys:
+				times = [f'{seconds * 1000:.1f}' for seconds in self.percentiles(key)]
+				lines.append(text.format(key[1][:40], self.counts[key], *times))
+				if kind == 'reddit':
+					bounds = [f'<{bound * 1000:g}' for bound in self.buckets] + [f'>={self.buckets[-1] * 1000:g}']
+					counts = ', '.join(f'{bound}: {count}' for bound, count in zip(bounds, self.histograms[key[1]])
+						if count)
+					lines.append(f'      {counts}')
+			lines.append('')
+		if not lines:
+			lines.append('Nothing has been timed yet.')
+		return '\n'.join(lines).rstrip()
+
+	def request_name(self, method, url):
+		"""
+		Get the name of a kind of Reddit request. (str)
+
+		Parameters:
+		method: The HTTP method of the request. (str)
+		url: The URL or path requested. (str)
+		"""
+		path = self.path_re.sub(r'/\1/*', urlparse(url).path)
+		return f'{method} {path}'
+
+	def reset(self):
+		"""Clear all of the timings. (None)"""
+		with self.lock:
+			self.counts, self.histograms, self.samples = {}, {}, {}
+
+	@contextlib.contextmanager
+	def timed(self, name):
+		"""
+		Time a block of code. (context manager)
+
+		Parameters:
+		name: The name of the phase being timed. (str)
+		"""
+		start = time.perf_counter()
+		try:
+			yield
+		finally:
+			self.record('phase', name, time.perf_counter() - start)
+
+	def timer(self, name):
+		"""
+		Time a block of code, if timing is on. (context manager)
+
+		Parameters:
+		name: The name of the phase being timed. (str)
+		"""
+		return self.timed(name) if self.enabled else contextlib.nullcontext()
+
+class PostIndex(object):
+	"""
+	Inverted indexes of local posts. (object)
+
+	For each indexed field (tag, name, source, and poster), this maps each value of
+	the field to the set of local ids of the posts with that value.
+
+	Attributes:
+	fields: The post ids for each value of each field. (dict of str: dict)
+
+	Methods:
+	add: Index a post under a value of a field. (None)
+	lookup: Get the ids of the posts with a value of a field. (set of int)
+	remove: Remove a post from under a value of a field. (None)
+
+	Overridden Methods:
+	__init__
+	"""
+
+	def __init__(self):
+		"""Set up the empty indexes. (None)"""
+		self.fields = {'tag': {}, 'name': {}, 'source': {}, 'poster': {}}
+
+	def add(self, field, value, post_id):
+		"""
+		Index a post under a value of a field. (None)
+
+		Parameters:
+		field: The field being indexed. (str)
+		value: The post's value for that field. (str)
+		post_id: The local id of the post. (int)
+		"""
+		self.fields[field].setdefault(value, set()).add(post_id)
+
+	def lookup(self, field, value):
+		"""
+		Get the ids of the posts with a value of a field. (set of int)
+
+		Parameters:
+		field: The indexed field to check. (str)
+		value: The value to look for. (str)
+		"""
+		return self.fields[field].get(value, set())
+
+	def remove(self, field, value, post_id):
+		"""
+		Remove a post from under a value of a field. (None)
+
+		Parameters:
+		field: The field being indexed. (str)
+		value: The post's former value for that field. (str)
+		post_id: The local id of the post. (int)
+		"""
+		post_ids = self.fields[field].get(value, set())
+		post_ids.discard(post_id)
+		if not post_ids:
+			self.fields[field].pop(value, None)
+
+class RequestScheduler(object):
+	"""
+	Pacing of Reddit requests from every thread, by priority. (object)
+
+	Every Reddit instance (the main one, and those in the background and scan
+	threads) shares one rate budget, so every request waits here for a token
+	first. Tokens refill at a rate that spreads the remaining quota, from the
+	rate limit headers of the last response, evenly until the quota resets, so
+	requests keep up with the limit without going over it.
+
+	Each thread's requests are in a lane: interactive (the default), prefetch,
+	or background. A request waits while any request in a higher lane is
+	waiting, and the lower lanes leave a few tokens in reserve, so a big scan or
+	refresh does not hold up an open the user is waiting on. Lookups of the same
+	thing at the same time can also be coalesced, so only one request is made.
+
+	Attributes:
+	available: The tokens available to spend. (float)
+	blocked_until: When requests may be made again after running out. (float)
+	condition: A condition for waiting on tokens. (threading.Condition)
+	in_flight: The futures for the lookups being made, by key. (dict of str: Future)
+	local: The lane of each thread. (threading.local)
+	rate: The tokens added per second. (float)
+	remaining: The requests left in the quota, if known. (float or None)
+	reset_time: When the quota resets, if known. (float or None)
+	updated: When the tokens were last refilled. (float)
+	waiting: The number of requests waiting in each lane. (list of int)
+
+	Class Attributes:
+	capacity: The most tokens that can be saved up for a burst. (float)
+	default_rate: The tokens added per second before any headers are seen. (float)
+	lanes: The lanes, from highest priority to lowest. (tuple of str)
+	reserve: The tokens the lower lanes leave for interactive requests. (float)
+
+	Methods:
+	acquire: Wait for a token to make a request. (None)
+	coalesce: Call a function, or wait for a call with the same key. (object)
+	lane: Put the current thread's requests in a lane. (context manager)
+	refill: Add the tokens earned since the last refill. (None)
+	status: Describe the quota and pacing. (str)
+	update: Update the pacing from a response's rate limit headers. (None)
+
+	Overridden Methods:
+	__init__
+	"""
+
+	capacity = 10.0
+	default_rate = 1.0
+	lanes = ('interactive', 'prefetch', 'background')
+	reserve = 2.0
+
+	def __init__(self):
+		"""Set up a full bucket of tokens. (None)"""
+		self.available = self.capacity
+		self.blocked_until = 0.0
+		self.condition = threading.Condition()
+		self.in_flight = {}
+		self.local = threading.local()
+		self.rate = self.default_rate
+		self.remaining = None
+		self.reset_time = None
+		self.updated = time.monotonic()
+		self.waiting = [0] * len(self.lanes)
+
+	def acquire(self):
+		"""Wait for a token to make a request in the current thread's lane. (None)"""
+		priority = self.lanes.index(getattr(self.local, 'lane', 'interactive'))
+		need = 1 + (self.reserve if priority else 0)
+		with self.condition:
+			self.waiting[priority] += 1
+			try:
+				while True:
+					now = time.monotonic()
+					self.refill(now)
+					if now >= self.blocked_until and self.available >= need and not any(self.waiting[:priority]):
+						self.available -= 1
+						return
+					delay = max(self.blocked_until - now, (need - self.available) / self.rate, 0.01)
+					self.condition.wait(delay)
+			finally:
+				self.waiting[priority] -= 1
+				self.condition.notify_all()
+
+	def coalesce(self, key, function, *args):
+		"""
+		Call a function, or wait for a call with the same key already running. (object)
+
+		Parameters:
+		key: What is being looked up, such as a Reddit id. (str)
+		function: The function that looks it up. (callable)
+		args: The arguments to the function. (tuple)
+		"""
+		with self.condition:
+			future = self.in_flight.get(key)
+			owner = future is None
+			if owner:
+				future = self.in_flight[key] = Future()
+		if not owner:
+			return future.result()
+		try:
+			result = function(*args)
+		except BaseException as err:
+			future.set_exception(err)
+			raise
+		else:
+			future.set_result(result)
+			return result
+		finally:
+			with self.condition:
+				del self.in_flight[key]
+
+	@contextlib.contextmanager
+	def lane(self, name):
+		"""
+		Put the current thread's requests in a lane. (context manager)
+
+		Parameters:
+		name: The name of the lane. (str)
+		"""
+		previous = getattr(self.local, 'lane', 'interactive')
+		self.local.lane = name
+		try:
+			yield
+		finally:
+			self.local.lane = previous
+
+	def refill(self, now):
+		"""
+		Add the tokens earned since the last refill. (None)
+
+		Parameters:
+		now: The current monotonic time. (float)
+		"""
+		self.available = min(self.capacity, self.available + (now - self.updated) * self.rate)
+		self.updated = now
+
+	def status(self):
+		"""Describe the quota and pacing. (str)"""
+		with self.condition:
+			self.refill(time.monotonic())
+			pacing = f'pacing {self.rate:.2f} requests per second, {self.available:.1f} ready'
+			if self.remaining is None:
+				return f'Reddit quota not known yet, {pacing}.'
+			seconds = max(0, self.reset_time - time.monotonic())
+			return f'Reddit quota: {self.remaining:.0f} requests left, reset in {seconds:.0f} seconds, {pacing}.'
+
+	def update(self, headers, status = 200):
+		"""
+		Update the pacing from a response's rate limit headers. (None)
+
+		Parameters:
+		headers: The headers of the response. (dict of str: str)
+		status: The HTTP status code of the response. (int)
+		"""
+		try:
+			remaining = float(headers['x-ratelimit-remaining'])
+			reset = float(headers['x-ratelimit-reset'])
+		except (KeyError, TypeError, ValueError):
+			return
+		with self.condition:
+			now = time.monotonic()
+			self.refill(now)
+			self.remaining, self.reset_time = remaining, now + reset
+			self.rate = max(remaining, 0) / max(reset, 1) or self.default_rate
+			self.available = min(self.available, remaining)
+			if remaining < 1 or status == 429:
+				self.available = 0.0
+				self.blocked_until = now + reset
+			self.condition.notify_all()
+
+class Rollups(object):
+	"""
+	Engagement totals for groups of local posts. (object)
+
+	For each dimension (tag, tag category, source, poster, and ISO week), this
+	keeps the number of posts with each value, and the totals of their scores,
+	upvote ratios, and comment counts. The totals are built with one pass over
+	the posts, and after that they are kept current as posts are added, tagged,
+	untagged, and updated. Posts not counted in the totals (because they were
+	loaded after the totals were built) are ignored.
+
+	Attributes:
+	dimensions: The totals for each value of each dimension. (dict of str: dict)
+	posts: The ids of the posts counted, or None if not built yet. (set of int)
+
+	Class Attributes:
+	columns: The statistics that are totalled. (tuple of str)
+
+	Methods:
+	add_post: Count a new post in the totals. (None)
+	add_tag: Count a post under a tag added to it. (None)
+	apply: Add a post's statistics to the totals for a value. (None)
+	build: Build the totals from all of the local posts. (None)
+	categories: Get the tag categories of a post's tags. (set of str)
+	keys: Get the values of each dimension for a post. (list of tuple)
+	merge: Add the totals from another set of rollups. (None)
+	remove_tag: Stop counting a post under a tag removed from it. (None)
+	table: Get the totals and means for a dimension. (list of tuple)
+	update: Adjust the totals for a post's changed statistics. (None)
+
+	Overridden Methods:
+	__init__
+	"""
+
+	columns = ('count', 'score', 'per', 'comments')
+
+	def __init__(self):
+		"""Set up the empty totals. (None)"""
+		self.dimensions = {'tag': {}, 'category': {}, 'source': {}, 'poster': {}, 'week': {}}
+		self.posts = None
+
+	def add_post(self, post):
+		"""
+		Count a new post in the totals. (None)
+
+		Parameters:
+		post: The post to count. (Post)
+		"""
+		if self.posts is None or post.post_id in self.posts:
+			return
+		self.posts.add(post.post_id)
+		for dimension, value in self.keys(post):
+			self.apply(dimension, value, post, 1)
+
+	def add_tag(self, post, tag):
+		"""
+		Count a post under a tag added to it. (None)
+
+		Parameters:
+		post: The post, with the tag already added. (Post)
+		tag: The tag added to the post. (str)
+		"""
+		if self.posts is None or post.post_id not in self.posts or post.tags.count(tag) > 1:
+			return
+		self.apply('tag', tag, post, 1)
+		if tag in Post.all_tags:
+			category = Post.all_tags[tag]['category']
+			others = [other for other in post.tags if other != tag]
+			if category not in self.categories(others):
+				self.apply('category', category, post, 1)
+
+	def apply(self, dimension, value, post, sign, stats = None):
+		"""
+		Add a post's statistics to the totals for a value. (None)
+
+		Parameters:
+		dimension: The dimension being totalled. (str)
+		value: The post's value for that dimension. (str)
+		post: The post being counted. (Post)
+		sign: 1 to add the post, -1 to remove it, 0 to change its statistics. (int)
+		stats: The change in score, upvote ratio, and comments. (tuple)
+		"""
+		if stats is None:
+			stats = (sign * post.score, sign * post.per_up, sign * post.comments)
+		totals = self.dimensions[dimension].setdefault(value, [0, 0, 0.0, 0])
+		totals[0] += sign
+		totals[1] += stats[0]
+		totals[2] += stats[1]
+		totals[3] += stats[2]
+		if not totals[0]:
+			del self.dimensions[dimension][value]
+
+	def build(self, posts):
+		"""
+		Build the totals from all of the local posts. (None)
+
+		Parameters:
+		posts: The local posts. (sequence of Post)
+		"""
+		self.__init__()
+		self.posts = set()
+		for post in posts:
+			self.add_post(post)
+
+	def categories(self, tags):
+		"""
+		Get the tag categories of a post's tags. (set of str)
+
+		Parameters:
+		tags: The tags of the post. (sequence of str)
+		"""
+		return set(Post.all_tags[tag]['category'] for tag in tags if tag in Post.all_tags)
+
+	def keys(self, post):
+		"""
+		Get the values of each dimension for a post. (list of tuple)
+
+		Parameters:
+		post: The post to get the values for. (Post)
+		"""
+		keys = [('tag', tag) for tag in set(post.tags)]
+		keys.extend(('category', category) for category in self.categories(post.tags))
+		keys.extend([('source', post.source), ('poster', post.poster), ('week', f'{post.date:%G-W%V}')])
+		return keys
+
+	def merge(self, other):
+		"""
+		Add the totals from another set of rollups. (None)
+
+		Parameters:
+		other: The rollups to add. (Rollups)
+		"""
+		for dimension, totals in other.dimensions.items():
+			for value, (count, score, per_up, comments) in totals.items():
+				mine = self.dimensions[dimension].setdefault(value, [0, 0, 0.0, 0])
+				mine[0] += count
+				mine[1] += score
+				mine[2] += per_up
+				mine[3] += comments
+
+	def remove_tag(self, post, tag):
+		"""
+		Stop counting a post under a tag removed from it. (None)
+
+		Parameters:
+		post: The post, with the tag already removed. (Post)
+		tag: The tag removed from the post. (str)
+		"""
+		if self.posts is None or post.post_id not in self.posts or tag in post.tags:
+			return
+		self.apply('tag', tag, post, -1)
+		if tag in Post.all_tags:
+			category = Post.all_tags[tag]['category']
+			if category not in self.categories(post.tags):
+				self.apply('category', category, post, -1)
+
+	def table(self, dimension, order = 'score', mean = False, n = None):
+		"""
+		Get the totals and means for a dimension. (list of tuple)
+
+		Each row of the table is the value of the dimension, the number of posts,
+		the totals of score, upvote ratio, and comments, and the means of the same.
+		The rows are sorted in descending order of the total (or the mean) of the
+		order column. NumPy is used for the arithmetic and sorting if available.
+
+		Parameters:
+		dimension: The dimension to get the totals for. (str)
+		order: The column to sort by: count, score, per, or comments. (str)
+		mean: A flag for sorting by the mean rather than the total. (bool)
+		n: The maximum number of rows to return. (int or None)
+		"""
+		values = list(self.dimensions[dimension])
+		if not values:
+			return []
+		column = self.columns.index(order)
+		if np is not None:
+			totals = np.array([self.dimensions[dimension][value] for value in values], dtype = float)
+			means = totals[:, 1:] / totals[:, :1]
+			keys = np.hstack((totals[:, :1], means))[:, column] if mean else totals[:, column]
+			if n is not None and n < len(values):
+				top = np.argpartition(-keys, n - 1)[:n]
+				rows = top[np.argsort(-keys[top], kind = 'stable')]
+			else:
+				rows = np.argsort(-keys, kind = 'stable')
+			return [(values[row], int(totals[row, 0]), int(totals[row, 1]), float(totals[row, 2]), int(totals[row, 3]),
+				*means[row].tolist()) for row in rows.tolist()]
+		table = []
+		for value in values:
+			count, *sums = self.dimensions[dimension][value]
+			table.append((value, count, *sums, *[total / count for total in sums]))
+		offset = 3 if mean and column else 0
+		table.sort(key = lambda row: -row[column + offset + 1])
+		return table[:n]
+
+	def update(self, post, base):
+		"""
+		Adjust the totals for a post's changed statistics. (None)
+
+		Parameters:
+		post: The post, with the new statistics. (Post)
+		base: The old score, upvote ratio, and comment count. (tuple)
+		"""
+		if self.posts is None or post.post_id not in self.posts:
+			return
+		stats = (post.score - base[0], post.per_up - base[1], post.comments - base[2])
+		for dimension, value in self.keys(post):
+			self.apply(dimension, value, post, 0, stats)
+
+class TagClassifier(object):
+	"""
+	A naive Bayes model for suggesting tags from a post's title and source. (object)
+
+	The features of a post are the words in its title and its source site. For
+	each tag, the model keeps the number of posts with that tag and the total
+	number of features in them, in typed arrays indexed by tag number. For each
+	feature, it keeps a sparse count of how often it occurs with each tag. So
+	adding or removing a tag from a post only changes the counts for that post's
+	features, and scoring a post only touches the tags its features occur with,
+	on top of one vectorized pass for the priors and feature totals.
+
+	The model is trained from all of the local posts the first time it is
+	needed, and then kept current as tags are added to and removed from posts.
+
+	Attributes:
+	features: The count of each feature with each tag number. (dict of str: dict)
+	loaded: A flag for the model having been trained. (bool)
+	numbers: The number of each tag. (dict of str: int)
+	tag_posts: The number of posts with each tag. (array of float)
+	tag_terms: The number of features in the posts with each tag. (array of float)
+	tags: The tag for each tag number. (list of str)
+
+	Class Attributes:
+	alpha: The smoothing added to each feature count. (float)
+
+	Methods:
+	add_tag: Count a post's features under a tag. (None)
+	build: Train the model from all of the local posts. (None)
+	post_features: Get the features of a post. (list of str)
+	remove_tag: Stop counting a post's features under a tag. (None)
+	scores: Get the log likelihood of each tag for a post. (array or list of float)
+	suggest: Get the most likely tags in each group of categories. (list of list of str)
+
+	Overridden Methods:
+	__init__
+	"""
+
+	alpha = 1.0
+
+	def __init__(self):
+		"""Set up an untrained model. (None)"""
+		self.features = {}
+		self.numbers = {}
+		self.tag_posts = array.array('d')
+		self.tag_terms = array.array('d')
+		self.tags = []
+		self.loaded = False
+
+	def add_tag(self, post, tag, weight = 1):
+		"""
+		Count a post's features under a tag. (None)
+
+		Parameters:
+		post: The post the tag was added to. (Post)
+		tag: The tag added. (str)
+		weight: The amount to change the counts by. (int)
+		"""
+		number = self.numbers.get(tag)
+		if number is None:
+			number = self.numbers[tag] = len(self.tags)
+			self.tags.append(tag)
+			self.tag_posts.append(0)
+			self.tag_terms.append(0)
+		features = self.post_features(post)
+		self.tag_posts[number] += weight
+		self.tag_terms[number] += weight * len(features)
+		for feature in features:
+			counts = self.features.setdefault(feature, {})
+			count = counts.get(number, 0) + weight
+			if count > 0:
+				counts[number] = count
+			else:
+				counts.pop(number, None)
+
+	def build(self, posts):
+		"""
+		Train the model from all of the local posts. (None)
+
+		Parameters:
+		posts: The local posts. (iterable of Post)
+		"""
+		self.__init__()
+		for post in posts:
+			for tag in post.tags:
+				self.add_tag(post, tag)
+		self.loaded = True
+
+	def post_features(self, post):
+		"""
+		Get the features of a post. (list of str)
+
+		Parameters:
+		post: The post to get the features of. (Post)
+		"""
+		return Post.search.tokens(post.title) + [f'site:{post.source}']
+
+	def remove_tag(self, post, tag):
+		"""
+		Stop counting a post's features under a tag. (None)
+
+		Parameters:
+		post: The post the tag was removed from. (Post)
+		tag: The tag removed. (str)
+		"""
+		if tag in self.numbers:
+			self.add_tag(post, tag, -1)
+
+	def scores(self, post):
+		"""
+		Get the log likelihood of each tag for a post, up to a constant. (array or list of float)
+
+		Under multinomial naive Bayes the score of a tag is the log of its prior
+		plus, for each feature, the log of (count + alpha) / (terms + alpha * V).
+		That is split into a part that only depends on the tag's totals, computed
+		for all tags at once, and a log(1 + count / alpha) bonus for each tag the
+		features actually occur with. Tags with no posts score -inf.
+
+		Parameters:
+		post: The post to score. (Post)
+		"""
+		features = self.post_features(post)
+		vocabulary = self.alpha * (len(self.features) + 1)
+		bonus = collections.defaultdict(float)
+		for feature in features:
+			for number, count in self.features.get(feature, {}).items():
+				bonus[number] += math.log1p(count / self.alpha)
+		if np is not None:
+			tag_posts = np.frombuffer(self.tag_posts)
+			tag_terms = np.frombuffer(self.tag_terms)
+			with np.errstate(divide = 'ignore'):
+				scores = np.log(tag_posts) - len(features) * np.log(tag_terms + vocabulary)
+			if bonus:
+				scores[np.fromiter(bonus.keys(), int, len(bonus))] += np.fromiter(bonus.values(), float, len(bonus))
+			return scores
+		scores = []
+		for number, (posts, terms) in enumerate(zip(self.tag_posts, self.tag_terms)):
+			if posts > 0:
+				scores.append(math.log(posts) - len(features) * math.log(terms + vocabulary) + bonus[number])
+			else:
+				scores.append(-math.inf)
+		return scores
+
+	def suggest(self, post, groups, n = 3):
+		"""
+		Get the most likely tags in each group of categories. (list of list of str)
+
+		Tags the post already has are not suggested, nor are tags no post has yet.
+
+		Parameters:
+		post: The post to suggest tags for. (Post)
+		groups: The tags in each group of categories. (list of set of str)
+		n: The number of tags to suggest for each group. (int)
+		"""
+		scores = self.scores(post)
+		suggestions = []
+		for tags in groups:
+			numbers = [self.numbers[tag] for tag in tags if tag in self.numbers and tag not in post.tags]
+			ranked = heapq.nlargest(n, numbers, key = lambda number: scores[number])
+			suggestions.append([self.tags[number] for number in ranked if scores[number] > -math.inf])
+		return suggestions
+
+class TagTree(object):
+	"""
+	The hierarchy of valid tags. (object)
+
+	The valid tags form a tree in each category, with top level tags having a
+	parent of N/A. The children of each tag, the ancestors and descendants of
+	each tag, and the category of each tag are all precomputed, so questions
+	about the hierarchy take time proportional to the answer.
+
+	Attributes:
+	ancestors: The parent, grandparent, and so on of each tag. (dict of str: tuple)
+	categories: The category of each tag. (dict of str: str)
+	children: The child tags of each tag. (dict of str: list of str)
+	descendants: All of the tags under each tag. (dict of str: set of str)
+	members: The tags in each category. (dict of str: set of str)
+	roots: The top level tags in each category. (dict of str: list of str)
+
+	Methods:
+	add: Add a tag to the hierarchy. (None)
+	subtree: Get a tag and all of the tags under it. (set of str)
+
+	Overridden Methods:
+	__init__
+	"""
+
+	def __init__(self, valid_tags = {}):
+		"""
+		Build the hierarchy. (None)
+
+		Parameters:
+		valid_tags: The category and parent of each tag, as in Post.all_tags. (dict of str: dict)
+		"""
+		self.ancestors, self.categories, self.children, self.descendants = {}, {}, {}, {}
+		self.members, self.roots = {}, {}
+		# Add parents before their children.
+		pending = sorted(valid_tags.items(), key = lambda item: item[1]['id'])
+		while pending:
+			waiting = []
+			for tag, info in pending:
+				if info['parent'] == 'N/A' or info['parent'] in self.categories:
+					self.add(tag, info['category'], info['parent'])
+				else:
+					waiting.append((tag, info))
+			if len(waiting) == len(pending):
+				# Treat tags with unknown parents as top level tags.
+				for tag, info in waiting:
+					self.add(tag, info['category'], 'N/A')
+				break
+			pending = waiting
+
+	def add(self, tag, category, parent = 'N/A'):
+		"""
+		Add a tag to the hierarchy. (None)
+
+		Parameters:
+		tag: The tag to add. (str)
+		category: The category of the tag. (str)
+		parent: The parent of the tag, or N/A for a top level tag. (str)
+		"""
+		self.categories[tag] = category
+		self.members.setdefault(category, set()).add(tag)
+		if parent == 'N/A':
+			self.roots.setdefault(category, []).append(tag)
+			self.ancestors[tag] = ()
+		else:
+			self.children[parent].append(tag)
+			self.ancestors[tag] = (parent,) + self.ancestors[parent]
+		self.children[tag] = []
+		self.descendants[tag] = set()
+		for ancestor in self.ancestors[tag]:
+			self.descendants[ancestor].add(tag)
+
+	def subtree(self, tag):
+		"""
+		Get a tag and all of the tags under it. (set of str)
+
+		Parameters:
+		tag: The tag at the top of the subtree. (str)
+		"""
+		return self.descendants.get(tag, set()) | {tag}
+
+class SearchIndex(object):
+	"""
+	A ranked full-text index of post titles and notes. (object)
+
+	Each term maps to a typed array of the local ids of the posts containing it,
+	and a parallel array of how often it occurs in each. Queries are ranked with
+	BM25, and a query word ending in * (or with no exact match) matches every
+	term starting with it. The day each post was made is kept for date filters.
+
+	The index is built from all of the posts the first time it is needed, and
+	saved in SEARCH_PATH along with a fingerprint of the posts. After that it is
+	loaded from there if the fingerprint still matches, and new posts and notes
+	are added to it as they are made.
+
+	Attributes:
+	changed: A flag for the index having unsaved changes. (bool)
+	count: The number of posts with any terms. (int)
+	days: The date of each post as a day ordinal, by local id. (array of int)
+	lengths: The number of terms in each post, by local id. (array of int)
+	loaded: A flag for the index having been built or loaded. (bool)
+	path: The file the index is saved in. (str)
+	postings: The ids and term counts for each term. (dict of str: tuple)
+	sorted_terms: The terms in order, for prefix matching. (list of str or None)
+	total: The total number of terms in all posts. (int)
+
+	Class Attributes:
+	b: The BM25 document length weight. (float)
+	k1: The BM25 term frequency saturation. (float)
+	stop_words: Common words that are not indexed. (set of str)
+	token_re: A regular expression matching a term. (regex)
+	version: The version of the index file format. (int)
+
+	Methods:
+	add: Add text to the index. (None)
+	build: Index all of the posts. (None)
+	expand: Get the terms matching a query word. (list of str)
+	load: Load or build the index, if it is not loaded. (None)
+	query_terms: Split query words into terms to expand. (list of str)
+	save: Save the index, if it has changed. (None)
+	search: Find the posts best matching some words. (list of tuple)
+	tokens: Split text into terms. (list of str)
+
+	Overridden Methods:
+	__init__
+	"""
+
+	b = 0.75
+	k1 = 1.2
+	stop_words = set('a an and are as at be but by for from has have in is it its of on or that the this to was '
+		'were will with'.split())
+	token_re = re.compile(r'[^\W_]+')
+	version = 2
+
+	def __init__(self, path = SEARCH_PATH):
+		"""
+		Set up the empty index. (None)
+
+		Parameters:
+		path: The file the index is saved in. (str)
+		"""
+		self.path = path
+		self.postings = {}
+		self.lengths = array.array('I', [0])
+		self.days = array.array('I', [0])
+		self.count = 0
+		self.total = 0
+		self.sorted_terms = None
+		self.changed = False
+		self.loaded = False
+
+	def add(self, post_id, text, day = None):
+		"""
+		Add text to the index. (None)
+
+		Text for a post that is already indexed (such as a new note) is merged into
+		the post's existing postings, so the index matches one built from scratch.
+
+		Parameters:
+		post_id: The local id of the post the text is from. (int)
+		text: The text to index. (str)
+		day: The date of the post as a day ordinal, if known. (int or None)
+		"""
+		terms = self.tokens(text)
+		if post_id >= len(self.lengths):
+			padding = [0] * (post_id + 1 - len(self.lengths))
+			self.lengths.extend(padding)
+			self.days.extend(padding)
+		if day is not None:
+			self.days[post_id] = day
+		indexed = self.lengths[post_id] > 0
+		if terms and not indexed:
+			self.count += 1
+		self.lengths[post_id] += len(terms)
+		self.total += len(terms)
+		for term, count in collections.Counter(terms).items():
+			if term not in self.postings:
+				self.postings[term] = (array.array('I'), array.array('B'))
+				self.sorted_terms = None
+			ids, counts = self.postings[term]
+			position = ids.index(post_id) if indexed and post_id in ids else None
+			if position is None:
+				ids.append(post_id)
+				counts.append(min(count, 255))
+			else:
+				counts[position] = min(counts[position] + count, 255)
+		self.changed = True
+
+	def build(self, texts):
+		"""
+		Index all of the posts. (None)
+
+		Parameters:
+		texts: The local id, text, and day ordinal of each post. (iterable of tuple)
+		"""
+		self.__init__(self.path)
+		for post_id, text, day in texts:
+			self.add(post_id, text, day)
+		self.loaded = True
+
+	def expand(self, word):
+		"""
+		Get the terms matching a query word. (list of str)
+
+		Parameters:
+		word: The query word, ending in * to match it as a prefix. (str)
+		"""
+		prefix = word.endswith('*')
+		word = word.rstrip('*').lower()
+		if not prefix and word in self.postings:
+			return [word]
+		if self.sorted_terms is None:
+			self.sorted_terms = sorted(self.postings)
+		start = bisect.bisect_left(self.sorted_terms, word)
+		end = bisect.bisect_left(self.sorted_terms, word + '\uffff')
+		return self.sorted_terms[start:end]
+
+	def load(self, posts):
+		"""
+		Load or build the index, if it is not loaded. (None)
+
+		Parameters:
+		posts: The local posts. (PostStore or SQLitePosts)
+		"""
+		if self.loaded:
+			return
+		fingerprint = posts.fingerprint()
+		try:
+			with open(self.path, 'rb') as index_file:
+				version, saved_print, count, total, lengths, days, postings = marshal.loads(index_file.read())
+		except (OSError, EOFError, ValueError, TypeError):
+			version = None
+		if version == self.version and tuple(saved_print) == fingerprint:
+			self.count, self.total = count, total
+			self.lengths, self.days = array.array('I'), array.array('I')
+			self.lengths.frombytes(lengths)
+			self.days.frombytes(days)
+			self.postings = {}
+			for term, (ids, counts) in postings.items():
+				self.postings[term] = (array.array('I'), array.array('B', counts))
+				self.postings[term][0].frombytes(ids)
+			self.sorted_terms = None
+			self.changed = False
+			self.loaded = True
+		else:
+			self.build(posts.texts())
+
+	def query_terms(self, words):
+		"""
+		Split query words into terms to expand. (list of str)
+
+		The words are split the same way as indexed text, so punctuation is dropped
+		and stop words are ignored. A trailing * on a word is kept on its last term
+		as the prefix marker, even if that term is a stop word.
+
+		Parameters:
+		words: The words to search for. (list of str)
+		"""
+		terms = []
+		for word in words:
+			tokens = self.token_re.findall(word.lower())
+			prefix = re.sub(r'[^\w*]+', '', word).endswith('*')
+			for position, token in enumerate(tokens, start = 1):
+				if prefix and position == len(tokens):
+					terms.append(f'{token}*')
+				elif token not in self.stop_words:
+					terms.append(token)
+		return terms
+
+	def save(self, posts):
+		"""
+		Save the index, if it has changed. (None)
+
+		Parameters:
+		posts: The local posts, as saved. (PostStore or SQLitePosts)
+		"""
+		if not (self.loaded and self.changed):
+			return
+		postings = {term: (ids.tobytes(), counts.tobytes()) for term, (ids, counts) in self.postings.items()}
+		data = (self.version, posts.fingerprint(), self.count, self.total, self.lengths.tobytes(), self.days.tobytes(),
+			postings)
+		temp_path = f'{self.path}.tmp'
+		try:
+			with open(temp_path, 'wb') as index_file:
+				index_file.write(marshal.dumps(data))
+			os.replace(temp_path, self.path)
+		except OSError:
+			pass
+		self.changed = False
+
+	def search(self, words, post_ids = None, start = None, end = None, n = None):
+		"""
+		Find the posts best matching some words. (list of tuple)
+
+		The return value is a list of (score, post_id) tuples, best first.
+
+		Parameters:
+		words: The words to search for. (list of str)
+		post_ids: The only posts to consider, if given. (set of int or None)
+		start: The first day ordinal to consider, if given. (int or None)
+		end: The last day ordinal to consider, if given. (int or None)
+		n: The maximum number of results. (int or None)
+		"""
+		if not self.count:
+			return []
+		average = self.total / self.count
+		scores = collections.defaultdict(float)
+		lengths, days = self.lengths, self.days
+		k1, b = self.k1, self.b
+		for word in self.query_terms(words):
+			for term in self.expand(word):
+				ids, counts = self.postings[term]
+				idf = math.log(1 + (self.count - len(ids) + 0.5) / (len(ids) + 0.5))
+				for post_id, count in zip(ids, counts):
+					if post_ids is not None and post_id not in post_ids:
+						continue
+					if (start is not None and days[post_id] < start) or (end is not None and days[post_id] > end):
+						continue
+					norm = k1 * (1 - b + b * lengths[post_id] / average)
+					scores[post_id] += idf * count * (k1 + 1) / (count + norm)
+		ranked = [(score, post_id) for post_id, score in scores.items()]
+		if n is None:
+			return sorted(ranked, key = lambda item: (-item[0], item[1]))
+		return heapq.nsmallest(n, ranked, key = lambda item: (-item[0], item[1]))
+
+	def tokens(self, text):
+		"""
+		Split text into terms. (list of str)
+
+		Parameters:
+		text: The text to split. (str)
+		"""
+		return [token for token in self.token_re.findall(text.lower()) if token not in self.stop_words]
+
+class Post(object):
+	"""
+	A post on r/EndMassIncarceration. (object)
+
+	Posts use slots, with the source, poster, and tags interned and the dates
+	shared between posts, to keep the memory per post down.
+
+	Class Attributes:
+	all_names: All of the names in various posts. (set of str)
+	all_tags: All of the tags used in various posts. (dict of str: dict)
+	dates: Dates parsed from the local data. (dict of str: dt.datetime)
+	dirty: The ids of posts with unsaved post data. (set of int)
+	duplicates: An index for finding posts that are the same story. (DuplicateIndex)
+	history: Snapshots of the posts' statistics over time. (History)
+	index: The ids of posts by tag, name, source, and poster. (PostIndex)
+	name_index: An index of all_names for suggestions. (SuggestionIndex)
+	num_posts: The number of post objects created. (int)
+	rollups: Engagement totals by tag, category, source, poster, and week. (Rollups)
+	search: A full-text index of the titles and notes. (SearchIndex)
+	tagger: A model for suggesting tags. (TagClassifier)
+	tag_index: An index of all_tags for suggestions. (SuggestionIndex)
+	tag_tree: The hierarchy of all_tags. (TagTree)
+
+	Attributes:
+	comments: The number of comments the post received. (int)
+	date: The date the post was submitted. (dt.datetime)
+	names: Names associated with the article. (tuple of str)
+	notes: Any moderator notes made on the post. (str)
+	per_up: The percentage upvoted for the post. (float)
+	permalink: The path of the post on Reddit, or '' if not known yet. (str)
+	post_id: The local post identifier. (int)
+	poster: The name of the Redditor who made the post. (str)
+	reddit_id: The Reddit post identifier. (str)
+	score: The Reddit score for the post. (int)
+	source: The website linked to. (str)
+	submission: The submission object for the post. (None or praw.Submission)
+	tags: The tags for the post. (tuple of str)
+	title: The title of the post. (str)
+	url: The URL the post links to, or '' if not known yet. (str)
+
+	Methods:
+	_from_line: Intialize a post from local data. (None)
+	_from_row: Intialize a post from the snapshot cache. (None)
+	_from_submission: Initialize a post from Reddit data. (None)
+	add_name: Add a name to the post. (None)
+	add_note: Add a note to the post. (None)
+	add_tag: Add a tag to the post. (bool)
+	data_line: Tab delimited text representation. (str)
+	details: A detailed text representation. (str)
+	remove_name: Remove a name from the post. (None)
+	remove_tag: Remove a tag from the post. (None)
+	row: The fields of the post, for the snapshot cache. (tuple)
+	set_links: Fill in the post's link URL and permalink. (bool)
+	suggest_tags: Find possible matches to a potential tag. (list of str)
+	tag_lines: Tab delimited text representation of the post's tags. (str)
+	update: Update a Post based on a Submission. (None)
+
+	Overridden Methods:
+	__init__
+	"""
+
+	__slots__ = ('comments', 'date', 'names', 'notes', 'per_up', 'permalink', 'post_id', 'poster', 'reddit_id',
+		'score', 'source', 'submission', 'tags', 'title', 'url')
+
+	num_posts = 0
+	all_tags = {}
+	dates = {}
+	all_names = set()
+	dirty = set()
+	duplicates = DuplicateIndex()
+	history = History()
+	index = PostIndex()
+	rollups = Rollups()
+	search = SearchIndex()
+	tagger = TagClassifier()
+	tag_index = SuggestionIndex()
+	tag_tree = TagTree()
+	name_index = SuggestionIndex()
+
+	def __init__(self, data):
+		"""
+		Intialize a post from local data. (None)
+
+		Parameters:
+		data: Data from a local data set, the cache, or Reddit. (str, tuple, or Submission)
+		"""
+		if isinstance(data, str):
+			self._from_line(data)
+		elif isinstance(data, tuple):
+			self._from_row(data)
+		else:
+			self._from_submission(data)
+
+	def __repr__(self):
+		"""
+		Debugging text represenation. (str)
+		"""
+		return '<Post {} by {}, {:%m/%d/%y}>'.format(self.reddit_id, self.poster, self.date)
+
+	def __str__(self):
+		"""
+		Human readable text representation. (str)
+		"""
+		text = '{}  {:<20}  {:<8}  {:<48}  {:>4}'
+		date_text = self.date.strftime('%m/%d/%y')
+		return text.format(self.reddit_id, self.poster[:20], date_text, self.title[:48], self.score)
+
+	def _from_line(self, line):
+		"""
+		Intialize a post from local data. (None)
+
+		Parameters:
+		line: A line in the local data set.
+		"""
+		fields = line.split('\t')
+		self.post_id = int(fields[0])
+		Post.num_posts = max(Post.num_posts, self.post_id)
+		self.reddit_id = fields[1]
+		self.date = Post.dates.get(fields[2])
+		if self.date is None:
+			self.date = Post.dates[fields[2]] = dt.datetime.strptime(fields[2], '%m/%d/%Y')
+		self.source = sys.intern(fields[3])
+		self.poster = sys.intern(fields[4])
+		self.title = fields[5]
+		self.score = int(fields[6]) if fields[6] else 0
+		self.per_up = float(fields[7]) if fields[7] else 0.0
+		self.comments = int(fields[8]) if fields[8] else 0
+		self.notes = fields[9].strip()
+		# Older data has no links, so they are filled in later (see backfill_links).
+		self.url = fields[10].strip() if len(fields) > 10 else ''
+		self.permalink = fields[11].strip() if len(fields) > 11 else ''
+		self.tags = ()
+		self.names = ()
+		self.submission = None
+		Post.index.add('source', self.source, self.post_id)
+		Post.index.add('poster', self.poster, self.post_id)
+
+	def _from_row(self, row):
+		"""
+		Intialize a post from the snapshot cache. (None)
+
+		The post is not added to Post.index, which is cached separately, and
+		Post.num_posts is not updated. The strings in the cache are already shared
+		between posts, so they are not interned.
+
+		Parameters:
+		row: The fields of the post, as returned by the row method. (tuple)
+		"""
+		(self.post_id, self.reddit_id, date_text, self.source, self.poster, self.title, self.score,
+			self.per_up, self.comments, self.notes, self.url, self.permalink, self.tags, self.names) = row
+		self.date = Post.dates.get(date_text)
+		if self.date is None:
+			self.date = Post.dates[date_text] = dt.datetime.strptime(date_text, '%m/%d/%Y')
+		self.submission = None
+
+	def _from_submission(self, data):
+		"""
+		Initialize a post from Reddit data. (None)
+
+		Parameters:
+		data: A Reddit submission object. (praw.Submission)
+		"""
+		Post.num_posts += 1
+		self.post_id = Post.num_posts
+		self.reddit_id = data.id
+		self.date = dt.datetime.fromtimestamp(data.created_utc)
+		self.source = sys.intern(urlparse(data.url).netloc)
+		self.poster = sys.intern(str(data.author))
+		self.title = data.title
+		self.score = data.score
+		self.per_up = data.upvote_ratio
+		self.comments = data.num_comments
+		self.notes = ''
+		self.url = data.url
+		self.permalink = data.permalink
+		self.tags = ()
+		self.names = ()
+		self.submission = data
+		Post.dirty.add(self.post_id)
+		Post.index.add('source', self.source, self.post_id)
+		Post.index.add('poster', self.poster, self.post_id)
+		Post.rollups.add_post(self)
+		if Post.search.loaded:
+			Post.search.add(self.post_id, self.title, self.date.toordinal())
+		if Post.duplicates.loaded:
+			Post.duplicates.add(self.post_id, self.title, data.url)
+
+	def add_note(self, note):
+		"""
+		Add a note to the post. (None)
+
+		Parameters:
+		Note: The note to add to the post. (str)
+		"""
+		if self.notes:
+			self.notes = f'{self.notes} | {note}'
+		else:
+			self.notes = note
+		Post.dirty.add(self.post_id)
+		if Post.search.loaded:
+			Post.search.add(self.post_id, note)
+
+	def add_tag(self, tag, force = False):
+		"""
+		Add a tag to the post. (bool)
+
+		The return value is a flag indicating that the tag was successfully added.
+		Tags are not added if they have not been seen before, unless the force
+		parameter is True.
+
+		Parameters:
+		tag: The tag to add. (str)
+		force: A flag for forcing the addition of the tag. (bool)
+		"""
+		if tag in Post.all_tags:
+			self.tags += (sys.intern(tag),)
+		elif force:
+			self.tags += (sys.intern(tag),)
+			#Post.all_tags.add(tag) !! replace with a new tag command.
+		else:
+			return False
+		Post.index.add('tag', tag, self.post_id)
+		Post.rollups.add_tag(self, tag)
+		if Post.tagger.loaded:
+			Post.tagger.add_tag(self, tag)
+		return True
+
+	def add_name(self, name):
+		"""
+		Add a name to the post. (None)
+
+		Parameters:
+		name: The name to add. (str)
+		"""
+		self.names += (name,)
+		Post.index.add('name', name, self.post_id)
+
+	def data_line(self):
+		"""Tab delimited text representation. (str)"""
+		data = [str(self.post_id), self.reddit_id, f'{self.date:%m/%d/%Y}', self.source, self.poster]
+		data.extend([self.title, str(self.score), str(self.per_up), str(self.comments), self.notes])
+		data.extend([self.url, self.permalink])
+		return '\t'.join(data) + '\n'
+
+	def details(self):
+		"""A detailed text representation. (str)"""
+		lines = ['Post {} by {} on {:%m/%d/%y} from {}:']
+		lines[0] = lines[0].format(self.reddit_id, self.poster, self.date, self.source)
+		lines.append('\t{}'.format(self.title[:70]))
+		lines.append('\tScore: {}, %Upvoted: {:.2%}, Comments: {}')
+		lines[-1] = lines[-1].format(self.score, self.per_up, self.comments)
+		if self.notes:
+			lines.append('\tNotes: {}'.format(self.notes))
+		if self.tags:
+			lines.append('\tTags: {}'.format(', '.join(sorted(self.tags))))
+		if self.names:
+			lines.append('\tNames: {}'.format(', '.join(sorted(self.names))))
+		return '\n'.join(lines)
+
+	def name_lines(self):
+		"""Tab delimited text representation of the post's names. (str)"""
+		if self.names:
+			return ''.join([f'{self.post_id}\t{name}\n' for name in self.names])
+		else:
+			return ''
+
+	def remove_name(self, name):
+		"""
+		Remove a name from the post. (None)
+
+		Parameters:
+		name: The name to remove. (str)
+		"""
+		index = self.names.index(name)
+		self.names = self.names[:index] + self.names[(index + 1):]
+		if name not in self.names:
+			Post.index.remove('name', name, self.post_id)
+
+	def remove_tag(self, tag):
+		"""
+		Remove a tag from the post. (None)
+
+		Parameters:
+		tag: The tag to remove. (str)
+		"""
+		index = self.tags.index(tag)
+		self.tags = self.tags[:index] + self.tags[(index + 1):]
+		if tag not in self.tags:
+			Post.index.remove('tag', tag, self.post_id)
+		Post.rollups.remove_tag(self, tag)
+		if Post.tagger.loaded:
+			Post.tagger.remove_tag(self, tag)
+
+	def row(self):
+		"""The fields of the post, for the snapshot cache. (tuple)"""
+		return (self.post_id, self.reddit_id, f'{self.date:%m/%d/%Y}', self.source, self.poster, self.title,
+			self.score, self.per_up, self.comments, self.notes, self.url, self.permalink, self.tags, self.names)
+
+	def set_links(self, submission):
+		"""
+		Fill in the post's link URL and permalink. (bool)
+
+		The return value is a flag indicating that either one changed.
+
+		Parameters:
+		submission: The Reddit data for the post. (praw.Submission)
+		"""
+		links = (submission.url, submission.permalink)
+		if links == (self.url, self.permalink):
+			return False
+		self.url, self.permalink = links
+		Post.dirty.add(self.post_id)
+		if Post.duplicates.loaded:
+			Post.duplicates.add(self.post_id, self.title, self.url)
+		return True
+
+	def suggest_tags(self, tag, n = 5):
+		"""
+		Find possible matches to a potential tag from the existing tags. (list of str)
+
+		Parameters:
+		tag: The potential tag to find matches for. (str)
+		n: How many tags to suggest. (int)
+		"""
+		return Post.tag_index.suggest(tag, n)
+
+	def suggest_names(self, name, n = 5):
+		"""
+		Find possible matches to a potential tag from the existing tags. (list of str)
+
+		Parameters:
+		name: The potential name to find matches for. (str)
+		n: How many tags to suggest. (int)
+		"""
+		return Post.name_index.suggest(name, n)
+
+	def tag_lines(self):
+		"""Tab delimited text representation of the post's tags. (str)"""
+		if self.tags:
+			return ''.join([f'{self.post_id}\t{tag}\n' for tag in self.tags])
+		else:
+			return ''
+
+	def update(self, submission):
+		"""
+		Update a Post based on a Submission. (None)
+
+		Parameters:
+		submission: The Reddit data to update with. (praw.Submission)
+		"""
+		if not self.permalink:
+			self.set_links(submission)
+		base = (self.score, self.per_up, self.comments)
+		self.score = submission.score
+		self.per_up = submission.upvote_ratio
+		self.comments = submission.num_comments
+		if base != (self.score, self.per_up, self.comments):
+			Post.dirty.add(self.post_id)
+			Post.history.record(self.post_id, self.score, self.per_up, self.comments)
+			Post.rollups.update(self, base)
+			return True
+		return False
+
+class PostRange(object):
+	"""
+	A lazily loaded sequence of local posts. (object)
+
+	Posts are only looked up when they are indexed, so listing a page of posts
+	only loads that page. The sequence is either the first count posts, or the
+	posts with the given ids.
+
+	Attributes:
+	count: The number of posts in the sequence. (int)
+	ids: The local ids of the posts in the sequence, if not the first count. (list of int)
+	posts: The local posts, keyed by local id. (PostStore or SQLitePosts)
+
+	Overridden Methods:
+	__init__
+	__getitem__
+	__len__
+	"""
+
+	def __init__(self, posts, count, ids = None):
+		"""
+		Set up the sequence. (None)
+
+		Parameters:
+		posts: The local posts, keyed by local id. (PostStore or SQLitePosts)
+		count: The number of posts in the sequence. (int)
+		ids: The local ids of the posts in the sequence, if not the first count. (list of int)
+		"""
+		self.posts = posts
+		self.count = count if ids is None else len(ids)
+		self.ids = ids
+
+	def __getitem__(self, index):
+		"""Get a post or a list of posts by position. (Post or list of Post)"""
+		if isinstance(index, slice):
+			return [self[position] for position in range(*index.indices(self.count))]
+		if index < 0:
+			index += self.count
+		if not 0 <= index < self.count:
+			raise IndexError('post index out of range')
+		return self.posts[index + 1 if self.ids is None else self.ids[index]]
+
+	def __len__(self):
+		"""The number of posts in the sequence. (int)"""
+		return self.count
+
+class PostStore(object):
+	"""
+	The local posts, stored once and looked up by local or Reddit id. (object)
+
+	Attributes:
+	reddit_ids: The local ids of the posts, by Reddit id. (dict of str: int)
+	rows: The posts, indexed by local id minus one. (list of Post)
+
+	Methods:
+	add: Add a post, or replace the post with the same local id. (None)
+	fingerprint: A summary of the searchable text, for checking the search index. (tuple)
+	known_ids: The Reddit ids of all of the posts. (set of str)
+	records: The fields of each post, as returned by Post.row, in local id order. (generator of tuple)
+	reddit_id: Get the Reddit id of a post. (str)
+	select: The posts, or only those without their links, in local id order. (list of Post)
+	texts: The searchable text of each post. (generator of tuple)
+
+	Overridden Methods:
+	__init__
+	__contains__
+	__getitem__
+	__iter__
+	__len__
+	"""
+
+	def __init__(self):
+		"""Set up the empty store. (None)"""
+		self.rows = []
+		self.reddit_ids = {}
+
+	def __contains__(self, key):
+		"""Check for a post by local or Reddit id. (bool)"""
+		if isinstance(key, str):
+			return key in self.reddit_ids
+		return 0 < key <= len(self.rows) and self.rows[key - 1] is not None
+
+	def __getitem__(self, key):
+		"""Get a post by local or Reddit id. (Post)"""
+		if isinstance(key, str):
+			return self.rows[self.reddit_ids[key] - 1]
+		if 0 < key <= len(self.rows) and self.rows[key - 1] is not None:
+			return self.rows[key - 1]
+		raise KeyError(key)
+
+	def __iter__(self):
+		"""Iterate over the posts in local id order. (iterator of Post)"""
+		return (post for post in self.rows if post is not None)
+
+	def __len__(self):
+		"""The number of posts stored. (int)"""
+		return len(self.reddit_ids)
+
+	def add(self, post):
+		"""
+		Add a post, or replace the post with the same local id. (None)
+
+		Parameters:
+		post: The post to add. (Post)
+		"""
+		if post.post_id > len(self.rows):
+			self.rows.extend([None] * (post.post_id - len(self.rows)))
+		self.rows[post.post_id - 1] = post
+		self.reddit_ids[post.reddit_id] = post.post_id
+
+	def fingerprint(self):
+		"""A summary of the searchable text, for checking the search index. (tuple)"""
+		return (len(self), sum(len(post.notes) for post in self))
+
+	def known_ids(self):
+		"""The Reddit ids of all of the posts. (set of str)"""
+		return set(self.reddit_ids)
+
+	def records(self):
+		"""The fields of each post, as returned by Post.row, in local id order. (generator of tuple)"""
+		return (post.row() for post in self)
+
+	def reddit_id(self, post_id):
+		"""
+		Get the Reddit id of a post. (str)
+
+		Parameters:
+		post_id: The local id of the post. (int)
+		"""
+		return self[post_id].reddit_id
+
+	def select(self, missing_links = False):
+		"""
+		The posts, or only those without their links, in local id order. (list of Post)
+
+		Parameters:
+		missing_links: A flag for only getting posts without their links. (bool)
+		"""
+		return [post for post in self if not (missing_links and post.permalink)]
+
+	def texts(self):
+		"""The local id, title and notes, and day ordinal of each post. (generator of tuple)"""
+		return ((post.post_id, f'{post.title} {post.notes}', post.date.toordinal()) for post in self)
+
+class SQLitePosts(object):
+	"""
+	Posts loaded from an SQLite database as needed. (object)
+
+	This acts like the PostStore used with the flat files: posts can be
+	looked up by local id or by Reddit id, but each post is only read from the
+	database the first time it is needed.
+
+	Attributes:
+	loaded: The posts read so far, keyed by local id. (dict of int: Post)
+	reddit_ids: Local ids of the posts read so far, by Reddit id. (dict of str: int)
+	store: The database the posts are stored in. (SQLiteStore)
+
+	Methods:
+	add: Add a post. (None)
+	fingerprint: A summary of the searchable text, for checking the search index. (tuple)
+	known_ids: The Reddit ids of all of the posts, saved or not. (set of str)
+	load: Read a post from the database. (None)
+	records: The fields of each post, as returned by Post.row, in local id order. (generator of tuple)
+	reddit_id: Get the Reddit id of a post. (str)
+	select: The posts, or only those without their links, in local id order. (list of Post)
+	texts: The searchable text of each post. (generator of tuple)
+
+	Overridden Methods:
+	__init__
+	__contains__
+	__getitem__
+	"""
+
+	def __init__(self, store):
+		"""
+		Set up the post lookup. (None)
+
+		Parameters:
+		store: The database the posts are stored in. (SQLiteStore)
+		"""
+		self.store = store
+		self.loaded = {}
+		self.reddit_ids = {}
+
+	def __contains__(self, key):
+		"""Check for a post by local or Reddit id. (bool)"""
+		try:
+			self[key]
+		except KeyError:
+			return False
+		return True
+
+	def __getitem__(self, key):
+		"""Get a post by local or Reddit id. (Post)"""
+		if isinstance(key, str):
+			if key not in self.reddit_ids:
+				self.load('reddit_id', key)
+			key = self.reddit_ids[key]
+		elif key not in self.loaded:
+			self.load('post_id', key)
+		return self.loaded[key]
+
+	def add(self, post):
+		"""
+		Add a post. (None)
+
+		Parameters:
+		post: The post to add. (Post)
+		"""
+		self.loaded[post.post_id] = post
+		self.reddit_ids[post.reddit_id] = post.post_id
+
+	def load(self, field, key):
+		"""
+		Read a post from the database. (None)
+
+		Parameters:
+		field: The field to look the post up by. (str)
+		key: The value of that field for the post. (int or str)
+		"""
+		post = self.store.read_post(field, key)
+		if post is None:
+			raise KeyError(key)
+		self.add(post)
+
+	def fingerprint(self):
+		"""A summary of the searchable text, for checking the search index. (tuple)"""
+		sql = 'SELECT COUNT(*), COALESCE(SUM(LENGTH(notes)), 0) FROM posts'
+		return tuple(self.store.connection.execute(sql).fetchone())
+
+	def known_ids(self):
+		"""The Reddit ids of all of the posts, saved or not. (set of str)"""
+		known = {reddit_id for reddit_id, in self.store.connection.execute('SELECT reddit_id FROM posts')}
+		return known | set(self.reddit_ids)
+
+	def records(self, where = ''):
+		"""
+		The fields of each post, as returned by Post.row, in local id order. (generator of tuple)
+
+		The posts are streamed from the database without being loaded, with the
+		tags and names merged in from their own queries in the same order. Posts
+		that have already been loaded are taken from memory, since they may have
+		changes that are not saved yet.
+
+		Parameters:
+		where: An SQL condition on the posts table limiting the posts given. (str)
+		"""
+		connection = self.store.connection
+		where = f'WHERE {where}' if where else ''
+		sql = f"""SELECT post_id, reddit_id, strftime('%m/%d/%Y', date), source, poster, title, score, per_up,
+			comments, COALESCE(notes, ''), COALESCE(url, ''), COALESCE(permalink, '') FROM posts {where}
+			ORDER BY post_id"""
+		groups = {}
+		for kind in ('tag', 'name'):
+			subset = f'WHERE post_id IN (SELECT post_id FROM posts {where})' if where else ''
+			rows = connection.execute(f'SELECT post_id, {kind} FROM post_{kind}s {subset} ORDER BY post_id, rowid')
+			groups[kind] = itertools.groupby(rows, operator.itemgetter(0))
+		current = {kind: next(group, (None, ())) for kind, group in groups.items()}
+		for row in connection.execute(sql):
+			post_id, values = row[0], {}
+			for kind in groups:
+				while current[kind][0] is not None and current[kind][0] < post_id:
+					current[kind] = next(groups[kind], (None, ()))
+				if current[kind][0] == post_id:
+					values[kind] = tuple(value for group_id, value in current[kind][1])
+				else:
+					values[kind] = ()
+			if post_id in self.loaded:
+				yield self.loaded[post_id].row()
+			else:
+				yield row + (values['tag'], values['name'])
+
+	def reddit_id(self, post_id):
+		"""
+		Get the Reddit id of a post, without reading the rest of the post. (str)
+
+		Parameters:
+		post_id: The local id of the post. (int)
+		"""
+		if post_id in self.loaded:
+			return self.loaded[post_id].reddit_id
+		sql = 'SELECT reddit_id FROM posts WHERE post_id = ?'
+		row = self.store.connection.execute(sql, (post_id,)).fetchone()
+		if row is None:
+			raise KeyError(post_id)
+		return row[0]
+
+	def select(self, missing_links = False):
+		"""
+		The posts, or only those without their links, in local id order. (list of Post)
 
-ACCESS_KWARGS = {'client_id': 'jy2JWMnhs2ZrSA', 'client_secret': 'LsnszIp9j_vVl9cvPDbEPemdyCg',
-	'user_agent': f'windows:cjr_tracker:{__version__} (by u/ichabod801)'}
+		The posts that are not loaded yet are read with one query (see records),
+		rather than one query per post.
 
-DATA_START = dt.datetime(2020, 4, 1)
+		Parameters:
+		missing_links: A flag for only getting posts without their links. (bool)
+		"""
+		posts = []
+		for row in self.records("COALESCE(permalink, '') = ''" if missing_links else ''):
+			if row[0] not in self.loaded:
+				post = Post('\t'.join(str(value) for value in row[:-2]))
+				for tag in row[-2]:
+					post.add_tag(tag, force = True)
+				for name in row[-1]:
+					post.add_name(name)
+				self.add(post)
+			post = self.loaded[row[0]]
+			if not (missing_links and post.permalink):
+				posts.append(post)
+		return posts
 
-LETTERS = 'ABCDEFGHIJKLMNOPQRSTUVWXYZ'
+	def texts(self):
+		"""The local id, title and notes, and day ordinal of each post. (generator of tuple)"""
+		sql = """SELECT post_id, title || ' ' || COALESCE(notes, ''),
+			CAST(julianday(date) - 1721424.5 AS INTEGER) FROM posts ORDER BY post_id"""
+		return self.store.connection.execute(sql)
 
-class Post(object):
+class SQLiteStore(object):
 	"""
-	A post on r/EndMassIncarceration. (object)
+	Storage of the local data in an SQLite database. (object)
 
-	Class Attributes:
-	all_names: All of the names in various posts. (set of str)
-	all_tags: All of the tags used in various posts. (dict of str: dict)
-	num_posts: The number of post objects created. (int)
+	This is an alternative to the flat data files and the journal, with the same
+	interface as the journal. Changes are written to the database as they are
+	recorded, and committed when the data is saved. Posts are only read from the
+	database when they are needed.
 
 	Attributes:
-	comments: The number of comments the post received. (int)
-	date: The date the post was submitted. (dt.datetime)
-	names: Names associated with the article. (list of str)
-	notes: Any moderator notes made on the post. (str)
-	per_up: The percentage upvoted for the post. (float)
-	post_id: The local post identifier. (int)
-	poster: The name of the Redditor who made the post. (str)
-	reddit_id: The Reddit post identifier. (str)
-	score: The Reddit score for the post. (int)
-	source: The website linked to. (str)
-	submission: The submission object for the post. (None or praw.Submission)
-	tags: The tags for the post. (str)
-	title: The title of the post. (str)
+	connection: The connection to the database. (sqlite3.Connection)
+	path: The path to the database file. (str)
+	size: Always 0, there is no journal to compact. (int)
+
+	Class Attributes:
+	lookups: Queries for post ids by tag, name, source, or poster. (dict of str: str)
+	schema: The SQL defining the tables and indexes. (str)
 
 	Methods:
-	_from_line: Intialize a post from local data. (None)
-	_from_submission: Initialize a post from Reddit data. (None)
-	add_note: Add a note to the post. (None)
-	add_tag: Add a tag to the post. (bool)
-	data_line: Tab delimited text representation. (str)
-	details: A detailed text representation. (str)
-	suggest_tags: Find possible matches to a potential tag. (list of str)
-	tag_lines: Tab delimited text representation of the post's tags. (str)
-	update: Update a Post based on a Submission. (None)
+	clear: Checkpoint the database's write-ahead log. (None)
+	discard: Discard any changes since the last save. (None)
+	import_data: Copy posts and valid tags into the database. (None)
+	load: Load the data needed at start up. (tuple)
+	mark: Commit the changes made since the last save. (None)
+	lookup: Get the ids of the posts with a value of a field. (set of int)
+	read_post: Read a post from the database. (Post or None)
+	record: Record a change to a post. (None)
 
 	Overridden Methods:
 	__init__
 	"""
 
-	num_posts = 0
-	all_tags = {}
-	all_names = set()
+	lookups = {'tag': 'SELECT post_id FROM post_tags WHERE tag = ?',
+		'name': 'SELECT post_id FROM post_names WHERE name = ?',
+		'source': 'SELECT post_id FROM posts WHERE source = ?',
+		'poster': 'SELECT post_id FROM posts WHERE poster = ?'}
 
-	def __init__(self, data):
+	schema = """
+		CREATE TABLE IF NOT EXISTS posts (post_id INTEGER PRIMARY KEY, reddit_id TEXT NOT NULL UNIQUE,
+			date TEXT, source TEXT, poster TEXT, title TEXT, score INTEGER, per_up REAL,
+			comments INTEGER, notes TEXT, url TEXT, permalink TEXT);
+		CREATE INDEX IF NOT EXISTS posts_date ON posts (date);
+		CREATE INDEX IF NOT EXISTS posts_source ON posts (source);
+		CREATE INDEX IF NOT EXISTS posts_poster ON posts (poster);
+		CREATE TABLE IF NOT EXISTS post_tags (post_id INTEGER NOT NULL, tag TEXT NOT NULL,
+			PRIMARY KEY (post_id, tag));
+		CREATE INDEX IF NOT EXISTS post_tags_tag ON post_tags (tag);
+		CREATE TABLE IF NOT EXISTS post_names (post_id INTEGER NOT NULL, name TEXT NOT NULL,
+			PRIMARY KEY (post_id, name));
+		CREATE INDEX IF NOT EXISTS post_names_name ON post_names (name);
+		CREATE TABLE IF NOT EXISTS valid_tags (tag_id INTEGER PRIMARY KEY, category TEXT,
+			parent TEXT, tag TEXT NOT NULL UNIQUE);
 		"""
-		Intialize a post from local data. (None)
+
+	def __init__(self, path = SQLITE_PATH):
+		"""
+		Open the database, creating the tables if needed. (None)
 
 		Parameters:
-		data: Data from a local data set or from Reddit. (str or Submission)
+		path: The path to the database file. (str)
 		"""
-		if isinstance(data, str):
-			self._from_line(data)
-		else:
-			self._from_submission(data)
+		self.path = path
+		self.size = 0
+		self.connection = sqlite3.connect(path)
+		self.connection.execute('PRAGMA journal_mode = WAL')
+		self.connection.execute('PRAGMA synchronous = NORMAL')
+		self.connection.executescript(self.schema)
+		# Databases made before the links were kept need the columns added.
+		columns = {row[1] for row in self.connection.execute('PRAGMA table_info(posts)')}
+		for column in ('url', 'permalink'):
+			if column not in columns:
+				self.connection.execute(f'ALTER TABLE posts ADD COLUMN {column} TEXT')
 
-	def __repr__(self):
+	def clear(self):
+		"""Checkpoint the database's write-ahead log. (None)"""
+		self.connection.commit()
+		self.connection.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+
+	def discard(self):
+		"""Discard any changes since the last save. (None)"""
+		self.connection.rollback()
+
+	def import_data(self, posts, valid_tags):
 		"""
-		Debugging text represenation. (str)
+		Copy posts and valid tags into the database. (None)
+
+		Parameters:
+		posts: The posts to copy. (iterable of Post)
+		valid_tags: The valid tags, with their categories and parents. (dict)
 		"""
-		return '<Post {} by {}, {:%m/%d/%y}>'.format(self.reddit_id, self.poster, self.date)
+		for post in posts:
+			self.record('post', post)
+			for tag in post.tags:
+				self.record('+tag', post, tag)
+			for name in post.names:
+				self.record('+name', post, name)
+		tag_rows = [(info['id'], info['category'], info['parent'], tag) for tag, info in valid_tags.items()]
+		self.connection.executemany('INSERT OR REPLACE INTO valid_tags VALUES (?, ?, ?, ?)', tag_rows)
+		self.mark()
 
-	def __str__(self):
+	def load(self):
 		"""
-		Human readable text representation. (str)
+		Load the data needed at start up. (tuple of SQLitePosts, dict)
+
+		Only the valid tags and the known names are read. Posts are read as they are
+		used.
 		"""
-		text = '{}  {:<20}  {:<8}  {:<48}  {:>4}'
-		date_text = self.date.strftime('%m/%d/%y')
-		return text.format(self.reddit_id, self.poster[:20], date_text, self.title[:48], self.score)
+		posts = SQLitePosts(self)
+		valid_tags = {}
+		for tag_id, category, parent, tag in self.connection.execute('SELECT * FROM valid_tags'):
+			valid_tags[tag] = {'id': tag_id, 'category': category, 'parent': parent}
+		for name, in self.connection.execute('SELECT DISTINCT name FROM post_names'):
+			Post.all_names.add(name)
+		max_id, = self.connection.execute('SELECT MAX(post_id) FROM posts').fetchone()
+		Post.num_posts = max_id or 0
+		return posts, valid_tags
 
-	def _from_line(self, line):
+	def lookup(self, field, value):
 		"""
-		Intialize a post from local data. (None)
+		Get the ids of the posts with a value of a field. (set of int)
 
 		Parameters:
-		line: A line in the local data set.
+		field: The field to check: tag, name, source, or poster. (str)
+		value: The value to look for. (str)
 		"""
-		fields = line.split('\t')
-		self.post_id = int(fields[0])
-		Post.num_posts += 1
-		self.reddit_id = fields[1]
-		self.date = dt.datetime.strptime(fields[2], '%m/%d/%Y')
-		self.source = fields[3]
-		self.poster = fields[4]
-		self.title = fields[5]
-		self.score = int(fields[6]) if fields[6] else 0
-		self.per_up = float(fields[7]) if fields[7] else 0.0
-		self.comments = int(fields[8]) if fields[8] else 0
-		self.notes = fields[9].strip()
-		self.tags = []
-		self.names = []
-		self.submission = None
+		return {post_id for post_id, in self.connection.execute(self.lookups[field], (value,))}
 
-	def _from_submission(self, data):
+	def mark(self):
+		"""Commit the changes made since the last save. (None)"""
+		self.connection.commit()
+
+	def read_post(self, field, key):
 		"""
-		Initialize a post from Reddit data. (None)
+		Read a post from the database. (Post or None)
 
 		Parameters:
-		data: A Reddit submission object. (praw.Submission)
+		field: The field to look the post up by, post_id or reddit_id. (str)
+		key: The value of that field for the post. (int or str)
 		"""
-		Post.num_posts += 1
-		self.post_id = Post.num_posts
-		self.reddit_id = data.id
-		self.date = dt.datetime.fromtimestamp(data.created_utc)
-		self.source = urlparse(data.url).netloc
-		self.poster = str(data.author)
-		self.title = data.title
-		self.score = data.score
-		self.per_up = data.upvote_ratio
-		self.comments = len(data.comments)
-		self.notes = ''
-		self.tags = []
-		self.names = []
-		self.submission = data
+		sql = f"""SELECT post_id, reddit_id, strftime('%m/%d/%Y', date), source, poster, title, score,
+			per_up, comments, COALESCE(notes, ''), COALESCE(url, ''), COALESCE(permalink, '') FROM posts
+			WHERE {field} = ?"""
+		row = self.connection.execute(sql, (key,)).fetchone()
+		if row is None:
+			return None
+		post = Post('\t'.join(str(value) for value in row))
+		for tag, in self.connection.execute('SELECT tag FROM post_tags WHERE post_id = ?', (post.post_id,)):
+			post.add_tag(tag, force = True)
+		for name, in self.connection.execute('SELECT name FROM post_names WHERE post_id = ?', (post.post_id,)):
+			post.add_name(name)
+		return post
 
-	def add_note(self, note):
+	def record(self, kind, post, value = ''):
 		"""
-		Add a note to the post. (None)
+		Record a change to a post. (None)
 
 		Parameters:
-		Note: The note to add to the post. (str)
+		kind: The kind of change: post, +tag, -tag, +name, or -name. (str)
+		post: The post that was changed. (Post)
+		value: The tag or name added or removed. (str)
 		"""
-		if self.notes:
-			self.notes = f'{self.notes} | {note}'
-		else:
-			self.notes = note
+		if kind == 'post':
+			row = (post.post_id, post.reddit_id, f'{post.date:%Y-%m-%d}', post.source, post.poster, post.title,
+				post.score, post.per_up, post.comments, post.notes, post.url, post.permalink)
+			sql = 'INSERT OR REPLACE INTO posts VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)'
+			self.connection.execute(sql, row)
+		elif kind == '+tag':
+			self.connection.execute('INSERT OR IGNORE INTO post_tags VALUES (?, ?)', (post.post_id, value))
+		elif kind == '-tag':
+			sql = 'DELETE FROM post_tags WHERE post_id = ? AND tag = ?'
+			self.connection.execute(sql, (post.post_id, value))
+		elif kind == '+name':
+			self.connection.execute('INSERT OR IGNORE INTO post_names VALUES (?, ?)', (post.post_id, value))
+		elif kind == '-name':
+			sql = 'DELETE FROM post_names WHERE post_id = ? AND name = ?'
+			self.connection.execute(sql, (post.post_id, value))
 
-	def add_tag(self, tag, force = False):
+class Shard(object):
+	"""
+	The local data for one tracked subreddit. (object)
+
+	Each shard is a directory with its own data files (or SQLite database),
+	journal, and polling state, as in the directory the tracker is run from. The
+	tracker codes the posts of one shard, the active one, whose data is loaded
+	at startup. The posts of the other shards are read the first time they are
+	needed, without adding them to the class attributes of Post, so they can be
+	listed, viewed, and totalled but not changed.
+
+	Attributes:
+	active: A flag for the shard being the one the tracker is coding. (bool)
+	count: The highest local id of the shard's posts, once loaded. (int)
+	index: The ids of the shard's posts by tag, name, source, and poster. (PostIndex or None)
+	name: The name of the subreddit. (str)
+	path: The directory with the shard's data. (str)
+	posts: The shard's posts, or None if not loaded yet. (PostStore or None)
+	rollups: Engagement totals for the shard's posts. (Rollups or None)
+	start: The date that data collection started for the subreddit. (datetime.datetime)
+	state: The polling state of the shard, or None if not loaded yet. (dict or None)
+
+	Methods:
+	file: Get the path of one of the shard's files. (str)
+	load: Read the shard's posts, if they have not been read. (PostStore)
+	load_state: Read the shard's polling state, if it has not been read. (dict)
+	read_flat: Read the posts from the shard's data files and journal. (generator of tuple)
+	refresh: Update the shard's posts with current Reddit statistics. (int)
+	save_state: Save the shard's polling state. (None)
+
+	Overridden Methods:
+	__init__
+	"""
+
+	def __init__(self, name, path = '.', start = DATA_START):
 		"""
-		Add a tag to the post. (bool)
+		Set up the shard, without loading it. (None)
 
-		The return value is a flag indicating that the tag was successfully added.
-		Tags are not added if they have not been seen before, unless the force
-		parameter is True.
+		Parameters:
+		name: The name of the subreddit. (str)
+		path: The directory with the shard's data. (str)
+		start: The date that data collection started for the subreddit. (datetime.datetime)
+		"""
+		self.name = name
+		self.path = path
+		self.start = start
+		self.active = False
+		self.count = 0
+		self.index = None
+		self.posts = None
+		self.rollups = None
+		self.state = None
+
+	def file(self, name):
+		"""
+		Get the path of one of the shard's files. (str)
 
 		Parameters:
-		tag: The tag to add. (str)
-		force: A flag for forcing the addition of the tag. (bool)
+		name: The name of the file. (str)
 		"""
-		if tag in Post.all_tags:
-			self.tags.append(tag)
-		elif force:
-			self.tags.append(tag)
-			#Post.all_tags.add(tag) !! replace with a new tag command.
+		return os.path.join(self.path, name)
+
+	def load(self):
+		"""Read the shard's posts, if they have not been read. (PostStore)"""
+		if self.posts is not None:
+			return self.posts
+		if os.path.exists(self.file(SQLITE_PATH)):
+			rows = SQLitePosts(SQLiteStore(self.file(SQLITE_PATH))).records()
 		else:
-			return False
-		return True
+			rows = self.read_flat()
+		posts, index = PostStore(), PostIndex()
+		for row in rows:
+			post = Post(row)
+			posts.add(post)
+			index.add('source', post.source, post.post_id)
+			index.add('poster', post.poster, post.post_id)
+			for tag in post.tags:
+				index.add('tag', tag, post.post_id)
+			for name in post.names:
+				index.add('name', name, post.post_id)
+			self.count = max(self.count, post.post_id)
+		self.rollups = Rollups()
+		self.rollups.build(posts)
+		self.posts, self.index = posts, index
+		return posts
 
-	def data_line(self):
-		"""Tab delimited text representation. (str)"""
-		data = [str(self.post_id), self.reddit_id, f'{self.date:%m/%d/%Y}', self.source, self.poster]
-		data.extend([self.title, str(self.score), str(self.per_up), str(self.comments), self.notes])
-		return '\t'.join(data) + '\n'
+	def load_state(self):
+		"""Read the shard's polling state, if it has not been read. (dict)"""
+		if self.state is None:
+			self.state = load_state(self.file(STATE_PATH))
+		return self.state
 
-	def details(self):
-		"""A detailed text representation. (str)"""
-		lines = ['Post {} by {} on {:%m/%d/%y} from {}:']
-		lines[0] = lines[0].format(self.reddit_id, self.poster, self.date, self.source)
-		lines.append('\t{}'.format(self.title[:70]))
-		lines.append('\tScore: {}, %Upvoted: {:.2%}, Comments: {}')
-		lines[-1] = lines[-1].format(self.score, self.per_up, self.comments)
-		if self.notes:
-			lines.append('\tNotes: {}'.format(self.notes))
-		if self.tags:
-			self.tags.sort()
-			lines.append('\tTags: {}'.format(', '.join(self.tags)))
-		if self.names:
-			self.names.sort()
-			lines.append('\tNames: {}'.format(', '.join(self.names)))
-		return '\n'.join(lines)
+	def read_flat(self):
+		"""
+		Read the posts from the shard's data files and journal. (generator of tuple)
 
-	def name_lines(self):
-		"""Tab delimited text representation of the post's names. (str)"""
-		if self.names:
-			return ''.join([f'{self.post_id}\t{name}\n' for name in self.names])
-		else:
-			return ''
+		The posts are given as the tuples returned by Post.row, with any changes in
+		the journal applied.
+		"""
+		rows, tags, names = {}, collections.defaultdict(list), collections.defaultdict(list)
+		with open(self.file('post_data.txt')) as post_file:
+			for line in post_file:
+				if not line.startswith('post_id'):
+					fields = line.rstrip('\n').split('\t')
+					rows[int(fields[0])] = fields
+		for file_name, values in (('tag_data.txt', tags), ('name_data.txt', names)):
+			with open(self.file(file_name)) as data_file:
+				for line in data_file:
+					if not line.startswith('post_id'):
+						post_id, value = line.strip().split('\t')
+						values[int(post_id)].append(value)
+		if os.path.exists(self.file('journal.txt')):
+			with open(self.file('journal.txt')) as journal_file:
+				for line in journal_file:
+					kind, tab, data = line.partition('\t')
+					if not data.endswith('\n'):
+						break
+					if kind == 'post':
+						fields = data.rstrip('\n').split('\t')
+						rows[int(fields[0])] = fields
+						continue
+					post_id, value = data.rstrip('\n').split('\t')
+					values = tags if kind.endswith('tag') else names
+					if kind.startswith('+') and value not in values[int(post_id)]:
+						values[int(post_id)].append(value)
+					elif kind.startswith('-') and value in values[int(post_id)]:
+						values[int(post_id)].remove(value)
+		for post_id in sorted(rows):
+			fields = rows[post_id]
+			yield (post_id, fields[1], fields[2], sys.intern(fields[3]), sys.intern(fields[4]), fields[5],
+				int(fields[6]) if fields[6] else 0, float(fields[7]) if fields[7] else 0.0,
+				int(fields[8]) if fields[8] else 0, fields[9].strip(), fields[10] if len(fields) > 10 else '',
+				fields[11] if len(fields) > 11 else '', tuple(tags[post_id]), tuple(names[post_id]))
 
-	def suggest_tags(self, tag, n = 5):
+	def refresh(self, reddit, cache = None):
 		"""
-		Find possible matches to a potential tag from the existing tags. (list of str)
+		Update the shard's posts with current Reddit statistics. (int)
+
+		This works like refresh_posts, but without Post.update, which changes the
+		class attributes of Post that belong to the active shard. The shard's
+		rollups are adjusted, any missing links are filled in, and the changed
+		posts are written to the shard's journal (or database). The history of
+		statistics is only kept for the active shard. The return value is the
+		number of posts whose statistics changed.
 
 		Parameters:
-		tag: The potential tag to find matches for. (str)
-		n: How many tags to suggest. (int)
+		reddit: A reddit instance. (praw.Reddit)
+		cache: A cache of Reddit submissions. (SubmissionCache or None)
 		"""
-		distances = [(levenshtein(tag, existing), existing) for existing in Post.all_tags]
-		distances.sort()
-		return [tag for distance, tag in distances[:n]]
+		posts = self.load()
+		changed, dirty = 0, []
+		for submission in load_submissions(reddit, [post.reddit_id for post in posts], cache, stats = True):
+			post = posts[submission.id]
+			base = (post.score, post.per_up, post.comments)
+			stats = (submission.score, submission.upvote_ratio, submission.num_comments)
+			if stats != base:
+				post.score, post.per_up, post.comments = stats
+				self.rollups.update(post, base)
+				changed += 1
+			elif post.permalink:
+				continue
+			if not post.permalink:
+				post.url, post.permalink = submission.url, submission.permalink
+			dirty.append(post)
+		if dirty:
+			if os.path.exists(self.file(SQLITE_PATH)):
+				store = SQLiteStore(self.file(SQLITE_PATH))
+			else:
+				store = Journal(self.file('journal.txt'))
+			for post in dirty:
+				store.record('post', post)
+			store.mark()
+		return changed
 
-	def suggest_names(self, name, n = 5):
+	def save_state(self):
+		"""Save the shard's polling state. (None)"""
+		save_state(self.state, self.file(STATE_PATH))
+
+class TagRules(object):
+	"""
+	Rules for tagging new posts without prompting. (object)
+
+	The rules file is tab delimited, with the kind of rule, a pattern, and a
+	comma separated list of tags on each line. Title rules have a regular
+	expression that is searched for in the post title, ignoring case. Source
+	rules have a domain that matches the post's source or any subdomain of it.
+	Blank lines and lines starting with # are ignored.
+
+	Attributes:
+	sources: The tags for each source domain. (dict of str: list)
+	titles: The regular expressions for titles and their tags. (list of tuple)
+
+	Methods:
+	match: Get the tags the rules give a post. (list of str)
+
+	Overridden Methods:
+	__init__
+	__len__
+	"""
+
+	def __init__(self, path = RULES_PATH):
 		"""
-		Find possible matches to a potential tag from the existing tags. (list of str)
+		Load the rules. (None)
 
 		Parameters:
-		name: The potential name to find matches for. (str)
-		n: How many tags to suggest. (int)
+		path: The path to the rules file. (str)
 		"""
-		distances = [(levenshtein(name, existing), existing) for existing in Post.all_names]
-		distances.sort()
-		return [name for distance, name in distances[:n]]
+		self.sources, self.titles = {}, []
+		with open(path) as rules_file:
+			for line_number, line in enumerate(rules_file, start = 1):
+				if not line.strip() or line.startswith('#'):
+					continue
+				try:
+					kind, pattern, tags = line.rstrip('\n').split('\t')
+				except ValueError:
+					raise ValueError(f'Invalid tag rule on line {line_number} of {path}.')
+				tags = [tag.strip().lower() for tag in tags.split(',') if tag.strip()]
+				if kind == 'title':
+					self.titles.append((re.compile(pattern, re.IGNORECASE), tags))
+				elif kind == 'source':
+					self.sources.setdefault(pattern.lower(), []).extend(tags)
+				else:
+					raise ValueError(f'Invalid kind of tag rule on line {line_number} of {path}: {kind!r}.')
 
-	def tag_lines(self):
-		"""Tab delimited text representation of the post's tags. (str)"""
-		if self.tags:
-			return ''.join([f'{self.post_id}\t{tag}\n' for tag in self.tags])
-		else:
-			return ''
+	def __len__(self):
+		"""The number of rules. (int)"""
+		return len(self.titles) + len(self.sources)
 
-	def update(self, submission):
+	def match(self, title, source):
 		"""
-		Update a Post based on a Submission. (None)
+		Get the tags the rules give a post. (list of str)
 
 		Parameters:
-		submission: The Reddit data to update with. (praw.Submission)
+		title: The title of the post. (str)
+		source: The domain the post links to. (str)
 		"""
-		base = (self.score, self.per_up, self.comments)
-		self.score = submission.score
-		self.per_up = submission.upvote_ratio
-		self.comments = len(submission.comments)
-		self.submission = submission
-		return base != (self.score, self.per_up, self.comments)
+		tags = []
+		for regex, rule_tags in self.titles:
+			if regex.search(title):
+				tags.extend(rule_tags)
+		# Check the domain and each parent domain.
+		parts = source.lower().split('.')
+		for start in range(len(parts) - 1):
+			tags.extend(self.sources.get('.'.join(parts[start:]), []))
+		return list(dict.fromkeys(tags))
+
+class TimedRequestor(prawcore.Requestor):
+	"""
+	A requestor that paces Reddit requests, and times them when Tracker.perf is on. (prawcore.Requestor)
+
+	Each request waits for Tracker.scheduler first, and the rate limit headers of
+	each response are passed back to it.
+
+	Overridden Methods:
+	request
+	"""
+
+	def request(self, method, url, *args, **kwargs):
+		"""
+		Make a request to Reddit. (requests.Response)
+
+		Parameters:
+		method: The HTTP method of the request. (str)
+		url: The URL requested. (str)
+		args: Other positional arguments for the request. (tuple)
+		kwargs: Other keyword arguments for the request. (dict)
+		"""
+		perf, scheduler = Tracker.perf, Tracker.scheduler
+		scheduler.acquire()
+		if not perf.enabled:
+			response = super().request(method, url, *args, **kwargs)
+		else:
+			start = time.perf_counter()
+			try:
+				response = super().request(method, url, *args, **kwargs)
+			finally:
+				perf.record('reddit', perf.request_name(method, url), time.perf_counter() - start)
+		scheduler.update(response.headers, response.status_code)
+		return response
 
 class Tracker(cmdr.Cmdr):
 	"""
 	An interface for tracking r/EndMassIncarceration. (cmdr.Cmdr)
 
 	Attributes:
+	background: Reddit access in the background. (AsyncReddit)
+	command_name: The command being timed, if any. (str or None)
+	command_start: When the command being timed started. (float)
 	current: The current post being updated. (Post)
-	local_posts: The posts coded and stored locally. (list of Post)
+	discard_changes: A flag for quitting without saving the changes. (bool)
+	local_posts: The posts coded and stored locally. (PostStore or SQLitePosts)
 	new_posts: New posts from reddit, not yet coded. (list of Submission)
 	post_changes: A flag for changes having been made to posts. (bool)
+	prefetching: Reddit ids of new posts being got ready. (set of str)
+	profile: The profile of the current command, if profiling. (cProfile.Profile or None)
 	reddit: A connection to Reddit. (Reddit)
+	scan_local: Per thread Reddit connections for scanning. (threading.local)
+	shard: The subreddit whose posts are being coded. (Shard)
+	shards: All of the subreddits tracked. (list of Shard)
+	submission_cache: Submission data saved from Reddit. (SubmissionCache)
 	silent: A flag for suppressing postcmd text after a command. (bool)
+	state: The polling state for each subreddit. (dict)
+	store: Where changes to the local data are written. (Journal or SQLiteStore)
 	tag_changes: A flag for changes having been made to tags. (bool)
+	unsaved_new: New posts viewed since the last save. (list of Submission)
 	update: A flag for update mode. (bool)
 
 	Class Attributes:
+	compact_size: The journal size that triggers rewriting the data. (int)
+	filter_operators: The comparisons allowed in list filters. (dict of str: callable)
+	filter_re: A regular expression matching a list filter. (regex)
+	numeric_filters: Post attributes and types for numeric filters. (dict)
+	perf: Timing of commands, Reddit requests, and loading and saving. (Perf)
+	prefetch_size: How many new posts to get ready ahead of view next. (int)
+	required_tags: The kinds of tags each post needs, and their categories. (tuple of tuple)
+	scheduler: Pacing of Reddit requests from every thread. (RequestScheduler)
+	shards_path: The file listing the subreddits tracked. (str)
 	valid_ranges: Validity checkers for set command. (dict)
 	word_re: A regular expression matching alphabetic words. (regex)
 
 	Methods:
+	batch: Load new posts and tag them by rules, without prompting. (dict)
 	do_back: Go back one page in the listing. (None)
 	do_end: Go to the last page in the listing. (None)
+	do_export: Export the local posts, with their tags and names, for analysis. (None)
+	do_jobs: Show how many background jobs are running, and the Reddit request quota. (None)
 	do_list: List the specified posts. (None)
 	do_load: Load (reload) data. (None)
+	do_migrate: Copy the local data into an SQLite database. (None)
 	do_name: Add a name to the current post. (None)
 	do_note: Add a note to the current post. (None)
 	do_open: Open a Reddit post in the browser. (None)
+	do_perf: Show or control timing of the tracker. (None)
 	do_quit: Leave the tracking interface. (True)
 	do_save: Save any changed data. (s)
-	do_scan: Scan another subreddit for potential articles. (None)
+	do_scan: Scan other subreddits for potential articles. (None)
+	do_search: Search the titles and notes of the local posts. (None)
 	do_start: Go to the first page in the listing. (<<)
+	do_stats: Show engagement statistics for groups of local posts. (None)
 	do_tag: Add one or more tags to the current post. (None)
+	do_trend: Show how posts' statistics have changed. (None)
 	do_unname: Remove a name from a post. (None)
 	do_untag: Remove a tag from a post. (None)
 	do_update: Turn update mode on or off. (None)
 	do_view: View a post, either by local_id or reddit_id. (None)
+	filter_posts: Find the local posts matching some filters. (list of Post)
+	find_duplicates: Find the local posts that are likely the same story as a submission. (list of Post)
 	list_posts: Display a list of local Post objects. (None)
+	compact: Rewrite the data files and clear the journal. (None)
+	deliver: Apply the results of any finished background jobs. (None)
+	get_submission: Get a submission, from the cache if possible. (Submission)
+	list_matches: Display scan matches, ranked by the number of keywords matched. (None)
 	list_submissions: Display a list of Reddit Submission objects. (None)
+	missing_categories: Find the required kinds of tags a post is missing. (list of str)
+	open_submission: Open a submission in the browser. (None)
+	prefetch: Start getting the next new posts ready to view in the background. (None)
+	propose_tags: Show the likeliest tags for each kind of tag a post is missing. (None)
+	refresh_shard: Check a shard's subreddit for new posts and statistics. (tuple of list, int)
 	save_names: Save the name data. (None)
 	save_posts: Save the post data. (None)
 	save_tags: Save the tag data. (None)
+	scan_subreddit: Find new posts in a subreddit with keywords in the title. (list)
+	split_background: Split a trailing & off of command arguments. (tuple of str, bool)
 	tag_check: Check a post for the required tags. (None)
 	update_check: Check if it is valid to update the current record. (bool)
 
 	Overridden Methods:
 	postcmd
 	postloop
+	precmd
 	preloop
 	"""
 
 	aliases = {'<': 'back', '<<': 'start', '>': 'forward', '>>': 'end', '-n': 'unname', '-t': 'untag',
 		'b': 'back', 'f': 'forward', 'ls': 'list', 'q': 'quit', 't': 'tag', 'tags': 'tag', 'u': 'update',
 		'v': 'view'}
+	compact_size = 500
+	filter_operators = {'=': operator.eq, '!=': operator.ne, '>': operator.gt, '>=': operator.ge,
+		'<': operator.lt, '<=': operator.le}
+	filter_re = re.compile(r'(\w+)(!=|>=|<=|=|>|<)(.+)')
+	numeric_filters = {'score': ('score', int), 'comments': ('comments', int), 'com': ('comments', int),
+		'per': ('per_up', float)}
+	perf = Perf()
+	scheduler = RequestScheduler()
+	prefetch_size = 3
 	prompt = 'tracker >> '
-	valid_ranges = {'page_size': range(5, 100)}
+	required_tags = (('a process or theme', ('process', 'theme')), ('a location', ('location',)),
+		('an article type', ('article-types',)))
+	shards_path = SHARDS_PATH
+	valid_ranges = {'page_size': range(5, 100), 'prefetch_size': range(0, 26)}
 	word_re = re.compile('\w+')
 
+	def batch(self, rules, deep = False):
+		"""
+		Load new posts and tag them by rules, without prompting. (dict)
+
+		New posts that match any of the rules are added to the local data with the
+		tags the rules give them, and the rest are left for coding by hand. The data
+		is saved once at the end. Anything the tracker would normally print is sent
+		to stderr, and a summary of what was done is returned.
+
+		Parameters:
+		rules: The rules for tagging new posts. (TagRules)
+		deep: A flag for a deep load of the Reddit data. (bool)
+		"""
+		with contextlib.redirect_stdout(sys.stderr):
+			# New posts are tagged without viewing them, so don't prefetch them.
+			self.prefetch_size = 0
+			self.preloop()
+			if deep:
+				self.do_load('deep')
+			updated = len(Post.dirty)
+			summary = {'checked': len(self.new_posts), 'added': {}, 'needs_tags': [], 'unknown_tags': set()}
+			remaining = []
+			for submission in reversed(self.new_posts):
+				tags = rules.match(submission.title, urlparse(submission.url).netloc)
+				known = [tag for tag in tags if tag in Post.all_tags]
+				summary['unknown_tags'].update(tag for tag in tags if tag not in Post.all_tags)
+				if not known:
+					remaining.append(submission)
+					continue
+				post = Post(submission)
+				self.local_posts.add(post)
+				self.store.record('post', post)
+				Post.dirty.discard(post.post_id)
+				for tag in known:
+					post.add_tag(tag)
+					self.store.record('+tag', post, tag)
+				summary['added'][post.reddit_id] = known
+				if self.missing_categories(post):
+					summary['needs_tags'].append(post.reddit_id)
+			self.new_posts = remaining[::-1]
+			if summary['added']:
+				self.post_changes = self.tag_changes = True
+			self.postloop()
+		summary['updated'] = updated
+		summary['pending'] = len(self.new_posts)
+		summary['unknown_tags'] = sorted(summary['unknown_tags'])
+		return summary
+
+	def compact(self):
+		"""
+		Rewrite the data files and clear the journal. (None)
+
+		With SQLite storage there are no data files, and the database's write-ahead
+		log is checkpointed instead. The history of post statistics is downsampled
+		at the same time.
+		"""
+		if isinstance(self.store, Journal):
+			self.save_posts()
+			self.save_names()
+			self.save_tags()
+		self.store.clear()
+		Post.history.downsample()
+
+	def deliver(self):
+		"""
+		Apply the results of any finished background jobs. (None)
+
+		Listings and statistics fetched in the background are put in the
+		submission cache, so they are applied by the usual code without any more
+		requests to Reddit.
+		"""
+		matches, checked, changed, filled = {}, 0, 0, None
+		for kind, args, result, error in self.background.finished():
+			if kind == 'prefetch':
+				# Let a failed prefetch be tried again.
+				self.prefetching.discard(args[0])
+			if error is not None:
+				print(f'Error in background {kind}: {type(error).__name__}: {error}')
+			elif kind == 'load':
+				self.new_posts = check_cjr(self.reddit, current = self.local_posts, cache = self.submission_cache,
+					state = self.state, subreddit = self.shard.name, start = self.shard.start, listing = result)
+				self.prefetch()
+				print(f'Background load found {len(self.new_posts)} new posts.')
+			elif kind == 'stats':
+				posts = [self.local_posts[reddit_id] for reddit_id in args[0]]
+				checked += len(posts)
+				changed += refresh_posts(self.reddit, posts, cache = self.submission_cache)
+			elif kind == 'links':
+				posts = [self.local_posts[reddit_id] for reddit_id in args[0]]
+				filled = (filled or 0) + backfill_links(self.reddit, posts, cache = self.submission_cache)
+			elif kind == 'scan':
+				print(f'r/{args[0]}: {len(result)} matching articles.')
+				for match, post in result:
+					if post.id not in matches or matches[post.id][0] < match:
+						matches[post.id] = (match, post)
+			elif kind == 'open':
+				self.open_submission(result, args[1])
+			elif kind == 'prefetch':
+				# Swap in the refreshed submission, if it has not been viewed yet.
+				for index in range(len(self.new_posts) - 1, -1, -1):
+					if self.new_posts[index].id == result.id:
+						self.new_posts[index] = result
+						break
+		if checked:
+			if changed:
+				self.post_changes = True
+			print(f'{changed} of {checked} posts had new statistics.')
+		if filled is not None:
+			if filled:
+				self.post_changes = True
+			print(f'{filled} posts had their links filled in.')
+		if matches:
+			print()
+			self.list_matches(matches)
+
 	def do_add(self, arguments):
 		"""
 		Add a tag to the valid tag list. (a)
 		"""
-		categories = sorted(set(tag['category'] for tag in Post.all_tags.values()))
+		categories = sorted(Post.tag_tree.roots)
 		for category_index, category in enumerate(categories, start = 1):
 			print(f'{category_index}: {category}')
 		category_index = input('\nChoose a category: ')
 		category = categories[int(category_index) - 1]
 		current_parent = 'N/A'
-		parents = sorted(set(tag for tag, info in Post.all_tags.items() if info['category'] == category))
-		parents = [parent for parent in parents if Post.all_tags[parent]['parent'] == 'N/A']
+		parents = sorted(Post.tag_tree.roots[category])
 		while True:
 			if not parents:
 				break
@@ -346,10 +3662,11 @@ class Tracker(cmdr.Cmdr):
 			if not parent_index:
 				break
 			current_parent = parents[int(parent_index) - 1]
-			data = set(tag for tag, info in Post.all_tags.items() if info['parent'] == current_parent)
-			parents = sorted(data)
+			parents = sorted(Post.tag_tree.children[current_parent])
 		tag_id = len(Post.all_tags) + 1
 		Post.all_tags[arguments] = {'id': tag_id, 'category': category, 'parent': current_parent}
+		Post.tag_tree.add(arguments, category, current_parent)
+		Post.tag_index.add(arguments)
 
 	def do_back(self, arguments):
 		"""
@@ -383,17 +3700,49 @@ class Tracker(cmdr.Cmdr):
 		Arguments include:
 			new (n): List the new posts that have not be coded.
 			local (loc, l): List the locally coded posts.
+			all (a): List the coded posts of every subreddit tracked.
 
 		If neither new or local is given as an argument, the last listing is reshown.
+
+		The local argument may be followed by filters on the posts, such as
+		tag=police, source=nytimes.com, poster=ichabod801, or name="Walter Barton".
+		Use under=police for posts tagged police or any tag under police, and
+		category=location for posts with any location tag.
+		The score, comments (com), and per (percent upvoted) fields may be filtered
+		with =, !=, >, >=, <, or <=, as in score>5. The all argument takes the
+		same filters.
 		"""
-		arguments = arguments.lower()
-		if arguments in ('n', 'new'):
+		kind, space, filters = arguments.partition(' ')
+		kind = kind.lower()
+		if kind in ('n', 'new'):
 			self.list_submissions(self.new_posts)
 			self.current_list = self.new_posts
 			self.current_index = 0
-		elif arguments in ('l', 'loc', 'local'):
-			data = [self.local_posts[post_id] for post_id in range(1, Post.num_posts + 1)]
-			# Eventually there will be filters here.
+		elif kind in ('l', 'loc', 'local'):
+			if filters.strip():
+				data = self.filter_posts(filters)
+				if data is None:
+					return
+				elif not data:
+					print('No local posts match those filters.')
+			else:
+				data = PostRange(self.local_posts, Post.num_posts)
+			self.current_list = data
+			self.current_index = 0
+			self.list_posts(data[:self.page_size])
+		elif kind in ('a', 'all'):
+			data = []
+			for shard in self.shards:
+				if filters.strip():
+					posts = self.filter_posts(filters, shard)
+					if posts is None:
+						return
+				elif shard.active:
+					posts = PostRange(self.local_posts, Post.num_posts)
+				else:
+					posts = list(shard.load())
+				print(f'r/{shard.name}: {len(posts)} posts.')
+				data.extend(posts)
 			self.current_list = data
 			self.current_index = 0
 			self.list_posts(data[:self.page_size])
@@ -410,12 +3759,99 @@ class Tracker(cmdr.Cmdr):
 		"""
 		Load (reload) data.
 
-		If no argument is passed or the argument is r, red, or reddit, this reloads
-		the new reddit data.
+		If no argument is passed or the argument is r, red, or reddit, this loads
+		any new reddit data posted since the last load. If the argument is s or
+		stats, the score, upvote ratio, and comment count of every local post is
+		refreshed from Reddit. If the argument is d or deep, both are done, and the
+		whole listing of new posts is checked again. If the argument is a or all,
+		the other subreddits tracked are also checked (at the same time): their
+		new posts are saved to be coded when tracking them, and their posts'
+		statistics are refreshed. If the argument is
+		l or links, the link URLs and permalinks of local posts saved without them
+		are filled in.
+
+		End the arguments with & to load the data in the background. The results
+		are applied after a later command finishes.
 		"""
-		if arguments.lower() in ('', 'r', 'red', 'reddit'):
+		arguments, background = self.split_background(arguments.lower())
+		if background and arguments in ('l', 'links'):
+			reddit_ids = [post.reddit_id for post in self.local_posts.select(missing_links = True)]
+			for start in range(0, len(reddit_ids), 100):
+				self.background.submit('links', load_submissions, reddit_ids[start:(start + 100)],
+					self.submission_cache)
+			print('Loading post links in the background ...')
+		elif background and arguments in ('', 'r', 'red', 'reddit', 'd', 'deep', 's', 'stats'):
+			if arguments in ('s', 'stats', 'd', 'deep'):
+				# Look up the statistics in batches that can run at the same time.
+				reddit_ids = [post.reddit_id for post in self.local_posts.select()]
+				for start in range(0, len(reddit_ids), 100):
+					self.background.submit('stats', load_submissions, reddit_ids[start:(start + 100)],
+						self.submission_cache, True)
+			if arguments not in ('s', 'stats'):
+				# The local ids are copied, since the posts cannot be read from another thread.
+				sub_state = self.state.get(self.shard.name, {})
+				known = (self.local_posts.known_ids(), set(sub_state.get('pending', [])))
+				self.background.submit('load', fetch_cjr, sub_state.get('newest'), known, arguments in ('d', 'deep'),
+					self.submission_cache, self.shard.name)
+			print('Loading Reddit data in the background ...')
+		elif arguments in ('', 'r', 'red', 'reddit', 'd', 'deep'):
 			print('Loading Reddit data ...')
-			self.new_posts = check_cjr(self.reddit, current = self.local_posts)
+			deep = arguments in ('d', 'deep')
+			with self.perf.timer('check new posts'):
+				self.new_posts = check_cjr(self.reddit, current = self.local_posts, cache = self.submission_cache,
+					state = self.state, deep = deep, subreddit = self.shard.name, start = self.shard.start)
+			if deep:
+				self.do_load('stats')
+		elif arguments in ('a', 'all'):
+			self.do_load('reddit')
+			others = [shard for shard in self.shards if not shard.active]
+			if not others:
+				return
+			print('Checking the other subreddits ...')
+			with self.perf.timer('check other subreddits'):
+				with ThreadPoolExecutor(max_workers = min(SCAN_WORKERS, len(others))) as pool:
+					futures = {pool.submit(self.refresh_shard, shard): shard for shard in others}
+					for future in as_completed(futures):
+						shard = futures[future]
+						try:
+							new_posts, changed = future.result()
+						except (praw.exceptions.PRAWException, prawcore.exceptions.PrawcoreException):
+							print(f'Error connecting to r/{shard.name}.')
+							continue
+						print(f'r/{shard.name}: {len(new_posts)} new posts to code, {changed} with new statistics.')
+		elif arguments in ('s', 'stats'):
+			print('Refreshing post statistics ...')
+			posts = self.local_posts.select()
+			with self.perf.timer('refresh statistics'):
+				changed = refresh_posts(self.reddit, posts, cache = self.submission_cache)
+			if changed:
+				self.post_changes = True
+			print(f'{changed} of {len(posts)} posts had new statistics.')
+		elif arguments in ('l', 'links'):
+			print('Loading post links ...')
+			posts = self.local_posts.select(missing_links = True)
+			with self.perf.timer('load links'):
+				filled = backfill_links(self.reddit, posts, cache = self.submission_cache)
+			if filled:
+				self.post_changes = True
+			print(f'{filled} posts had their links filled in.')
+
+	def do_migrate(self, arguments):
+		"""
+		Copy the local data into an SQLite database.
+
+		Once the database exists, it is used for storage instead of the data files
+		the next time the tracker is started. The data files are left alone.
+		"""
+		if isinstance(self.store, SQLiteStore):
+			print('The data is already stored in SQLite.')
+		elif os.path.exists(SQLITE_PATH):
+			print(f'The database {SQLITE_PATH} already exists.')
+		else:
+			self.do_save('')
+			posts = PostRange(self.local_posts, Post.num_posts)
+			SQLiteStore(SQLITE_PATH).import_data(posts, Post.all_tags)
+			print(f'The data was copied to {SQLITE_PATH}, and will be used on the next start.')
 
 	def do_name(self, arguments):
 		"""
@@ -425,25 +3861,31 @@ class Tracker(cmdr.Cmdr):
 			# Check the name against existing names.
 			if arguments not in Post.all_names:
 				# Query the user after failed additions.
-				suggested = self.current.suggest_names(arguments)
+				with self.perf.timer('suggest names'):
+					suggested = self.current.suggest_names(arguments)
 				print('The name {!r} was not recognized. Suggested names:'.format(arguments))
 				for maybe_index, maybe_name in enumerate(suggested, start = 1):
 					print('   {}. {}'.format(maybe_index, maybe_name))
 				choice = input('Enter f to force name, s to skip name, or # to use suggested name: ')
 				# Process the user's choice for handling a failed addition.
 				if choice.lower() == 'f':
-					self.current.names.append(arguments)
+					self.current.add_name(arguments)
+					self.store.record('+name', self.current, arguments)
 					self.name_changes = True
 					Post.all_names.add(arguments)
+					Post.name_index.add(arguments)
 				elif choice.isdigit():
-					self.current.names.append(suggested[int(choice) - 1])
+					name = suggested[int(choice) - 1]
+					self.current.add_name(name)
+					self.store.record('+name', self.current, name)
 					self.name_changes = True
 				elif choice.lower() == 's':
 					pass
 				else:
 					print('Your choice was not recognized, so the name was skipped.')
 			else:
-				self.current.names.append(arguments)
+				self.current.add_name(arguments)
+				self.store.record('+name', self.current, arguments)
 				self.name_changes = True
 
 	def do_note(self, arguments):
@@ -460,17 +3902,37 @@ class Tracker(cmdr.Cmdr):
 
 		The argument should be a Reddit ID or a local post ID. This opens the post on
 		Reddit. If a second argument of 'link' is provided, the linked web page is
-		opened instead.
+		opened instead. Local posts are opened from their saved links, so only
+		posts that are not local (or not yet filled in by load links) are looked
+		up. End the arguments with & to look the post up in the background, and
+		open it when that is done.
 		"""
 		# Parse the arguments.
+		arguments, background = self.split_background(arguments)
 		post_id, space, link = arguments.partition(' ')
 		link = link.lower() == 'link'
 		if len(post_id) < 6 and post_id.isdigit():
-			post_id = self.local_posts[int(post_id)].reddit_id
-		# Determine the URL.
+			post_id = int(post_id)
+		post = self.local_posts[post_id] if post_id in self.local_posts else None
+		if isinstance(post_id, int):
+			post_id = self.local_posts[post_id].reddit_id
+		# Use the local links if possible, then the cache, then Reddit.
+		if post is not None and post.permalink:
+			self.open_submission(post, link)
+		elif background:
+			self.background.submit('open', self.get_submission, post_id, link)
+		else:
+			self.open_submission(self.get_submission(self.reddit, post_id), link)
+
+	def open_submission(self, submission, link = False):
+		"""
+		Open a submission in the browser. (None)
+
+		Parameters:
+		submission: The submission or local post to open. (Submission or Post)
+		link: A flag for opening the linked page instead of the Reddit post. (bool)
+		"""
 		url = 'n/a'
-		# URLs of source documents.
-		submission = self.reddit.submission(id = post_id)
 		if link:
 			url = submission.url
 		else:
@@ -479,7 +3941,82 @@ class Tracker(cmdr.Cmdr):
 		if url == 'n/a':
 			print('The URL for that post is not available.')
 		else:
-			webbrowser.open(url)
+			webbrowser.open(url)
+
+	def do_perf(self, arguments):
+		"""
+		Show or control timing of the tracker.
+
+		With no arguments, this shows the 50th, 95th, and 99th percentile times for
+		each command, each kind of Reddit request, and each phase of loading and
+		saving, along with counts of Reddit requests by how long they took.
+		Timing can also be turned on from the start with the --perf option.
+
+		Arguments include:
+			on/off: Turn timing on or off.
+			profile on/off: Turn profiling of each command on or off.
+			dump [path]: Show the profile of the last command, and save it to path.
+			reset: Clear the timings.
+		"""
+		words = arguments.split()
+		command = words[0].lower() if words else ''
+		if not command:
+			print(self.perf.report())
+		elif command in ('on', 'off'):
+			self.perf.enabled = command == 'on'
+			print(f'Timing is {command}.')
+		elif command == 'profile' and len(words) == 2 and words[1].lower() in ('on', 'off'):
+			self.perf.profiling = words[1].lower() == 'on'
+			print(f'Profiling is {words[1].lower()}.')
+		elif command == 'dump':
+			if self.perf.last_profile is None:
+				print('There is no profile to dump (use perf profile on).')
+				return
+			if len(words) > 1:
+				self.perf.last_profile.dump_stats(words[1])
+				print(f'Profile saved to {words[1]}.')
+			pstats.Stats(self.perf.last_profile, stream = sys.stdout).sort_stats('cumulative').print_stats(15)
+		elif command == 'reset':
+			self.perf.reset()
+			print('Timings cleared.')
+		else:
+			print(f'Invalid argument to the perf command: {arguments!r}.')
+
+	def do_export(self, arguments):
+		"""
+		Export the local posts, with their tags and names, for analysis.
+
+		The argument is the file to export to, and its extension sets the format:
+		.parquet or .arrow (which need pyarrow), .ndjson or .jsonl for one JSON
+		object per line, or .cjrx for a compact binary format that needs nothing
+		extra to write (read it with cjr_tracker.read_export). The posts are
+		written in chunks, without loading them all into memory at once.
+		"""
+		try:
+			terms = shlex.split(arguments)
+		except ValueError:
+			terms = []
+		if len(terms) != 1:
+			print('The export command needs the file to export to.')
+			return
+		path = terms[0]
+		try:
+			with self.perf.timer('export'):
+				count = export_posts(self.local_posts.records(), path)
+		except (ValueError, OSError) as error:
+			print(f'Export failed: {error}')
+		else:
+			print(f'{count} posts exported to {path}.')
+
+	def do_jobs(self, arguments):
+		"""
+		Show how many background jobs are running, and the Reddit request quota.
+
+		The results of any finished jobs are shown after this command, as they are
+		after every command.
+		"""
+		print(f'{len(self.background)} background jobs are running.')
+		print(self.scheduler.status())
 
 	def do_quit(self, arguments):
 		"""
@@ -489,8 +4026,19 @@ class Tracker(cmdr.Cmdr):
 		prevents overwriting of the data files.
 		"""
 		if arguments.lower() in ('ns', 'no-save'):
+			self.discard_changes = True
 			self.post_changes = False
+			self.name_changes = False
 			self.tag_changes = False
+			Post.dirty.clear()
+			self.store.discard()
+			Post.search.changed = False
+			Post.duplicates.changed = False
+			# Put the discarded new posts back in the queue for next time.
+			self.new_posts.extend(reversed(self.unsaved_new))
+			self.unsaved_new = []
+			self.state.setdefault(self.shard.name, {})['pending'] = [post.id for post in self.new_posts]
+			save_state(self.state)
 		self.silent = True
 		return True
 
@@ -498,68 +4046,204 @@ class Tracker(cmdr.Cmdr):
 		"""
 		Save any changed data. (s)
 
-		Use the 'force' or 'f' argument to force saving the data, even if the system
-		doesn't think it has changed.
+		Changes are appended to the journal, and the data files are only rewritten
+		when the journal gets large. Use the 'force' or 'f' argument to force
+		rewriting the data files.
 		"""
 		force = arguments.lower() in ('f', 'force')
-		if self.post_changes or force:
-			self.save_posts()
+		with self.perf.timer('save changes'):
+			if Post.dirty:
+				for post_id in sorted(Post.dirty):
+					self.store.record('post', self.local_posts[post_id])
+				Post.dirty.clear()
+				self.post_changes = True
+			self.store.mark()
+			Post.history.flush()
+			Post.search.save(self.local_posts)
+			Post.duplicates.save(self.local_posts)
+		self.unsaved_new = []
+		self.state.setdefault(self.shard.name, {})['pending'] = [post.id for post in self.new_posts]
+		save_state(self.state)
+		if self.post_changes:
 			print('Post data saved.')
 			self.post_changes = False
-		if self.name_changes or force:
-			self.save_names()
+		if self.name_changes:
 			print('Name data saved.')
 			self.name_changes = False
-		if self.tag_changes or force:
-			self.save_tags()
+		if self.tag_changes:
 			print('Tag data saved.')
 			self.tag_changes = False
+		if force or self.store.size >= self.compact_size:
+			with self.perf.timer('compact'):
+				self.compact()
+			print('Data compacted.')
 
 	def do_scan(self, arguments):
 		"""
-		Scan another subreddit for potential articles.
+		Scan other subreddits for potential articles.
 
-		The first argument should be the name of the subreddit (no spaces). A second
-		argument is allowed, it should be the number of records to check (defaults
-		to 100).
+		The arguments should be the names of one or more subreddits (no spaces), or
+		saved to scan the subreddits listed in the scan file. A final number is
+		allowed, it should be the number of records to check in each subreddit
+		(defaults to 100).
+
+		The subreddits are scanned at the same time, and the matches from all of
+		them are listed together. End the arguments with & to scan in the
+		background, and list the matches after a later command finishes.
 		"""
 		# parse the arguments.
-		args = arguments.split()
-		if len(args) == 1:
-			# default limit.
-			args.append(100)
-		elif len(args) > 2:
-			# invalid number of arguments.
-			print('The scan command takes one or two arguments.')
+		arguments, background = self.split_background(arguments)
+		sub_names = arguments.split()
+		limit = 100
+		if sub_names and sub_names[-1].isdigit():
+			limit = int(sub_names.pop())
+		if not sub_names:
+			print('The scan command needs at least one subreddit.')
 			return False
-		else:
-			# parse limit
-			try:
-				args[1] = int(args[1])
-			except ValueError:
-				print(f'Invalid number of records: {args[1]}.')
+		if [name.lower() for name in sub_names] == ['saved']:
+			sub_names = load_scan_list()
+			if not sub_names:
+				print(f'There are no subreddits listed in {SCAN_PATH}.')
 				return False
-		sub_name, limit = args
-		# Get the subreddit.
+		if background:
+			for sub_name in sub_names:
+				self.background.submit('scan', lambda reddit, sub_name: self.scan_subreddit(sub_name, limit), sub_name)
+			print(f'Scanning {len(sub_names)} subreddits in the background ...')
+			return False
+		# Scan the subreddits in parallel, merging the matches as they come in.
+		matches = {}
+		with ThreadPoolExecutor(max_workers = min(SCAN_WORKERS, len(sub_names))) as pool:
+			futures = {pool.submit(self.scan_subreddit, sub_name, limit): sub_name for sub_name in sub_names}
+			for future in as_completed(futures):
+				sub_name = futures[future]
+				try:
+					sub_matches = future.result()
+				except (praw.exceptions.PRAWException, prawcore.exceptions.PrawcoreException):
+					# Notify about PRAW Errors.
+					print(f'Error connecting to r/{sub_name}.')
+					print('Either the subreddit is invalid or access was denied.')
+					continue
+				print(f'r/{sub_name}: {len(sub_matches)} matching articles.')
+				for match, post in sub_matches:
+					if post.id not in matches or matches[post.id][0] < match:
+						matches[post.id] = (match, post)
+		self.list_matches(matches)
+
+	def find_duplicates(self, submission):
+		"""
+		Find the local posts that are likely the same story as a submission. (list of Post)
+
+		Parameters:
+		submission: The submission to check. (praw.Submission or CachedSubmission)
+		"""
+		if not Post.duplicates.loaded:
+			print('Indexing the local posts for duplicates ...')
+			with self.perf.timer('index duplicates'):
+				cached = lambda reddit_id: getattr(self.submission_cache.get(reddit_id), 'url', None)
+				Post.duplicates.load(self.local_posts, cached)
+		post_ids = Post.duplicates.match(submission.title, submission.url, self.local_posts)
+		posts = [self.local_posts[post_id] for post_id in post_ids]
+		return [post for post in posts if post.reddit_id != submission.id]
+
+	def get_submission(self, reddit, post_id, link = False, stats = False):
+		"""
+		Get a submission, from the cache if possible. (Submission)
+
+		If the same submission is already being fetched (say, by a prefetch), this
+		waits for that instead of fetching it again.
+
+		Parameters:
+		reddit: The Reddit instance to use if the submission is not cached. (praw.Reddit)
+		post_id: The Reddit id of the submission. (str)
+		link: A flag passed through for opening the linked page. (bool)
+		stats: A flag for requiring current statistics from the cache. (bool)
+		"""
+		submission = self.submission_cache.get(post_id, stats)
+		if submission is None:
+			fetch = lambda: self.submission_cache.add(reddit.submission(id = post_id))
+			submission = self.scheduler.coalesce(f'submission/{post_id}', fetch)
+		return submission
+
+	def list_matches(self, matches):
+		"""
+		Display scan matches, ranked by the number of keywords matched. (None)
+
+		Parameters:
+		matches: The number of matches and the submission, by Reddit id. (dict of str: tuple)
+		"""
+		# Sort and display by the number of keyword matches.
+		if matches:
+			ranked = sorted(matches.values(), key = lambda m: (m[0], m[1].title), reverse = True)
+			print()
+			self.list_submissions([post for match, post in ranked])
+		else:
+			# Note that their were no matches.
+			print('No articles were found with keywords in the title.')
+
+	def do_search(self, arguments):
+		"""
+		Search the titles and notes of the local posts.
+
+		The results are ranked by how well they match the words searched for. A
+		word ending in * matches any word starting with it, as does a word that
+		is not found. Filters may be included to limit the results: tag=bail and
+		under=police limit them by tag (under includes the tags under the one
+		given), and date>=05/01/2020 or date<2020-06-01 limit them by date (with
+		=, >, >=, <, or <=).
+		"""
 		try:
-			sub = self.reddit.subreddit(sub_name)
-			# Get the posts with a keyword in the title.
-			matches = []
-			for post in sub.new(limit = limit):
-				match = self.keywords.intersection(self.word_re.findall(post.title))
-				if match:
-					matches.append((len(match), post))
-			# Sort and display by the number of keyword matches.
-			if matches:
-				matches.sort(key = lambda m: (m[0], m[1].title), reverse = True)
-				self.list_submissions([post for match, post in matches])
+			terms = shlex.split(arguments)
+		except ValueError:
+			print(f'Invalid search: {arguments!r}.')
+			return
+		index = self.store if isinstance(self.store, SQLiteStore) else Post.index
+		words, post_ids, start, end = [], None, None, None
+		for term in terms:
+			match = self.filter_re.fullmatch(term)
+			if not match:
+				words.append(term)
+				continue
+			field, operator_text, value = match.groups()
+			field = field.lower()
+			if field in ('tag', 'under') and operator_text == '=':
+				tags = Post.tag_tree.subtree(value.lower()) if field == 'under' else [value.lower()]
+				matches = set().union(*[index.lookup('tag', tag) for tag in tags])
+				post_ids = matches if post_ids is None else post_ids & matches
+			elif field == 'date':
+				for date_format in ('%m/%d/%Y', '%Y-%m-%d'):
+					try:
+						day = dt.datetime.strptime(value, date_format).toordinal()
+						break
+					except ValueError:
+						pass
+				else:
+					print(f'Invalid date: {value!r}.')
+					return
+				if operator_text in ('>', '>='):
+					start = day + (operator_text == '>')
+				elif operator_text in ('<', '<='):
+					end = day - (operator_text == '<')
+				elif operator_text == '=':
+					start = end = day
+				else:
+					print(f'Invalid filter: {term!r}.')
+					return
 			else:
-				# Note that their were no matches.
-				print('No articles were found with keywords in the title.')
-		except praw.exceptions.PRAWException:
-			# Notify about PRAW Errors.
-			print('Error connecting to the subreddit.')
-			print('Either the subreddit is invalid or access was denied.')
+				print(f'Invalid filter: {term!r}.')
+				return
+		if not words:
+			print('The search command needs at least one word to search for.')
+			return
+		if not Post.search.loaded:
+			print('Indexing the local posts ...')
+		Post.search.load(self.local_posts)
+		results = Post.search.search(words, post_ids, start, end)
+		if not results:
+			print('No local posts match that search.')
+			return
+		self.current_list = PostRange(self.local_posts, 0, [post_id for score, post_id in results])
+		self.current_index = 0
+		self.list_posts(self.current_list[:self.page_size])
 
 	def do_set(self, arguments):
 		"""
@@ -567,6 +4251,7 @@ class Tracker(cmdr.Cmdr):
 
 		Options that can be set are:
 			* page_size: The number of items displayed per page by the list command.
+			* prefetch_size: The number of new posts to get ready ahead of view next.
 		"""
 		try:
 			option, setting = arguments.split()
@@ -581,6 +4266,8 @@ class Tracker(cmdr.Cmdr):
 			print(f'{setting} is not a valid setting for {option}.')
 		else:
 			setattr(self, option, setting)
+			if option == 'prefetch_size':
+				self.prefetch()
 
 	def do_start(self, arguments):
 		"""
@@ -589,6 +4276,49 @@ class Tracker(cmdr.Cmdr):
 		self.current_index = 0
 		self.do_list('')
 
+	def do_stats(self, arguments):
+		"""
+		Show engagement statistics for groups of local posts.
+
+		The first argument is the grouping: tag, category (cat), source, poster, or
+		week. It may be followed by the column to sort by: score (the default),
+		comments (com), per (percent upvoted), or count. Add 'mean' to sort by the
+		mean rather than the total. Add 'all' to include the posts of every
+		subreddit tracked. The totals are built the first time this command is
+		used, and are kept up to date after that.
+		"""
+		words = arguments.lower().split()
+		every = 'all' in words
+		words = [word for word in words if word != 'all']
+		dimensions = {'cat': 'category', 'com': 'comments'}
+		dimension = dimensions.get(words[0], words[0]) if words else 'tag'
+		if dimension not in Post.rollups.dimensions:
+			print(f'Invalid grouping for stats: {dimension!r}.')
+			return
+		mean = 'mean' in words
+		orders = [dimensions.get(word, word) for word in words[1:] if word != 'mean']
+		order = orders[0] if orders else 'score'
+		if order not in Post.rollups.columns:
+			print(f'Invalid column for stats: {order!r}.')
+			return
+		if Post.rollups.posts is None:
+			print('Totalling the local posts ...')
+			Post.rollups.build(self.local_posts.select())
+		rollups = Post.rollups
+		if every:
+			rollups = Rollups()
+			rollups.merge(Post.rollups)
+			for shard in self.shards:
+				if not shard.active:
+					shard.load()
+					rollups.merge(shard.rollups)
+		text = '{:<32}  {:>6}  {:>8}  {:>8}  {:>9}  {:>9}  {:>8}'
+		print(text.format(dimension.capitalize(), 'Posts', 'Score', 'Mean', 'Comments', 'Mean', '%Upvoted'))
+		for value, count, score, per_up, comments, mean_score, mean_per, mean_comments in rollups.table(
+			dimension, order, mean, self.page_size):
+			print(text.format(value[:32], count, score, f'{mean_score:.1f}', comments, f'{mean_comments:.1f}',
+				f'{mean_per:.2%}'))
+
 	def do_tag(self, arguments):
 		"""
 		Add one or more tags to the current post. (t)
@@ -601,7 +4331,8 @@ class Tracker(cmdr.Cmdr):
 				added = self.current.add_tag(tag)
 				if not added:
 					# Query the user after failed additions.
-					suggested = self.current.suggest_tags(tag)
+					with self.perf.timer('suggest tags'):
+						suggested = self.current.suggest_tags(tag)
 					print('The tag {!r} was not recognized. Suggested tags:'.format(tag))
 					for maybe_index, maybe_tag in enumerate(suggested, start = 1):
 						print('   {}. {}'.format(maybe_index, maybe_tag))
@@ -609,25 +4340,72 @@ class Tracker(cmdr.Cmdr):
 					# Process the user's choice for handling a failed addition.
 					if choice.lower() == 'f':
 						self.current.add_tag(tag, force = True)
+						self.store.record('+tag', self.current, tag)
 						self.tag_changes = True
 					elif choice.isdigit():
-						self.current.add_tag(suggested[int(choice) - 1])
+						tag = suggested[int(choice) - 1]
+						self.current.add_tag(tag)
+						self.store.record('+tag', self.current, tag)
 						self.tag_changes = True
 					elif choice.lower() == 's':
 						pass
 					else:
 						print('Your choice was not recognized, so the tag was skipped.')
 				else:
+					self.store.record('+tag', self.current, tag)
 					self.tag_changes = True
 			self.tag_check(self.current)
 
+	def do_trend(self, arguments):
+		"""
+		Show how posts' statistics have changed.
+
+		With a local post ID or Reddit ID as the argument, this shows each snapshot
+		of the post's score, upvote ratio, and comment count. With 'gain' followed
+		by a number of points, this lists the posts that gained more than that many
+		points in the last 24 hours. A different number of hours may be given after
+		the points.
+		"""
+		words = arguments.split()
+		if words and words[0].lower() in ('g', 'gain'):
+			try:
+				points = int(words[1]) if len(words) > 1 else 0
+				hours = float(words[2]) if len(words) > 2 else 24
+			except ValueError:
+				print('The points and hours must be numbers.')
+				return
+			gains = Post.history.gainers(points, hours)
+			if not gains:
+				print(f'No posts gained more than {points} points in the last {hours:g} hours.')
+				return
+			self.current_list = [self.local_posts[post_id] for gain, post_id in gains]
+			self.current_index = 0
+			for gain, post_id in gains[:self.page_size]:
+				print(f'{gain:+5}  {self.local_posts[post_id]}')
+		elif words:
+			post_id = words[0]
+			if not (len(post_id) < 6 and post_id.isdigit()):
+				if post_id not in self.local_posts:
+					print('That post is not in the local data.')
+					return
+				post_id = self.local_posts[post_id].post_id
+			snapshots = Post.history.trajectory(int(post_id))
+			if not snapshots:
+				print('There is no history for that post.')
+			for when, score, per_up, comments in snapshots:
+				print(f'{when:%m/%d/%y %H:%M}  Score: {score}, %Upvoted: {per_up:.2%}, Comments: {comments}')
+		else:
+			print('The trend command needs a post ID or the gain argument.')
+
 	def do_unname(self, arguments):
 		"""
 		Remove a name from a post. (-n)
 		"""
 		if self.update_check():
 			if arguments in self.current.names:
-				self.current.names.remove(arguments)
+				self.current.remove_name(arguments)
+				self.store.record('-name', self.current, arguments)
+				self.name_changes = True
 			else:
 				print(f'The current post does not have the name {arguments!r}.')
 
@@ -638,7 +4416,9 @@ class Tracker(cmdr.Cmdr):
 		if self.update_check():
 			tag = arguments.lower()
 			if tag in self.current.tags:
-				self.current.tags.remove(tag)
+				self.current.remove_tag(tag)
+				self.store.record('-tag', self.current, tag)
+				self.tag_changes = True
 				self.tag_check(self.current)
 			else:
 				print(f'The current post does not have the tag {tag!r}.')
@@ -663,15 +4443,26 @@ class Tracker(cmdr.Cmdr):
 		View a post, either by local_id or reddit_id. (v)
 
 		If the argument is next (or n), the view is shifted to the next new
-		submission (on Reddit but not coded locally).
+		submission (on Reddit but not coded locally), with a warning if it looks
+		like a duplicate of a local post. Posts from the other subreddits tracked
+		may be viewed by Reddit id, but not updated.
 		"""
+		duplicates = []
 		if arguments.isdigit():
 			key = int(arguments)
 		elif arguments.lower() in ('n', 'next'):
 			if self.new_posts:
-				new_post = Post(self.new_posts.pop())
-				self.local_posts[new_post.post_id] = new_post
-				self.local_posts[new_post.reddit_id] = new_post
+				self.deliver()
+				# Check for duplicates first, so the submission is not lost if that fails.
+				duplicates = self.find_duplicates(self.new_posts[-1])
+				submission = self.new_posts.pop()
+				self.prefetch()
+				self.unsaved_new.append(submission)
+				new_post = Post(submission)
+				self.local_posts.add(new_post)
+				# Journal new posts right away, so later changes can be replayed.
+				self.store.record('post', new_post)
+				Post.dirty.discard(new_post.post_id)
 				self.post_changes = True
 				key = new_post.reddit_id
 			else:
@@ -687,11 +4478,83 @@ class Tracker(cmdr.Cmdr):
 		try:
 			post = self.local_posts[key]
 		except KeyError:
-			print('Invalid record ID.')
+			# Posts from the other subreddits tracked can be viewed but not changed.
+			for shard in self.shards:
+				if isinstance(key, str) and not shard.active and key in shard.load():
+					print(f'From r/{shard.name} (read only):')
+					print(shard.posts[key].details())
+					break
+			else:
+				print('Invalid record ID.')
 		else:
 			if not self.update:
 				print(post.details())
 			self.current = post
+			for duplicate in duplicates:
+				text = 'WARNING: Post {} may be a duplicate of post {}: {}'
+				print(text.format(post.reddit_id, duplicate.reddit_id, duplicate.title[:48]))
+			self.propose_tags(post)
+
+	def filter_posts(self, text, shard = None):
+		"""
+		Find the local posts matching some filters. (list of Post or None)
+
+		Filters on tags, names, sources, and posters are answered from the indexes
+		of those fields, and the results are intersected. Numeric filters are then
+		checked on the remaining posts. None is returned for invalid filters.
+
+		Parameters:
+		text: The filters, as given to the list command. (str)
+		shard: The subreddit to filter the posts of, if not the one being coded. (Shard or None)
+		"""
+		if shard is None or shard.active:
+			index = self.store if isinstance(self.store, SQLiteStore) else Post.index
+			posts, everything = self.local_posts, PostRange(self.local_posts, Post.num_posts)
+		else:
+			posts = everything = shard.load()
+			index = shard.index
+		post_ids, checks = None, []
+		try:
+			terms = shlex.split(text)
+		except ValueError:
+			print(f'Invalid filters: {text!r}.')
+			return None
+		for term in terms:
+			match = self.filter_re.fullmatch(term)
+			if not match:
+				print(f'Invalid filter: {term!r}.')
+				return None
+			field, operator_text, value = match.groups()
+			field = field.lower()
+			if field in ('tag', 'name', 'source', 'poster') and operator_text == '=':
+				if field == 'tag':
+					value = value.lower()
+				matches = index.lookup(field, value)
+				post_ids = set(matches) if post_ids is None else post_ids & matches
+			elif field in ('under', 'category') and operator_text == '=':
+				value = value.lower()
+				if field == 'under':
+					tags = Post.tag_tree.subtree(value)
+				else:
+					tags = Post.tag_tree.members.get(value, set())
+				matches = set().union(*[index.lookup('tag', tag) for tag in tags])
+				post_ids = matches if post_ids is None else post_ids & matches
+			elif field in self.numeric_filters:
+				attribute, converter = self.numeric_filters[field]
+				try:
+					checks.append((attribute, self.filter_operators[operator_text], converter(value)))
+				except ValueError:
+					print(f'Invalid value for {field}: {value!r}.')
+					return None
+			else:
+				print(f'Invalid filter: {term!r}.')
+				return None
+		if post_ids is None:
+			posts = everything
+		else:
+			posts = [posts[post_id] for post_id in sorted(post_ids)]
+		return [post for post in posts if all(check(getattr(post, attribute), value)
+			for attribute, check, value in checks)]
 
 	def list_posts(self, posts):
 		"""
@@ -716,9 +4579,22 @@ class Tracker(cmdr.Cmdr):
 		"""
 		text = '{}: {}  {:<20}  {:<8}  {:<47}  {:>5}'
 		for post_index, post in enumerate(submissions, start = 1):
+			post = self.submission_cache.get(post.id) or post
 			col = excel_col(post_index)
 			date_text = dt.datetime.fromtimestamp(post.created_utc).strftime('%m/%d/%y')
 			print(text.format(col, post.id, str(post.author)[:20], date_text, post.title[:47], post.score))
+			for duplicate in self.find_duplicates(post):
+				print(f'      possible duplicate of {duplicate.reddit_id}: {duplicate.title[:47]}')
+
+	def missing_categories(self, post):
+		"""
+		Find the required kinds of tags a post is missing. (list of str)
+
+		Parameters:
+		post: A post to check for tags. (Post)
+		"""
+		categories = set(Post.tag_tree.categories[tag] for tag in post.tags if tag in Post.tag_tree.categories)
+		return [missing for missing, required in self.required_tags if not categories.intersection(required)]
 
 	def postcmd(self, stop, line):
 		"""
@@ -728,6 +4604,15 @@ class Tracker(cmdr.Cmdr):
 		stop: A flag for stopping execution of the interface. (bool)
 		line: The last command from the user. (str)
 		"""
+		if self.command_name is not None:
+			seconds = time.perf_counter() - self.command_start
+			if self.profile is not None:
+				self.profile.disable()
+				self.perf.last_profile, self.profile = self.profile, None
+			self.perf.record('command', self.command_name, seconds)
+			self.command_name = None
+		if not stop:
+			self.deliver()
 		if self.silent:
 			self.silent = False
 		elif self.update:
@@ -745,15 +4630,65 @@ class Tracker(cmdr.Cmdr):
 		"""
 		Processing done before the application is closed. (None)
 		"""
-		self.do_save('')
+		self.background.close()
+		if not self.discard_changes:
+			self.do_save('')
+		self.submission_cache.save()
 		print('Have a nice day.')
 
+	def precmd(self, line):
+		"""
+		Processing done before a command is handled. (str)
+
+		Parameters:
+		line: The command from the user. (str)
+		"""
+		line = super().precmd(line)
+		if self.perf.enabled:
+			words = line.split()
+			self.command_name = self.aliases.get(words[0], words[0]).lower() if words else 'repeat'
+			if self.perf.profiling and self.command_name != 'perf':
+				self.profile = cProfile.Profile()
+				self.profile.enable()
+			self.command_start = time.perf_counter()
+		return line
+
+	def prefetch(self):
+		"""
+		Start getting the next new posts ready to view in the background. (None)
+
+		The next prefetch_size new posts have their submissions refreshed, so that
+		the statistics and link are current and stored locally when the post is
+		viewed. Local post ids are only given out as posts are viewed, so the Post
+		objects themselves are still made then.
+		"""
+		for index in range(len(self.new_posts) - 1, max(len(self.new_posts) - self.prefetch_size, 0) - 1, -1):
+			reddit_id = self.new_posts[index].id
+			if reddit_id in self.prefetching:
+				continue
+			submission = self.submission_cache.get(reddit_id, stats = True)
+			if submission is None:
+				self.prefetching.add(reddit_id)
+				self.background.submit('prefetch', self.get_submission, reddit_id, False, True)
+			else:
+				self.new_posts[index] = submission
+
 	def preloop(self):
 		"""
 		Processing done when the application is started. (None)
 		"""
-		print('\nWelcome to the r/EndMassIncarceration tracking application.')
+		self.shards = load_shards(self.shards_path)
+		here = os.path.abspath('.')
+		matching = [shard for shard in self.shards if shard.path == here]
+		if matching:
+			self.shard = matching[0]
+		else:
+			self.shard = Shard('EndMassIncarceration', here)
+			self.shards.insert(0, self.shard)
+		self.shard.active = True
+		print(f'\nWelcome to the r/{self.shard.name} tracking application.')
 		self.silent = False
+		self.discard_changes = False
 		self.post_changes = False
 		self.name_changes = False
 		self.tag_changes = False
@@ -762,45 +4697,147 @@ class Tracker(cmdr.Cmdr):
 		self.current_list = []
 		self.current_index = 0
 		self.page_size = 15
+		self.prefetching = set()
+		self.command_name = None
+		self.profile = None
 		print('\nAccessing Reddit ...')
-		self.reddit = load_reddit()
+		with self.perf.timer('load reddit'):
+			self.reddit = load_reddit()
 		print('Loading stored data ...')
-		self.local_posts, Post.all_tags = load_local()
+		with self.perf.timer('load local data'):
+			if os.path.exists(SQLITE_PATH):
+				self.store = SQLiteStore(SQLITE_PATH)
+				self.local_posts, Post.all_tags = self.store.load()
+			else:
+				self.store = Journal()
+				self.local_posts, Post.all_tags = load_local(self.store)
+		with self.perf.timer('build tag and name indexes'):
+			Post.tag_index = SuggestionIndex(Post.all_tags)
+			Post.tag_tree = TagTree(Post.all_tags)
+			Post.name_index = SuggestionIndex(Post.all_names)
 		self.keywords = load_keywords()
+		self.scan_local = threading.local()
+		self.submission_cache = SubmissionCache()
+		self.background = AsyncReddit()
+		self.state = load_state()
+		self.shard.posts, self.shard.state = self.local_posts, self.state
+		self.unsaved_new = []
 		self.do_load('reddit')
+		self.prefetch()
 		print(self.status())
 		print()
 
+	def propose_tags(self, post):
+		"""
+		Show the likeliest tags for each kind of tag a post is missing. (None)
+
+		Parameters:
+		post: The post to suggest tags for. (Post)
+		"""
+		missing = self.missing_categories(post)
+		if not missing:
+			return
+		if not Post.tagger.loaded:
+			with self.perf.timer('train tag suggestions'):
+				Post.tagger.build(self.local_posts.select())
+		groups = []
+		for text, required in self.required_tags:
+			if text in missing:
+				groups.append(set().union(*[Post.tag_tree.members.get(category, set()) for category in required]))
+		with self.perf.timer('suggest tags'):
+			suggestions = Post.tagger.suggest(post, groups)
+		for text, tags in zip(missing, suggestions):
+			if tags:
+				print(f'Suggested tags for {text}: {", ".join(tags)}')
+
+	def refresh_shard(self, shard):
+		"""
+		Check a shard's subreddit for new posts and statistics. (tuple of list, int)
+
+		This is run in the load command's worker threads, each of which has its own
+		Reddit instance, with its requests in the background lane. The new posts
+		are saved as pending in the shard's polling state, to be coded when
+		tracking that subreddit, and the statistics of the shard's posts are
+		refreshed (see Shard.refresh). Nothing is printed from the thread. The
+		return value is the new posts and the number of posts with new statistics.
+
+		Parameters:
+		shard: The shard to check, which is not the one being coded. (Shard)
+		"""
+		if not hasattr(self.scan_local, 'reddit'):
+			self.scan_local.reddit = load_reddit()
+		with self.scheduler.lane('background'):
+			new_posts = check_cjr(self.scan_local.reddit, current = shard.load(), cache = self.submission_cache,
+				state = shard.load_state(), subreddit = shard.name, start = shard.start, update = False, quiet = True)
+			changed = shard.refresh(self.scan_local.reddit, self.submission_cache)
+		shard.save_state()
+		return new_posts, changed
+
 	def save_names(self):
 		"""Save the name data. (None)"""
-		with open('name_data.txt', 'w') as name_file:
-			name_file.write('post_id\tname\n')
-			for post_id in range(1, len(self.local_posts) // 2 + 1):
-				post = self.local_posts[post_id]
-				name_file.write(post.name_lines())
+		lines = (post.name_lines() for post in self.local_posts.select())
+		with self.perf.timer('save names'):
+			write_atomic('name_data.txt', 'post_id\tname\n', lines)
 
 	def save_posts(self):
 		"""Save the post data. (None)"""
-		with open('post_data.txt', 'w') as post_file:
-			post_file.write('post_id\tred_id\tdate\tsource\tposter\ttitle\tscore\tper\tcom\tnotes\n')
-			for post_id in range(1, len(self.local_posts) // 2 + 1):
-				post = self.local_posts[post_id]
-				post_file.write(post.data_line())
+		header = 'post_id\tred_id\tdate\tsource\tposter\ttitle\tscore\tper\tcom\tnotes\turl\tpermalink\n'
+		lines = (post.data_line() for post in self.local_posts.select())
+		with self.perf.timer('save posts'):
+			write_atomic('post_data.txt', header, lines)
 
 	def save_tags(self):
 		"""Save the tag data. (None)"""
-		with open('tag_data.txt', 'w') as tag_file:
-			tag_file.write('post_id\ttag\n')
-			for post_id in range(1, len(self.local_posts) // 2 + 1):
-				post = self.local_posts[post_id]
-				tag_file.write(post.tag_lines())
+		lines = (post.tag_lines() for post in self.local_posts.select())
+		with self.perf.timer('save tags'):
+			write_atomic('tag_data.txt', 'post_id\ttag\n', lines)
+
+	def scan_subreddit(self, sub_name, limit):
+		"""
+		Find new posts in a subreddit with keywords in the title. (list of tuple)
+
+		This is run in the scan command's worker threads, each of which has its own
+		Reddit instance, with its requests in the background lane. The return value
+		is a list of the number of keywords matched and the submission.
+
+		Parameters:
+		sub_name: The name of the subreddit to scan. (str)
+		limit: The number of new posts to check. (int)
+		"""
+		key = f'{sub_name.lower()}/new/{limit}'
+		posts = self.submission_cache.get_listing(key)
+		if posts is None:
+			if not hasattr(self.scan_local, 'reddit'):
+				self.scan_local.reddit = load_reddit()
+			sub = self.scan_local.reddit.subreddit(sub_name)
+			with self.scheduler.lane('background'):
+				posts = self.submission_cache.add_listing(key, sub.new(limit = limit))
+		# Get the posts with a keyword in the title.
+		matches = []
+		for post in posts:
+			match = self.keywords.intersection(self.word_re.findall(post.title))
+			if match:
+				matches.append((len(match), post))
+		return matches
+
+	def split_background(self, arguments):
+		"""
+		Split a trailing & off of command arguments. (tuple of str, bool)
+
+		Parameters:
+		arguments: The arguments to a command. (str)
+		"""
+		arguments = arguments.strip()
+		if arguments.endswith('&'):
+			return arguments[:-1].strip(), True
+		return arguments, False
 
 	def status(self):
 		"""
 		Generate status text for the system. (str)
 		"""
 		lines = ['It is now {}.'.format(dt.datetime.now())]
-		lines.append('There are {} records in the local post data.'.format(len(self.local_posts) // 2))
+		lines.append('There are {} records in the local post data.'.format(Post.num_posts))
 		lines.append('      and {} records in the new post data.'.format(len(self.new_posts)))
 		up_text = 'on' if self.update else 'off'
 		lines.append('Update mode is {}.'.format(up_text))
@@ -813,17 +4850,8 @@ class Tracker(cmdr.Cmdr):
 		Parameters:
 		post: A post to check for tags. (Post)
 		"""
-		# Check for required tags.
-		categories = set()
-		for tag in post.tags:
-			if tag in Post.all_tags:
-				categories.add(Post.all_tags[tag]['category'])
-		if 'process' not in categories and 'theme' not in categories:
-			print(f'WARNING: Post {post.reddit_id} does not have a process or theme tag.')
-		if 'location' not in categories:
-			print(f'WARNING: Post {post.reddit_id} does not have a location tag.')
-		if 'article-types' not in categories:
-			print(f'WARNING: Post {post.reddit_id} does not have an article type tag.')
+		for missing in self.missing_categories(post):
+			print(f'WARNING: Post {post.reddit_id} does not have {missing} tag.')
 
 	def update_check(self):
 		"""
@@ -836,27 +4864,124 @@ class Tracker(cmdr.Cmdr):
 		else:
 			return True
 
-def check_cjr(reddit, current = {}, verbose = False):
+def backfill_links(reddit, posts, cache = None):
+	"""
+	Fill in the link URLs and permalinks of posts without them. (int)
+
+	Posts saved before the links were kept only have their source. Their
+	submissions are taken from the cache if possible, and the rest are looked up
+	in batches of 100 fullnames. The return value is the number of posts filled
+	in.
+
+	Parameters:
+	reddit: A reddit instance. (praw.Reddit)
+	posts: The posts to check. (iterable of Post)
+	cache: A cache of Reddit submissions. (SubmissionCache or None)
+	"""
+	missing = {post.reddit_id: post for post in posts if not post.permalink}
+	filled = 0
+	for submission in load_submissions(reddit, list(missing), cache):
+		if missing[submission.id].set_links(submission):
+			filled += 1
+	return filled
+
+def canonical_url(url):
+	"""
+	Reduce a URL to a canonical form for finding duplicate links. (str)
+
+	The scheme, fragment, port, and tracking parameters are dropped, the other
+	parameters are sorted, and mobile and AMP versions of pages are reduced to
+	the regular page, including pages served from the Google AMP caches.
+
+	Parameters:
+	url: The URL to reduce. (str)
+	"""
+	parts = urlparse(url.strip())
+	host = parts.hostname or ''
+	path = parts.path
+	# Pages from the AMP caches have the original host at the start of the path.
+	if host.endswith('.cdn.ampproject.org') or (host in ('google.com', 'www.google.com') and
+		path.startswith('/amp/')):
+		pieces = [piece for piece in path.split('/') if piece][1:]
+		if pieces[:1] in (['c'], ['v']):
+			pieces = pieces[1:]
+		if pieces[:1] == ['s']:
+			pieces = pieces[1:]
+		if pieces:
+			host, path = pieces[0].lower(), '/' + '/'.join(pieces[1:])
+	for prefix in ('www.', 'm.', 'mobile.', 'amp.'):
+		if host.startswith(prefix):
+			host = host[len(prefix):]
+			break
+	for suffix in ('/amp', '.amp', '/amp.html'):
+		if path.endswith(suffix) or path.endswith(suffix + '/'):
+			path = path[:path.rindex(suffix)]
+			break
+	path = path.rstrip('/')
+	parameters = []
+	for parameter in parts.query.split('&'):
+		name = parameter.partition('=')[0].lower()
+		if name and not (name in TRACKING_PARAMETERS or name.startswith('utm_')):
+			parameters.append(parameter)
+	query = '&'.join(sorted(parameters))
+	return f'{host}{path}?{query}' if query else f'{host}{path}'
+
+def check_cjr(reddit, current = {}, verbose = False, cache = None, state = None, deep = False,
+	subreddit = 'EndMassIncarceration', start = DATA_START, update = True, listing = None, quiet = False):
 	"""
-	Check for new posts in r/EndMassIncarceration. (list of praw.Submission)
+	Check for new posts in a tracked subreddit. (list of praw.Submission)
+
+	If a state dictionary is given, polling is incremental: the newest submission
+	seen and the new posts not yet coded are kept in the state, and only posts
+	newer than the newest one seen are requested. The pending posts are returned
+	along with any newer ones. A deep check walks the whole listing, updating the
+	current posts, as is done when there is no state.
+
+	If a cache is given and it has a current copy of the listing, Reddit is not
+	contacted for it, unless the check is deep. Otherwise the listing is fetched
+	and added to the cache, and the cached submissions are returned. A listing
+	already fetched (say, in the background) can be passed in instead.
 
 	Parameters:
 	current: The current posts that should be ignored. (dict of str: Post)
 	reddit: A reddit instance. (praw.Reddit)
+	verbose: A flag for printing each post checked. (bool)
+	cache: A cache of Reddit submissions. (SubmissionCache or None)
+	state: The polling state for each subreddit. (dict or None)
+	deep: A flag for checking the whole listing. (bool)
+	subreddit: The name of the subreddit to check. (str)
+	start: The date that data collection started for the subreddit. (datetime.datetime)
+	update: A flag for updating the current posts from the listing. (bool)
+	listing: The listing of new posts, if already fetched. (list of Submission or None)
+	quiet: A flag for printing nothing, as from a worker thread. (bool)
 	"""
+	sub_state = {} if state is None else state.setdefault(subreddit, {})
+	newest = sub_state.get('newest')
+	pending = [reddit_id for reddit_id in sub_state.get('pending', []) if reddit_id not in current]
+	# A cached listing may be from an incremental poll, so a deep check always fetches.
+	if listing is None and cache is not None and not deep:
+		listing = cache.get_listing(f'{subreddit}/new')
+	if listing is None:
+		listing = fetch_cjr(reddit, newest, (current, set(pending)), deep, cache, subreddit)
 	true_new = []
-	cjr = reddit.subreddit('EndMassIncarceration')
-	for post in cjr.new():
-		if dt.datetime.fromtimestamp(post.created_utc) < DATA_START:
+	for post in listing:
+		if dt.datetime.fromtimestamp(post.created_utc) < start:
 			break
 		if verbose:
 			print('{}  {:<20}  {}'.format(post.id, str(post.author)[:20], post.title[:32]))
 		if post.id in current:
-			current[post.id].update(post)
-		else:
+			if update:
+				current[post.id].update(post)
+		elif post.id not in pending:
 			true_new.append(post)
-	if not verbose:
+	if not (verbose or quiet):
 		print()
+	if listing and (not newest or listing[0].created_utc >= sub_state.get('newest_utc', 0)):
+		sub_state['newest'] = f't3_{listing[0].id}'
+		sub_state['newest_utc'] = listing[0].created_utc
+	# Add the posts still waiting to be coded.
+	true_new.extend(load_submissions(reddit, pending, cache))
+	sub_state['pending'] = [post.id for post in true_new]
 	return true_new
 
 def excel_col(n):
@@ -873,6 +4998,85 @@ def excel_col(n):
 		n = n // 26
 	return col
 
+def export_chunks(rows, chunk_size = EXPORT_CHUNK_SIZE):
+	"""
+	Group post rows into chunks of columns. (generator of dict)
+
+	Each chunk maps the names in EXPORT_COLUMNS to tuples of that column's
+	values, with the dates changed to ISO format. Only one chunk of rows is held
+	in memory at a time.
+
+	Parameters:
+	rows: The fields of each post, as returned by Post.row. (iterable of tuple)
+	chunk_size: The number of posts in each chunk. (int)
+	"""
+	rows = iter(rows)
+	while True:
+		chunk = list(itertools.islice(rows, chunk_size))
+		if not chunk:
+			return
+		columns = dict(zip(EXPORT_COLUMNS, zip(*chunk)))
+		columns['date'] = tuple(f'{text[6:]}-{text[:2]}-{text[3:5]}' for text in columns['date'])
+		yield columns
+
+def export_posts(rows, path, kind = None, chunk_size = EXPORT_CHUNK_SIZE):
+	"""
+	Stream the local posts to a file for analysis. (int)
+
+	The return value is the number of posts exported. The format is given by the
+	kind, or by the file extension as in EXPORT_FORMATS if no kind is given.
+	The file is written to a temporary file and then renamed, so a failed export
+	does not leave a partial file.
+
+	Parameters:
+	rows: The fields of each post, as returned by Post.row. (iterable of tuple)
+	path: The file to export to. (str)
+	kind: The format: parquet, arrow, ndjson, or binary. (str or None)
+	chunk_size: The number of posts to write at a time. (int)
+	"""
+	if kind is None:
+		kind = EXPORT_FORMATS.get(os.path.splitext(path)[1].lower())
+	if kind not in ('arrow', 'binary', 'ndjson', 'parquet'):
+		raise ValueError(f'Unknown export format for {path!r}.')
+	if kind in ('arrow', 'parquet') and pa is None:
+		raise ValueError(f'The {kind} format needs pyarrow, use .cjrx or .ndjson instead.')
+	chunks = export_chunks(rows, chunk_size)
+	temp_path = f'{path}.tmp'
+	try:
+		if kind == 'binary':
+			count = write_binary(chunks, temp_path)
+		elif kind == 'ndjson':
+			count = write_ndjson(chunks, temp_path)
+		else:
+			count = write_arrow(chunks, temp_path, kind == 'parquet')
+	except BaseException:
+		with contextlib.suppress(OSError):
+			os.remove(temp_path)
+		raise
+	os.replace(temp_path, path)
+	return count
+
+def fetch_cjr(reddit, newest = None, known = (), deep = False, cache = None, subreddit = 'EndMassIncarceration'):
+	"""
+	Fetch the listing of new posts in a tracked subreddit. (list of Submission)
+
+	Parameters:
+	reddit: A reddit instance. (praw.Reddit)
+	newest: The fullname of the newest submission seen. (str or None)
+	known: Collections of the Reddit ids already seen. (tuple)
+	deep: A flag for fetching the whole listing. (bool)
+	cache: A cache to add the listing to. (SubmissionCache or None)
+	subreddit: The name of the subreddit. (str)
+	"""
+	cjr = reddit.subreddit(subreddit)
+	if deep or not newest:
+		listing = cjr.new()
+	else:
+		listing = poll_new(cjr, newest, known)
+	if cache is not None:
+		return cache.add_listing(f'{subreddit}/new', listing)
+	return list(listing)
+
 def from_excel(col):
 	"""
 	Return an integer from a given excel column. (str)
@@ -888,30 +5092,79 @@ def from_excel(col):
 		col = col[:-1]
 	return n
 
-def levenshtein(text_a, text_b):
+def levenshtein(text_a, text_b, limit = None):
 	"""
 	Determine the Levenshtein distance between two strings. (int)
 
+	If a limit is given, only the band of the edit matrix within that distance of
+	the diagonal is calculated, and the calculation stops as soon as the distance
+	is known to be over the limit. In that case limit + 1 is returned.
+
 	Parameters:
 	text_a: The first string. (str)
 	text_b: The second string. (str)
+	limit: The maximum distance of interest. (int or None)
 	"""
-	# Initialize the matrix.
-	matrix = [[0] * (len(text_a) + 1) for row in range(len(text_b) + 1)]
-	matrix[0] = list(range(len(text_a) + 1))
-	for y in range(len(text_b) + 1):
-		matrix[y][0] = y
-	# Fill the matrix of edits.
-	for x in range(1, len(text_b) + 1):
-		for y in range(1, len(text_a) + 1):
-			base = [matrix[x - 1][y] + 1, matrix[x][y - 1] + 1]
-			if text_b[x - 1] == text_a[y - 1]:
-				base.append(matrix[x - 1][y - 1])
+	len_a, len_b = len(text_a), len(text_b)
+	if limit is None:
+		limit = max(len_a, len_b)
+	over = limit + 1
+	if abs(len_a - len_b) > limit:
+		return over
+	# Only two rows of the matrix are kept, cells outside the band count as over.
+	previous = list(range(len_b + 1))
+	for x in range(1, len_a + 1):
+		char_a = text_a[x - 1]
+		low, high = max(1, x - limit), min(len_b, x + limit)
+		current = [over] * (len_b + 1)
+		current[0] = x
+		row_min = x
+		for y in range(low, high + 1):
+			if char_a == text_b[y - 1]:
+				# A match never costs more than the insertion or deletion.
+				cost = previous[y - 1]
 			else:
-				base.append(matrix[x - 1][y - 1] + 1)
-			matrix[x][y] = min(base)
+				cost = previous[y - 1]
+				if previous[y] < cost:
+					cost = previous[y]
+				if current[y - 1] < cost:
+					cost = current[y - 1]
+				cost += 1
+			current[y] = cost
+			if cost < row_min:
+				row_min = cost
+		# Stop early if the whole band is already over the limit.
+		if row_min > limit:
+			return over
+		previous = current
 	# Return the final value.
-	return matrix[-1][-1]
+	return min(previous[-1], over)
+
+def load_cache(key):
+	"""
+	Load the snapshot of the data files, if it is current. (tuple or None)
+
+	The return value is the posts and the valid tags, as from load_local. None is
+	returned if there is no snapshot, or it is from a different version, or it
+	was made from different data files.
+
+	Parameters:
+	key: The modification times and sizes of the data files. (tuple)
+	"""
+	try:
+		with open(CACHE_PATH, 'rb') as cache_file:
+			version, cache_key, rows, valid_tags, index_fields = marshal.loads(cache_file.read())
+	except (OSError, EOFError, ValueError, TypeError):
+		return None
+	if version != CACHE_VERSION or cache_key != key:
+		return None
+	posts = PostStore()
+	posts.rows = [Post(row) if row else None for row in rows]
+	posts.reddit_ids = {post.reddit_id: post.post_id for post in posts}
+	Post.num_posts = max(Post.num_posts, len(rows))
+	Post.index.fields = index_fields
+	Post.all_names.update(index_fields['name'])
+	return posts, valid_tags
 
 def load_keywords():
 	"""
@@ -923,18 +5176,134 @@ def load_keywords():
 			keywords.add(line.strip())
 	return keywords
 
-def load_local():
+def load_local(journal = None):
 	"""
 	Load the local data. (dict)
+
+	The data files (or the snapshot of them) are loaded, and then any changes in
+	the journal are applied.
+
+	Parameters:
+	journal: A journal of changes to apply to the data files. (Journal or None)
+	"""
+	# Loading creates lots of objects but no cycles, so skip garbage collection.
+	collecting = gc.isenabled()
+	gc.disable()
+	try:
+		posts, valid_tags = load_snapshot()
+	finally:
+		if collecting:
+			gc.enable()
+	if journal is not None:
+		journal.replay(posts)
+	return posts, valid_tags
+
+def load_reddit(read_only = False, **kwargs):
+	"""
+	Load a Reddit instance. (praw.Reddit)
+
+	Parameters:
+	read_only: A flag for making a read only instance. (bool)
+	kwargs: Key-word arguments for the Reddit instance. (bool)
+	"""
+	access = ACCESS_KWARGS.copy()
+	access.update(kwargs)
+	reddit = praw.Reddit('main_user', requestor_class = TimedRequestor, **access)
+	return reddit
+
+def load_scan_list():
+	"""
+	Load the subreddits saved for scanning. (list of str)
+	"""
+	sub_names = []
+	if os.path.exists(SCAN_PATH):
+		with open(SCAN_PATH) as scan_file:
+			for line in scan_file:
+				if line.strip():
+					sub_names.append(line.strip())
+	return sub_names
+
+def load_state(path = STATE_PATH):
+	"""
+	Load the polling state saved from the last session. (dict)
+
+	Parameters:
+	path: The file the state is saved in. (str)
+	"""
+	try:
+		with open(path) as state_file:
+			return json.load(state_file)
+	except (OSError, ValueError):
+		return {}
+
+def load_submissions(reddit, reddit_ids, cache = None, stats = False):
+	"""
+	Load submissions by Reddit id, from the cache if possible. (list of Submission)
+
+	Submissions not in the cache are looked up in batches of 100 fullnames.
+
+	Parameters:
+	reddit: A reddit instance. (praw.Reddit)
+	reddit_ids: The Reddit ids of the submissions. (list of str)
+	cache: A cache of Reddit submissions. (SubmissionCache or None)
+	stats: A flag for requiring current statistics from the cache. (bool)
+	"""
+	found, missing = {}, []
+	for reddit_id in reddit_ids:
+		submission = None if cache is None else cache.get(reddit_id, stats)
+		if submission is None:
+			missing.append(reddit_id)
+		else:
+			found[reddit_id] = submission
+	for start in range(0, len(missing), 100):
+		fullnames = [f't3_{reddit_id}' for reddit_id in missing[start:(start + 100)]]
+		for submission in reddit.info(fullnames = fullnames):
+			found[submission.id] = submission if cache is None else cache.add(submission)
+	return [found[reddit_id] for reddit_id in reddit_ids if reddit_id in found]
+
+def load_shards(path = SHARDS_PATH):
+	"""
+	Load the subreddits to track, and where their data is kept. (list of Shard)
+
+	After a header line, each line of the file is tab delimited: the name of the
+	subreddit, the directory with its data (relative to the file), and the date
+	data collection started (mm/dd/yyyy). Without the file, only
+	r/EndMassIncarceration is tracked, with its data in the current directory.
+
+	Parameters:
+	path: The file listing the subreddits. (str)
+	"""
+	shards = []
+	try:
+		with open(path) as shard_file:
+			for line in shard_file:
+				if line.startswith('subreddit') or not line.strip():
+					continue
+				name, directory, start = line.strip().split('\t')
+				directory = os.path.join(os.path.dirname(os.path.abspath(path)), directory)
+				shards.append(Shard(name, os.path.abspath(directory), dt.datetime.strptime(start, '%m/%d/%Y')))
+	except OSError:
+		pass
+	return shards or [Shard('EndMassIncarceration', os.path.abspath('.'))]
+
+def load_snapshot():
+	"""
+	Load the data files, or the cached snapshot of them. (tuple of PostStore, dict)
+
+	If the data files have not changed since they were last parsed, the posts are
+	loaded from the snapshot in CACHE_PATH. Otherwise the data files are parsed and
+	the snapshot is rebuilt.
 	"""
-	posts, valid_tags = {}, {}
+	cache_key = tuple((os.stat(path).st_mtime_ns, os.stat(path).st_size) for path in DATA_FILES)
+	cached = load_cache(cache_key)
+	if cached is not None:
+		return cached
+	posts, valid_tags = PostStore(), {}
 	with open('post_data.txt') as post_file:
 		for line in post_file:
 			if line.startswith('post_id'):
 				continue
-			new_post = Post(line)
-			posts[new_post.post_id] = new_post
-			posts[new_post.reddit_id] = new_post
+			posts.add(Post(line))
 	with open('valid_tags.txt') as valid_file:
 		for line in valid_file:
 			if line.startswith('tag_id'):
@@ -952,23 +5321,302 @@ def load_local():
 			if line.startswith('post_id'):
 				continue
 			post_id, name = line.strip().split('\t')
-			posts[int(post_id)].names.append(name)
+			posts[int(post_id)].add_name(name)
 			Post.all_names.add(name)
+	save_cache(cache_key, posts, valid_tags)
 	return posts, valid_tags
 
-def load_reddit(read_only = False, **kwargs):
+def poll_new(subreddit, newest, known = (), page_size = 100):
 	"""
-	Load a Reddit instance. (praw.Reddit)
+	Get the submissions newer than the newest one seen. (list of Submission)
+
+	The submissions are requested with the listing's before cursor. If that page
+	is full there may be more, and if it is empty the newest submission may have
+	been deleted, so in those cases the listing is walked back to the first known
+	submission instead.
 
 	Parameters:
-	read_only: A flag for making a read only instance. (bool)
-	kwargs: Key-word arguments for the Reddit instance. (bool)
+	subreddit: The subreddit to check. (praw.Subreddit)
+	newest: The fullname of the newest submission seen. (str)
+	known: Collections of the Reddit ids already seen. (tuple)
+	page_size: The number of submissions to request per page. (int)
 	"""
-	access = ACCESS_KWARGS.copy()
-	access.update(kwargs)
-	reddit = praw.Reddit('main_user', **access)
-	return reddit
+	page = list(subreddit.new(limit = page_size, params = {'before': newest}))
+	if 0 < len(page) < page_size:
+		return page
+	posts = []
+	for post in subreddit.new(limit = None if page else 25):
+		if f't3_{post.id}' == newest or any(post.id in seen for seen in known):
+			break
+		posts.append(post)
+	return posts
+
+def read_export(path):
+	"""
+	Read back a file written in the compact binary export format. (generator of dict)
+
+	Each chunk of the file is given as a dictionary of column names to lists of
+	values, with the dictionary encoded columns decoded.
+
+	Parameters:
+	path: The file to read. (str)
+	"""
+	dictionaries = {'source': [], 'poster': [], 'tags': []}
+	with open(path, 'rb') as export_file:
+		if export_file.read(len(EXPORT_MAGIC)) != EXPORT_MAGIC:
+			raise ValueError(f'{path!r} is not a binary export file.')
+		while True:
+			chunk = marshal.load(export_file)
+			if chunk is None:
+				return
+			columns = {}
+			for name in EXPORT_COLUMNS:
+				data = chunk[name]
+				if name in ('post_id', 'score', 'comments', 'per_up', 'date'):
+					values = array.array('d' if name == 'per_up' else 'q')
+					values.frombytes(data)
+					columns[name] = values.tolist()
+				elif name in ('source', 'poster'):
+					dictionaries[name].extend(data[0])
+					codes = array.array('I')
+					codes.frombytes(data[1])
+					columns[name] = [dictionaries[name][code] for code in codes]
+				elif name in ('tags', 'names'):
+					offsets, values = array.array('I'), data[-1]
+					offsets.frombytes(data[-2])
+					if name == 'tags':
+						dictionaries[name].extend(data[0])
+						codes = array.array('I')
+						codes.frombytes(values)
+						values = [dictionaries[name][code] for code in codes]
+					columns[name] = [values[start:end] for start, end in zip(offsets, offsets[1:])]
+				else:
+					columns[name] = data
+			columns['date'] = [dt.date.fromordinal(int(day)).isoformat() for day in columns['date']]
+			yield columns
+
+def refresh_posts(reddit, posts, batch_size = 100, cache = None):
+	"""
+	Update posts with current Reddit statistics. (int)
+
+	The posts are looked up by fullname in batches, so refreshing n posts takes
+	about n / batch_size requests. If a cache is given, posts with current
+	statistics in the cache are updated from it instead, and the fetched
+	submissions are added to it. The return value is the number of posts whose
+	statistics changed.
+
+	Parameters:
+	reddit: A reddit instance. (praw.Reddit)
+	posts: The posts to update. (list of Post)
+	batch_size: The number of posts to look up per request. (int)
+	cache: A cache of Reddit submissions. (SubmissionCache or None)
+	"""
+	changed = 0
+	if cache is not None:
+		stale = []
+		for post in posts:
+			submission = cache.get(post.reddit_id, stats = True)
+			if submission is None:
+				stale.append(post)
+			elif post.update(submission):
+				changed += 1
+		posts = stale
+	for start in range(0, len(posts), batch_size):
+		batch = {post.reddit_id: post for post in posts[start:(start + batch_size)]}
+		fullnames = [f't3_{reddit_id}' for reddit_id in batch]
+		for submission in reddit.info(fullnames = fullnames):
+			if cache is not None:
+				submission = cache.add(submission)
+			if batch[submission.id].update(submission):
+				changed += 1
+	return changed
+
+def save_cache(key, posts, valid_tags):
+	"""
+	Save a snapshot of the data files. (None)
+
+	The snapshot is only a cache, so failing to write it is not an error.
+
+	Parameters:
+	key: The modification times and sizes of the data files. (tuple)
+	posts: The posts loaded from the data files. (PostStore)
+	valid_tags: The valid tags loaded from the data files. (dict)
+	"""
+	rows = [post.row() if post else None for post in posts.rows]
+	data = (CACHE_VERSION, key, rows, valid_tags, Post.index.fields)
+	temp_path = f'{CACHE_PATH}.tmp'
+	try:
+		with open(temp_path, 'wb') as cache_file:
+			cache_file.write(marshal.dumps(data))
+		os.replace(temp_path, CACHE_PATH)
+	except OSError:
+		pass
+
+def save_state(state, path = STATE_PATH):
+	"""
+	Save the polling state for the next session. (None)
+
+	Parameters:
+	state: The polling state for each subreddit. (dict)
+	path: The file to save the state in. (str)
+	"""
+	write_atomic(path, json.dumps(state, indent = 1), [])
+
+def write_arrow(chunks, path, parquet = False):
+	"""
+	Write chunks of posts as an Arrow stream or a Parquet file. (int)
+
+	The source, poster, and tag columns are dictionary encoded, and the tags and
+	names are list columns. Each chunk is written as a batch of rows (or a row
+	group in Parquet). The return value is the number of posts written.
+
+	Parameters:
+	chunks: The posts in chunks of columns, as from export_chunks. (iterable of dict)
+	path: The file to write. (str)
+	parquet: A flag for writing Parquet instead of an Arrow stream. (bool)
+	"""
+	encoded = pa.dictionary(pa.int32(), pa.string())
+	schema = pa.schema([('post_id', pa.int64()), ('reddit_id', pa.string()), ('date', pa.date32()),
+		('source', encoded), ('poster', encoded), ('title', pa.string()), ('score', pa.int64()),
+		('per_up', pa.float64()), ('comments', pa.int64()), ('notes', pa.string()), ('url', pa.string()),
+		('permalink', pa.string()), ('tags', pa.list_(encoded)), ('names', pa.list_(pa.string()))])
+	writer = pq.ParquetWriter(path, schema) if parquet else pa.ipc.new_stream(path, schema)
+	count = 0
+	try:
+		for columns in chunks:
+			arrays = []
+			for field in schema:
+				if field.name == 'date':
+					arrays.append(pa.array(columns['date']).cast(pa.date32()))
+				else:
+					arrays.append(pa.array(columns[field.name], type = field.type))
+			writer.write_table(pa.Table.from_arrays(arrays, schema = schema))
+			count += len(columns['post_id'])
+	finally:
+		writer.close()
+	return count
+
+def write_atomic(path, header, lines):
+	"""
+	Write a data file without risking a partially written file. (None)
+
+	The data is written to a temporary file, synced to disk, and then renamed
+	over the original file.
+
+	Parameters:
+	path: The path of the file to write. (str)
+	header: The header line of the file. (str)
+	lines: The data lines to write. (iterable of str)
+	"""
+	temp_path = f'{path}.tmp'
+	with open(temp_path, 'w') as temp_file:
+		temp_file.write(header)
+		temp_file.writelines(lines)
+		temp_file.flush()
+		os.fsync(temp_file.fileno())
+	os.replace(temp_path, path)
+
+def write_binary(chunks, path):
+	"""
+	Write chunks of posts in a compact binary format. (int)
+
+	The file starts with EXPORT_MAGIC, followed by one marshalled dictionary per
+	chunk and a final None. Numeric columns and dates (as day ordinals) are
+	stored as typed arrays. The source, poster, and tag columns are dictionary
+	encoded: each chunk has the values first seen in it and an array of codes
+	into all of the values seen so far. The tags and names are stored flat, with
+	an array of where each post's list starts. The return value is the number of
+	posts written. Use read_export to read the file.
+
+	Parameters:
+	chunks: The posts in chunks of columns, as from export_chunks. (iterable of dict)
+	path: The file to write. (str)
+	"""
+	dictionaries = {'source': {}, 'poster': {}, 'tags': {}}
+	count = 0
+	with open(path, 'wb') as export_file:
+		export_file.write(EXPORT_MAGIC)
+		for columns in chunks:
+			chunk = {}
+			for name in ('post_id', 'score', 'comments'):
+				chunk[name] = array.array('q', columns[name]).tobytes()
+			chunk['per_up'] = array.array('d', columns['per_up']).tobytes()
+			days = [dt.date(int(text[:4]), int(text[5:7]), int(text[8:])).toordinal() for text in columns['date']]
+			chunk['date'] = array.array('q', days).tobytes()
+			for name in ('reddit_id', 'title', 'notes', 'url', 'permalink'):
+				chunk[name] = list(columns[name])
+			for name in ('source', 'poster', 'tags'):
+				codes, new = dictionaries[name], []
+				values = columns[name]
+				if name == 'tags':
+					offsets = array.array('I', [0])
+					for tags in values:
+						offsets.append(offsets[-1] + len(tags))
+					values = [tag for tags in values for tag in tags]
+				for value in values:
+					if value not in codes:
+						codes[value] = len(codes)
+						new.append(value)
+				encoded = array.array('I', [codes[value] for value in values]).tobytes()
+				chunk[name] = (new, offsets.tobytes(), encoded) if name == 'tags' else (new, encoded)
+			offsets = array.array('I', [0])
+			for names in columns['names']:
+				offsets.append(offsets[-1] + len(names))
+			chunk['names'] = (offsets.tobytes(), [name for names in columns['names'] for name in names])
+			marshal.dump(chunk, export_file)
+			count += len(columns['post_id'])
+		marshal.dump(None, export_file)
+	return count
+
+def write_ndjson(chunks, path):
+	"""
+	Write chunks of posts as newline-delimited JSON. (int)
+
+	Each line is an object with the fields in EXPORT_COLUMNS, with the tags and
+	names as lists. The return value is the number of posts written.
+
+	Parameters:
+	chunks: The posts in chunks of columns, as from export_chunks. (iterable of dict)
+	path: The file to write. (str)
+	"""
+	count = 0
+	with open(path, 'w') as export_file:
+		for columns in chunks:
+			lines = []
+			for values in zip(*[columns[name] for name in EXPORT_COLUMNS]):
+				record = dict(zip(EXPORT_COLUMNS, values))
+				record['tags'], record['names'] = list(record['tags']), list(record['names'])
+				lines.append(json.dumps(record) + '\n')
+			export_file.writelines(lines)
+			count += len(lines)
+	return count
 
 if __name__ == '__main__':
+	parser = argparse.ArgumentParser(description = 'Track posts on r/EndMassIncarceration.')
+	parser.add_argument('--batch', action = 'store_true',
+		help = 'load and tag new posts without prompting, then print a JSON summary')
+	parser.add_argument('--rules', default = RULES_PATH, help = 'the tag rules file for batch mode')
+	parser.add_argument('--deep', action = 'store_true', help = 'check the whole listing and refresh all stats')
+	parser.add_argument('--perf', action = 'store_true', help = 'time commands, Reddit requests, and saving')
+	parser.add_argument('--shards', default = SHARDS_PATH, help = 'the file listing the subreddits tracked')
+	parser.add_argument('--shard', help = 'the subreddit to track, from the shards file')
+	args = parser.parse_args()
+	Tracker.shards_path = os.path.abspath(args.shards)
+	if args.shard:
+		shards = {shard.name.lower(): shard for shard in load_shards(args.shards)}
+		if args.shard.lower() not in shards:
+			parser.error(f'r/{args.shard} is not listed in {args.shards}')
+		os.chdir(shards[args.shard.lower()].path)
 	tracker = Tracker()
-	tracker.cmdloop()
\ No newline at end of file
+	tracker.perf.enabled = args.perf
+	if args.batch:
+		try:
+			summary = tracker.batch(TagRules(args.rules), args.deep)
+		except (OSError, ValueError, praw.exceptions.PRAWException, prawcore.exceptions.PrawcoreException) as err:
+			print(json.dumps({'error': str(err)}))
+			sys.exit(1)
+		if args.perf:
+			print(tracker.perf.report(), file = sys.stderr)
+		print(json.dumps(summary))
+	else:
+		tracker.cmdloop()
@@ -0,0 +1,220 @@
+"""
+test_cjr_tracker.py
+
+Tests of cjr_tracker.py that do not need a connection to Reddit.
+
+Run with python -m unittest test_cjr_tracker (or pytest). The tests are skipped
+if the packages cjr_tracker needs (praw and cmdr) are not installed.
+
+Classes:
+CheckTest: Tests of checking a tracked subreddit for new posts. (unittest.TestCase)
+FakeReddit: A stand in for Reddit that records the requests made. (object)
+FakeSubmission: A stand in for a Reddit submission. (object)
+FakeSubreddit: A stand in for a subreddit. (object)
+SearchTest: Tests of the full-text search index. (unittest.TestCase)
+"""
+
+import os
+import tempfile
+import time
+import unittest
+
+try:
+	import cjr_tracker
+except ImportError:
+	cjr_tracker = None
+
+class FakeSubmission(object):
+	"""
+	A stand in for a Reddit submission. (object)
+
+	Attributes:
+	author: The name of the Redditor who made the submission. (str)
+	created_utc: When the submission was made. (float)
+	id: The Reddit id of the submission. (str)
+	num_comments: The number of comments on the submission. (int)
+	permalink: The path of the submission on Reddit. (str)
+	score: The Reddit score of the submission. (int)
+	title: The title of the submission. (str)
+	upvote_ratio: The percentage of upvotes for the submission. (float)
+	url: The URL the submission links to. (str)
+
+	Overridden Methods:
+	__init__
+	"""
+
+	def __init__(self, reddit_id, title = 'Bail reform passes in Texas', age = 0):
+		"""
+		Set up the submission's data. (None)
+
+		Parameters:
+		reddit_id: The Reddit id of the submission. (str)
+		title: The title of the submission. (str)
+		age: How many seconds ago the submission was made. (int)
+		"""
+		self.id = reddit_id
+		self.title = title
+		self.created_utc = time.time() - age
+		self.author = 'someone'
+		self.url = f'https://example.com/{reddit_id}'
+		self.permalink = f'/r/EndMassIncarceration/comments/{reddit_id}/x/'
+		self.score = 1
+		self.upvote_ratio = 1.0
+		self.num_comments = 0
+
+class FakeSubreddit(object):
+	"""
+	A stand in for a subreddit. (object)
+
+	Attributes:
+	reddit: The fake Reddit the subreddit is from. (FakeReddit)
+
+	Methods:
+	new: List the newest submissions. (iterator of FakeSubmission)
+
+	Overridden Methods:
+	__init__
+	"""
+
+	def __init__(self, reddit):
+		"""
+		Set up the subreddit. (None)
+
+		Parameters:
+		reddit: The fake Reddit the subreddit is from. (FakeReddit)
+		"""
+		self.reddit = reddit
+
+	def new(self, limit = 100, params = None):
+		"""
+		List the newest submissions. (iterator of FakeSubmission)
+
+		Parameters:
+		limit: The most submissions to list, or None for all of them. (int or None)
+		params: Extra parameters of the request. (dict or None)
+		"""
+		self.reddit.calls.append(('new', limit, params))
+		return iter(self.reddit.listing if limit is None else self.reddit.listing[:limit])
+
+class FakeReddit(object):
+	"""
+	A stand in for Reddit that records the requests made. (object)
+
+	Attributes:
+	calls: The requests made. (list of tuple)
+	listing: The submissions in the subreddit, newest first. (list of FakeSubmission)
+
+	Methods:
+	info: Look up submissions by fullname. (list of FakeSubmission)
+	subreddit: Get a subreddit. (FakeSubreddit)
+
+	Overridden Methods:
+	__init__
+	"""
+
+	def __init__(self, listing):
+		"""
+		Set up the fake Reddit. (None)
+
+		Parameters:
+		listing: The submissions in the subreddit, newest first. (list of FakeSubmission)
+		"""
+		self.listing = listing
+		self.calls = []
+
+	def info(self, fullnames = ()):
+		"""
+		Look up submissions by fullname. (list of FakeSubmission)
+
+		Parameters:
+		fullnames: The fullnames of the submissions. (list of str)
+		"""
+		self.calls.append(('info', len(fullnames)))
+		return [FakeSubmission(fullname[3:]) for fullname in fullnames]
+
+	def subreddit(self, name):
+		"""
+		Get a subreddit. (FakeSubreddit)
+
+		Parameters:
+		name: The name of the subreddit. (str)
+		"""
+		return FakeSubreddit(self)
+
+@unittest.skipIf(cjr_tracker is None, 'cjr_tracker needs praw and cmdr')
+class CheckTest(unittest.TestCase):
+	"""
+	Tests of checking a tracked subreddit for new posts. (unittest.TestCase)
+
+	Attributes:
+	cache: A submission cache in a temporary folder. (SubmissionCache)
+	folder: The temporary folder. (tempfile.TemporaryDirectory)
+
+	Overridden Methods:
+	setUp
+	tearDown
+	"""
+
+	def setUp(self):
+		"""Set up an empty submission cache. (None)"""
+		self.folder = tempfile.TemporaryDirectory()
+		self.cache = cjr_tracker.SubmissionCache(os.path.join(self.folder.name, 'cache.bin'))
+
+	def tearDown(self):
+		"""Remove the temporary folder. (None)"""
+		self.folder.cleanup()
+
+	def testDeepIgnoresCachedListing(self):
+		"""Test that a deep check fetches the listing even if a copy is cached."""
+		reddit = FakeReddit([FakeSubmission('new001')])
+		state = {}
+		found = cjr_tracker.check_cjr(reddit, cache = self.cache, state = state)
+		self.assertEqual(['new001'], [post.id for post in found])
+		# An older post turns up that the cached listing does not have.
+		reddit.listing.append(FakeSubmission('old001', age = 60))
+		reddit.calls = []
+		found = cjr_tracker.check_cjr(reddit, cache = self.cache, state = state, deep = True)
+		self.assertIn(('new', 100, None), reddit.calls)
+		self.assertEqual({'new001', 'old001'}, {post.id for post in found})
+
+	def testListingCached(self):
+		"""Test that a second check soon after the first uses the cached listing."""
+		reddit = FakeReddit([FakeSubmission('new001')])
+		cjr_tracker.check_cjr(reddit, cache = self.cache, state = {})
+		reddit.calls = []
+		cjr_tracker.check_cjr(reddit, cache = self.cache, state = {})
+		self.assertEqual([], [call for call in reddit.calls if call[0] == 'new'])
+
+@unittest.skipIf(cjr_tracker is None, 'cjr_tracker needs praw and cmdr')
+class SearchTest(unittest.TestCase):
+	"""
+	Tests of the full-text search index. (unittest.TestCase)
+
+	Attributes:
+	index: An index of a few titles. (SearchIndex)
+
+	Overridden Methods:
+	setUp
+	"""
+
+	def setUp(self):
+		"""Index a few titles. (None)"""
+		self.index = cjr_tracker.SearchIndex('unused.bin')
+		titles = ['Theresa Smith freed after 20 years', 'Thelma Jones sues the county', 'Cash bail ends in Illinois']
+		self.index.build((post_id, title, 737000) for post_id, title in enumerate(titles, start = 1))
+
+	def testPrefix(self):
+		"""Test that a trailing * matches terms starting with the word, even in quotes."""
+		self.assertEqual({1, 2}, {post_id for score, post_id in self.index.search(['"the*"'])})
+
+	def testPunctuation(self):
+		"""Test that punctuation around a query word is ignored."""
+		for word in ('bail,', '"bail"', 'Bail.'):
+			self.assertEqual([3], [post_id for score, post_id in self.index.search([word])])
+
+	def testStopWords(self):
+		"""Test that stop words in a query are ignored instead of matched as prefixes."""
+		self.assertEqual([3], [post_id for score, post_id in self.index.search(['the', 'bail'])])
+
+if __name__ == '__main__':
+	unittest.main()